@@ -0,0 +1,457 @@
+"""Reproducible performance suite behind ``cli.py bench``.
+
+Every benchmark builds its input from a seeded generator at each size in
+``--sizes``: FAQ entries for config-shaped inputs, polls for the poll bot,
+messages for the text helpers, stored bots for the SQLite paths. Each
+(benchmark, size) pair is calibrated once so that a run takes at least
+MIN_RUN_TIME and then repeated; the per-operation best, median, mean and
+stdev are reported in milliseconds.
+
+``measure_imports`` profiles what an entry point imports, with
+``python -X importtime`` in a fresh interpreter; tests/test_startup.py keeps
+the cli and generated bots within their import budget with it.
+
+    python cli.py bench --sizes 10,100,1000 --output before.json
+    python cli.py bench --sizes 10,100,1000 --compare before.json
+"""
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+from generate import PROJECT_ROOT, generate
+from utils.utils_callbacks import callback_tokens
+from utils.utils_config import CanonicalConfig
+from utils.utils_faq import FaqIndex
+from utils.utils_text import MessageBuilder, escape_markdown
+from utils.utils_validation import is_valid_text, validate_config
+
+DEFAULT_SIZES = (10, 100, 1000)
+DEFAULT_REPEAT = 5
+DEFAULT_SEED = 1
+MIN_RUN_TIME = 0.2
+# Callback presses dispatched per timed run of the dispatch benchmark
+DISPATCH_BATCH = 50
+TEMPLATE_FILE = "bot_template.py.j2"
+
+WORDS = ("бот", "вопрос", "ответ", "доставка", "оплата", "заказ", "скидка", "магазин", "время", "адрес",
+         "телефон", "почта", "сайт", "помощь", "меню", "опрос", "вариант", "спасибо", "привет", "неделя")
+PUNCTUATION = (".", ",", "!", "?", "-", "(", ")", ":")
+
+
+def synthetic_text(rng, words=8, punctuation=True):
+    parts = [rng.choice(WORDS) for _ in range(words)]
+    if punctuation:
+        for i in rng.sample(range(words), k=min(3, words)):
+            parts[i] += rng.choice(PUNCTUATION)
+    return " ".join(parts).capitalize()
+
+
+def synthetic_faq_config(size, rng, markdown_safe=True):
+    """An FAQ bot with ``size`` questions, shaped like build_faq_config output."""
+    faq_text, faq_entities = MessageBuilder().bold("Часто задаваемые вопросы:").text("\nВыберите вопрос").build()
+    keyboard = [
+        [{
+            "text": f"{synthetic_text(rng, 4, punctuation=False)} {i}",
+            "callback_data": f"faq_{i}",
+            "response": synthetic_text(rng, 12, punctuation=not markdown_safe),
+        }]
+        for i in range(1, size + 1)
+    ]
+    return {
+        "bot_name": "Бенчмарк",
+        "format": "entities",
+        "handlers": [
+            {"command": "/start", "text": "Добро пожаловать в бот FAQ"},
+            {"command": "/faq", "text": faq_text, "entities": faq_entities, "reply_markup": {"inline_keyboard": keyboard}},
+        ],
+    }
+
+
+def synthetic_poll_config(size, rng, options=3, first_poll_id=1):
+    """A poll bot with ``size`` polls, shaped like finalize_poll output."""
+    poll_text, poll_entities = MessageBuilder().bold("Опросы").text(" 📊\nВыберите интересующий опрос.").build()
+    polls = [(f"{synthetic_text(rng, 5, punctuation=False)} {i}",
+              [f"{rng.choice(WORDS)} {j}" for j in range(1, options + 1)]) for i in range(1, size + 1)]
+    handlers = [
+        {"command": "/start", "text": "Добро пожаловать в бот опросов"},
+        {"command": "/poll", "text": poll_text, "entities": poll_entities, "reply_markup": {"inline_keyboard": [
+            [{"text": question, "callback_data": f"poll_{i}"}] for i, (question, _) in enumerate(polls, 1)
+        ]}},
+    ]
+    for i, (question, poll_options) in enumerate(polls, 1):
+        handlers.append({"callback_query": f"poll_{i}", "text": question, "reply_markup": {"inline_keyboard": [
+            [{"text": option, "callback_data": f"poll_{i}_option_{j}"}] for j, option in enumerate(poll_options, 1)
+        ]}})
+    for i, (question, poll_options) in enumerate(polls, 1):
+        for j, option in enumerate(poll_options, 1):
+            thank_you_text, thank_you_entities = MessageBuilder().bold("Спасибо за ваш ответ!").text(f" ✅\nВы выбрали: {option}").build()
+            handlers.append({"callback_query": f"poll_{i}_option_{j}", "text": question, "save_response": {
+                "poll_id": first_poll_id + i - 1, "option_text": option,
+                "thank_you_text": thank_you_text, "thank_you_entities": thank_you_entities,
+            }})
+    return {"bot_name": "Бенчмарк", "format": "entities", "handlers": handlers}, polls
+
+
+@contextlib.contextmanager
+def working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+@contextlib.contextmanager
+def poll_database(path):
+    """Point connect_db, and the generated bots using it, at ``path``."""
+    from utils import utils_db
+    previous = utils_db.DB_PATH
+    utils_db.DB_PATH = path
+    try:
+        yield
+    finally:
+        utils_db.DB_PATH = previous
+
+
+# Benchmarks: setup(size, rng, workdir) returns the function to time, or
+# (function, operations per call) when one call covers several operations.
+
+def bench_validate_config(size, rng, workdir):
+    config = synthetic_faq_config(size, rng)
+    assert validate_config(config) == (True, "")
+    return lambda: validate_config(config)
+
+
+def bench_escape_markdown(size, rng, workdir):
+    texts = [synthetic_text(rng, 12) + f" {i}" for i in range(size)]
+    return (lambda: [escape_markdown(text) for text in texts]), size
+
+
+def bench_is_valid_text(size, rng, workdir):
+    texts = [synthetic_text(rng, 12, punctuation=False) + f" {i}" for i in range(size)]
+    return (lambda: [is_valid_text(text) for text in texts]), size
+
+
+def bench_faq_match(size, rng, workdir):
+    """Free-text lookups against the index of a ``size``-question FAQ, half of them with a typo."""
+    buttons = [row[0] for row in synthetic_faq_config(size, rng)["handlers"][1]["reply_markup"]["inline_keyboard"]]
+    index = FaqIndex([(button["text"], button["response"]) for button in buttons])
+    queries = [button["text"] for button in rng.sample(buttons, k=min(size, 50))]
+    # Every other query loses a letter of its first word
+    queries = [query[:2] + query[3:] if i % 2 else query for i, query in enumerate(queries)]
+    return (lambda: [index.match(query) for query in queries]), len(queries)
+
+
+def bench_generate(size, rng, workdir):
+    config = synthetic_poll_config(size, rng)[0]
+    output_file = os.path.join(workdir, "bot_generate.py")
+    return lambda: generate(config, output_file, 1)
+
+
+def bench_jinja_render(size, rng, workdir):
+    from jinja2 import Environment, FileSystemLoader
+    template = Environment(loader=FileSystemLoader(PROJECT_ROOT)).get_template(TEMPLATE_FILE)
+    # The template only knows command handlers with callback buttons
+    config = synthetic_faq_config(size, rng)
+    return lambda: template.render(config=config, config_id=1)
+
+
+def bench_sqlite_finalize(size, rng, workdir):
+    """The statements finalize_poll runs, against a database holding ``size`` bots with three polls each."""
+    from utils.utils_runner import init_db
+    db_path = os.path.join(workdir, "bot_users.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    with poll_database(db_path):
+        init_db()
+    conn = sqlite3.connect(db_path)
+    for config_id in range(1, size + 1):
+        stored = CanonicalConfig(synthetic_faq_config(3, rng))
+        conn.execute("INSERT INTO bot_configs (config_id, user_id, bot_name, config_json, config_hash, bot_token) "
+                     "VALUES (?, 1, ?, ?, ?, '1:A')", (config_id, stored['bot_name'], stored.text, stored.digest))
+        conn.executemany("INSERT INTO polls (config_id, question, options) VALUES (?, ?, ?)",
+                         [(config_id, f"Вопрос {i}", '["a", "b", "c"]') for i in range(3)])
+    conn.commit()
+    conn.close()
+    config, polls = synthetic_poll_config(3, rng)
+
+    def finalize():
+        conn = sqlite3.connect(db_path)
+        c = conn.cursor()
+        for question, options in polls:
+            c.execute('INSERT INTO polls (config_id, question, options) VALUES (?, ?, ?)',
+                      (0, question, json.dumps(options)))
+        conn.commit()
+        conn.close()
+        stored = CanonicalConfig(config)
+        conn = sqlite3.connect(db_path)
+        c = conn.cursor()
+        c.execute('INSERT INTO bot_configs (user_id, bot_name, config_json, config_hash, bot_token) VALUES (?, ?, ?, ?, ?)',
+                  (1, stored['bot_name'], stored.text, stored.digest, '1:A'))
+        c.execute('UPDATE polls SET config_id = ? WHERE config_id = 0', (c.lastrowid,))
+        conn.commit()
+        conn.close()
+    return finalize
+
+
+def bench_poll_stats(size, rng, workdir):
+    """A day of hourly option shares for a poll with ``size`` thousand votes spread over 30 days."""
+    from utils.utils_poll_stats import HOUR, option_shares, refresh_rollups
+    from utils.utils_polls import init_poll_tables
+    db_path = os.path.join(workdir, f"poll_stats_{size}.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    conn = sqlite3.connect(db_path)
+    init_poll_tables(conn)
+    until = 1704067200 + 30 * 86400
+    conn.executemany(
+        "INSERT INTO poll_responses (user_id, poll_id, config_id, option_text, created_at) "
+        "VALUES (?, 1, 1, ?, datetime(?, 'unixepoch'))",
+        ((user_id, rng.choice("abcd"), until - rng.randrange(30 * 86400)) for user_id in range(size * 1000)),
+    )
+    conn.commit()
+    conn.close()
+    refresh_rollups(db_path)
+    return lambda: option_shares(1, HOUR, until - 86400, until, db_path=db_path)
+
+
+def stub_session():
+    """A Bot session that answers every API call locally, so dispatch is timed without the network."""
+    from aiogram.client.session.base import BaseSession
+
+    class StubSession(BaseSession):
+        async def make_request(self, bot, method, timeout=None):
+            return None
+
+        async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+            yield b""
+
+        async def close(self):
+            pass
+
+    return StubSession()
+
+
+def bench_callback_dispatch(size, rng, workdir):
+    """Random option presses fed through the dispatcher of a generated ``size``-poll bot."""
+    import runpy
+    from aiogram import Bot
+    from aiogram.types import Update
+    config = synthetic_poll_config(size, rng)[0]
+    path = os.path.join(workdir, f"bot_dispatch_{size}.py")
+    generate(config, path, 1)
+    os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+    db_path = os.path.join(workdir, "bot_users.db")
+    with working_directory(workdir), poll_database(db_path):
+        namespace = runpy.run_path(path, run_name="bench")
+        namespace["init_db"]()
+    dp = namespace["dp"]
+    bot = Bot("123456:BENCH", session=stub_session())
+    tokens = callback_tokens(path)
+    presses = [tokens[f"poll_{rng.randint(1, size)}_option_{rng.randint(1, 3)}"] for _ in range(DISPATCH_BATCH)]
+    counter = iter(range(1, 10 ** 9))
+    loop = asyncio.new_event_loop()
+
+    def update(data):
+        update_id = next(counter)
+        return Update.model_validate({"update_id": update_id, "callback_query": {
+            "id": str(update_id), "chat_instance": "1", "data": data,
+            "from": {"id": update_id, "is_bot": False, "first_name": "U"},
+            "message": {"message_id": update_id, "date": 0, "chat": {"id": update_id, "type": "private"}, "text": "x"},
+        }}, context={"bot": bot})
+
+    async def dispatch():
+        # Fresh update ids and message ids so the dedup middleware lets every press through
+        for data in presses:
+            await dp.feed_update(bot, update(data))
+
+    def run():
+        with working_directory(workdir), poll_database(db_path):
+            loop.run_until_complete(dispatch())
+    return run, DISPATCH_BATCH
+
+
+def bench_bot_startup(size, rng, workdir):
+    """A fresh interpreter importing a generated ``size``-poll bot, up to the point where main() would run."""
+    config = synthetic_poll_config(size, rng)[0]
+    path = os.path.join(workdir, f"bot_startup_{size}.py")
+    generate(config, path, 1)
+    command = [sys.executable, "-c", f"import runpy; runpy.run_path({path!r}, run_name='bench')"]
+    # Outside bots/ the script's own root has no utils package
+    env = {**os.environ, "BOT_TOKEN": "123456:BENCH", "PYTHONPATH": PROJECT_ROOT}
+    return lambda: subprocess.run(command, cwd=workdir, env=env, check=True)
+
+
+MICRO = {
+    "validate_config": bench_validate_config,
+    "escape_markdown": bench_escape_markdown,
+    "is_valid_text": bench_is_valid_text,
+    "faq_match": bench_faq_match,
+}
+MACRO = {
+    "generate": bench_generate,
+    "jinja_render": bench_jinja_render,
+    "sqlite_finalize": bench_sqlite_finalize,
+    "callback_dispatch": bench_callback_dispatch,
+    "poll_stats": bench_poll_stats,
+    "bot_startup": bench_bot_startup,
+}
+BENCHMARKS = {**MICRO, **MACRO}
+
+
+# Smallest bots of each kind, for import profiles
+STARTUP_CONFIGS = {
+    "business_card": {
+        "bot_name": "Startup",
+        "format": "entities",
+        "handlers": [
+            {"command": "/start", "text": "Привет", "entities": [{"type": "bold", "offset": 0, "length": 6}]},
+            {"command": "/help", "text": "Помощь"},
+        ],
+    },
+    "poll": {
+        "bot_name": "Startup",
+        "format": "entities",
+        "handlers": [
+            {"command": "/poll", "text": "Опросы", "reply_markup": {"inline_keyboard": [
+                [{"text": "Вопрос", "callback_data": "poll_1"}]
+            ]}},
+            {"callback_query": "poll_1", "text": "Вопрос", "save_response": {
+                "poll_id": 1, "option_text": "Да", "thank_you_text": "Спасибо"
+            }},
+        ],
+    },
+}
+
+
+def parse_importtime(stderr):
+    """Return ``{module: (self_us, cumulative_us, depth)}`` from -X importtime output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return modules
+
+
+def measure_imports(statement, cwd=PROJECT_ROOT, env=None):
+    """Import time, module count and heaviest top-level imports of ``statement`` in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=cwd, capture_output=True, text=True, env={**os.environ, **(env or {})}, check=True,
+    )
+    modules = parse_importtime(result.stderr)
+    top_level = sorted(
+        ((name, cumulative) for name, (_, cumulative, depth) in modules.items() if depth == 0),
+        key=lambda item: item[1], reverse=True,
+    )
+    return {
+        "import_ms": sum(cumulative for _, cumulative in top_level) / 1000,
+        "modules": len(modules),
+        "loaded": sorted(modules),
+        "heaviest": [(name, cumulative / 1000) for name, cumulative in top_level[:5]],
+    }
+
+
+def measure_generated_bot(template, workdir):
+    path = os.path.join(workdir, f"bot_{template}.py")
+    generate(STARTUP_CONFIGS[template], path, 1)
+    # Import without running main(); the token only has to look valid
+    statement = f"import runpy; runpy.run_path({path!r}, run_name='bench')"
+    # Outside bots/ the script's own root has no utils package
+    return measure_imports(statement, cwd=workdir, env={"BOT_TOKEN": "123456:STARTUP", "PYTHONPATH": PROJECT_ROOT})
+
+
+def time_function(func, repeat, operations=1, min_time=None):
+    min_time = MIN_RUN_TIME if min_time is None else min_time
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time or number >= 10 ** 6:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+    runs = [elapsed / number / operations * 1e3 for elapsed in timer.repeat(repeat, number)]
+    return {
+        "number": number,
+        "operations": operations,
+        "best_ms": min(runs),
+        "median_ms": statistics.median(runs),
+        "mean_ms": statistics.fmean(runs),
+        "stdev_ms": statistics.stdev(runs) if len(runs) > 1 else 0.0,
+        "runs_ms": runs,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names=None, sizes=DEFAULT_SIZES, repeat=DEFAULT_REPEAT, seed=DEFAULT_SEED, progress=None):
+    """Run the selected benchmarks and return the report as a JSON-ready dict."""
+    names = list(names or BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError(f"Неизвестные бенчмарки: {', '.join(sorted(unknown))}")
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in names:
+            for size in sizes:
+                # Seeded per benchmark and size, so adding one does not change the inputs of another
+                rng = random.Random(f"{seed}:{name}:{size}")
+                func = BENCHMARKS[name](size, rng, workdir)
+                func, operations = func if isinstance(func, tuple) else (func, 1)
+                result = {"name": name, "kind": "micro" if name in MICRO else "macro", "size": size,
+                          **time_function(func, repeat, operations)}
+                results.append(result)
+                if progress is not None:
+                    progress(result)
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "revision": git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": seed,
+            "repeat": repeat,
+            "sizes": list(sizes),
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline):
+    """``[(name, size, baseline_ms, current_ms, ratio)]`` for benchmarks present in both reports."""
+    previous = {(row["name"], row["size"]): row["best_ms"] for row in baseline["results"]}
+    rows = []
+    for row in report["results"]:
+        before = previous.get((row["name"], row["size"]))
+        if before:
+            rows.append((row["name"], row["size"], before, row["best_ms"], row["best_ms"] / before))
+    return rows
+
+
+def format_result(row):
+    return (f"{row['name']:<20}{row['size']:>8}{row['best_ms']:>12.4f}{row['median_ms']:>12.4f}"
+            f"{row['stdev_ms']:>10.4f}")
+
+
+RESULT_HEADER = f"{'бенчмарк':<20}{'размер':>8}{'лучшее мс':>12}{'медиана мс':>12}{'stdev':>10}"
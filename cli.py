@@ -3,41 +3,62 @@ import asyncio
 import json
 import os
 import sqlite3
-from target_bot_code import generate_and_run_bot, escape_markdown, validate_config, validate_block_schema, init_db
+import sys
+from collections import deque
+from utils.utils_config import CanonicalConfig
+from utils.utils_db import connect_db
+from utils.utils_logging import setup_logging
+from utils.utils_runner import generate_and_run_bot, init_db
+from utils.utils_text import MessageBuilder
+from utils.utils_validation import invalid_text_chars, validate_bot_token, validate_config
+
+# aiogram is only imported by commands that talk to Telegram, so creating
+# bots from the command line does not pay for the bot runtime
+
+# Lines handed to a worker at once, and rows committed per transaction
+IMPORT_CHUNK_SIZE = 50
+IMPORT_BATCH_SIZE = 200
 
 def is_valid_text(text):
 
     if not text:
         return False
-    allowed_chars = set(
-        "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 ,:;@#$%^&" +
-        "абвгдеёжзийклмнопрстуфхцчшщъыьэюяАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ"
-    )
-    invalid_chars = set(text) - allowed_chars
+    invalid_chars = invalid_text_chars(text)
     if invalid_chars:
         print(f"Ошибка: найдены недопустимые символы в тексте: {invalid_chars}")
         return False
     return len(text.strip()) > 0
 
-async def create_business_card(bot_name, bot_token, welcome_text, phone, email, website, help_text):
-    if not is_valid_text(bot_name) or not is_valid_text(welcome_text) or not is_valid_text(help_text) or \
-       (phone and not is_valid_text(phone)) or (email and not is_valid_text(email)) or (website and not is_valid_text(website)):
-        print("Ошибка: один или несколько введенных текстов содержат недопустимые символы. Используйте буквы, цифры, пробелы и знаки препинания (кроме !, _, *, [, ], (, ), ~, `, >, #, +, -, =, |, {, }, ., ?).")
-        return
-    config = {"bot_name": escape_markdown(bot_name), "handlers": []}
-    contact_text = f"*{escape_markdown(welcome_text)}*\n\n📋 *Контактная информация:*\n"
+async def check_token(bot_token):
+    from utils.utils_telegram import check_bot_token
+    is_valid, error = await check_bot_token(bot_token)
+    if not is_valid:
+        print(f"Ошибка: недействительный токен: {error}")
+    return is_valid
+
+async def run_command(coro):
+    try:
+        await coro
+    finally:
+        if 'utils.utils_telegram' in sys.modules:
+            await sys.modules['utils.utils_telegram'].close_session()
+
+def build_business_card_config(bot_name, welcome_text, phone, email, website, help_text):
+    config = {"bot_name": bot_name, "format": "entities", "handlers": []}
+    card = MessageBuilder().bold(welcome_text).text("\n\n📋 ").bold("Контактная информация:").text("\n")
     if website:
-        contact_text += f"🌐 *Website:* {escape_markdown(website)}\n"
+        card.text("🌐 ").bold("Website:").text(" ").link(website, website).text("\n")
     if email:
-        contact_text += f"📧 *Email:* {escape_markdown(email)}\n"
+        card.text("📧 ").bold("Email:").text(f" {email}\n")
     if phone:
-        contact_text += f"📞 *Phone:* {escape_markdown(phone)}\n"
+        card.text("📞 ").bold("Phone:").text(f" {phone}\n")
     if not any([website, email, phone]):
-        contact_text += "ℹ️ Контактная информация не указана.\n"
+        card.text("ℹ️ Контактная информация не указана.\n")
+    contact_text, contact_entities = card.build()
 
     handlers = [
-        {"command": "/start", "text": contact_text},
-        {"command": "/help", "text": escape_markdown(help_text)},
+        {"command": "/start", "text": contact_text, "entities": contact_entities},
+        {"command": "/help", "text": help_text},
         {"command": "/create_bot", "text": "Начать создание нового бота."},
         {"command": "/list_bots", "text": "Показать список ваших ботов."},
         {"command": "/delete_bot", "text": "Удалить бота."},
@@ -58,42 +79,13 @@ async def create_business_card(bot_name, bot_token, welcome_text, phone, email,
         }
     ]
     config["handlers"] = handlers
+    return config
 
-    is_valid, error = validate_config(config)
-    if not is_valid:
-        print(f"Ошибка в конфигурации: {error}")
-        return
-    is_valid, error = validate_block_schema(config)
-    if not is_valid:
-        print(f"Ошибка в схеме: {error}")
-        return
-
-    conn = sqlite3.connect("bot_users.db")
-    c = conn.cursor()
-    c.execute(
-        "INSERT INTO bot_configs (user_id, bot_name, config_json, bot_token) VALUES (?, ?, ?, ?)",
-        (1, config['bot_name'], json.dumps(config), bot_token)  # user_id=1 как пример
-    )
-    config_id = c.lastrowid
-    conn.commit()
-    conn.close()
-
-    await generate_and_run_bot(config, bot_token, config_id)
-    print(f"Бот '{config['bot_name']}' успешно создан и запущен! ID: {config_id}")
-
-async def create_faq(bot_name, bot_token, faqs):
-    if not is_valid_text(bot_name):
-        print("Ошибка: имя бота содержит недопустимые символы. Используйте буквы, цифры, пробелы и знаки препинания (кроме !, _, *, [, ], (, ), ~, `, >, #, +, -, =, |, {, }, ., ?).")
-        return
-    config = {"bot_name": escape_markdown(bot_name), "handlers": []}
-    faq_text = "Часто задаваемые вопросы:\nВыберите интересующий вопрос\\."
+def build_faq_config(bot_name, faqs):
+    config = {"bot_name": bot_name, "format": "entities", "handlers": []}
+    faq_text, faq_entities = MessageBuilder().bold("Часто задаваемые вопросы:").text("\nВыберите интересующий вопрос.").build()
     keyboard_buttons = []
 
-    faqs = [
-        {"question": escape_markdown(faq["question"]), "answer": escape_markdown(faq["answer"])}
-        for faq in faqs
-    ]
-
     for i, faq in enumerate(faqs, 1):
         callback_data = f"faq_{i}"
         keyboard_buttons.append([
@@ -106,48 +98,16 @@ async def create_faq(bot_name, bot_token, faqs):
 
     handlers = [
         {"command": "/start", "text": "Добро пожаловать в бот FAQ! Используйте /faq для просмотра вопросов."},
-        {"command": "/faq", "text": faq_text, "reply_markup": {"inline_keyboard": keyboard_buttons}}
+        {"command": "/faq", "text": faq_text, "entities": faq_entities, "reply_markup": {"inline_keyboard": keyboard_buttons}}
     ]
     config["handlers"] = handlers
+    return config
 
-    is_valid, error = validate_config(config)
-    if not is_valid:
-        print(f"Ошибка в конфигурации: {error}")
-        return
-    is_valid, error = validate_block_schema(config)
-    if not is_valid:
-        print(f"Ошибка в схеме: {error}")
-        return
-
-    conn = sqlite3.connect("bot_users.db")
-    c = conn.cursor()
-    c.execute(
-        "INSERT INTO bot_configs (user_id, bot_name, config_json, bot_token) VALUES (?, ?, ?, ?)",
-        (1, config['bot_name'], json.dumps(config), bot_token)  # user_id=1 как пример
-    )
-    config_id = c.lastrowid
-    conn.commit()
-    conn.close()
-
-    await generate_and_run_bot(config, bot_token, config_id)
-    print(f"Бот '{config['bot_name']}' успешно создан и запущен! ID: {config_id}")
-
-async def create_poll(bot_name, bot_token, polls):
-    if not is_valid_text(bot_name):
-        print("Ошибка: имя бота содержит недопустимые символы. Используйте буквы, цифры, пробелы и знаки препинания (кроме !, _, *, [, ], (, ), ~, `, >, #, +, -, =, |, {, }, ., ?).")
-        return
-    config = {"bot_name": escape_markdown(bot_name), "handlers": []}
-    poll_text = "Опросы:\nВыберите интересующий опрос\\."
+def build_poll_config(bot_name, polls):
+    config = {"bot_name": bot_name, "format": "entities", "handlers": []}
+    poll_text, poll_entities = MessageBuilder().bold("Опросы:").text("\nВыберите интересующий опрос.").build()
     keyboard_buttons = []
 
-    polls = [
-        {
-            "question": escape_markdown(poll['question']),
-            "options": [escape_markdown(opt) for opt in poll['options']]
-        }
-        for poll in polls
-    ]
-
     for i, poll in enumerate(polls, 1):
         callback_data = f"poll_{i}"
         options_text = "\n".join([f"- {opt}" for opt in poll['options']])
@@ -162,38 +122,378 @@ async def create_poll(bot_name, bot_token, polls):
 
     handlers = [
         {"command": "/start", "text": "Добро пожаловать в бот опросов! Используйте /poll для просмотра опросов."},
-        {"command": "/poll", "text": poll_text, "reply_markup": {"inline_keyboard": keyboard_buttons}}
+        {"command": "/poll", "text": poll_text, "entities": poll_entities, "reply_markup": {"inline_keyboard": keyboard_buttons}}
     ]
     config["handlers"] = handlers
+    return config
 
+def insert_bot(c, user_id, bot_name, config_text, config_hash, bot_token, polls=()):
+    c.execute(
+        "INSERT INTO bot_configs (user_id, bot_name, config_json, config_hash, bot_token) VALUES (?, ?, ?, ?, ?)",
+        (user_id, bot_name, config_text, config_hash, bot_token)
+    )
+    config_id = c.lastrowid
+    if polls:
+        c.executemany(
+            "INSERT INTO polls (config_id, question, options) VALUES (?, ?, ?)",
+            [(config_id, poll["question"], json.dumps(poll["options"])) for poll in polls]
+        )
+    return config_id
+
+async def save_and_run(config, bot_token, polls=()):
     is_valid, error = validate_config(config)
     if not is_valid:
         print(f"Ошибка в конфигурации: {error}")
         return
-    is_valid, error = validate_block_schema(config)
-    if not is_valid:
-        print(f"Ошибка в схеме: {error}")
-        return
 
-    conn = sqlite3.connect("bot_users.db")
+    stored = CanonicalConfig(config)
+    conn = connect_db()
     c = conn.cursor()
-    c.execute(
-        "INSERT INTO bot_configs (user_id, bot_name, config_json, bot_token) VALUES (?, ?, ?, ?)",
-        (1, config['bot_name'], json.dumps(config), bot_token)  # user_id=1 как пример
-    )
-    config_id = c.lastrowid
-    for poll in polls:
-        c.execute(
-            "INSERT INTO polls (config_id, question, options) VALUES (?, ?, ?)",
-            (config_id, poll["question"], json.dumps(poll["options"]))
-        )
+    config_id = insert_bot(c, 1, config['bot_name'], stored.text, stored.digest, bot_token, polls)  # user_id=1 как пример
     conn.commit()
     conn.close()
 
-    await generate_and_run_bot(config, bot_token, config_id)
+    await generate_and_run_bot(stored, bot_token, config_id)
     print(f"Бот '{config['bot_name']}' успешно создан и запущен! ID: {config_id}")
 
+async def create_business_card(bot_name, bot_token, welcome_text, phone, email, website, help_text):
+    if not is_valid_text(bot_name) or not is_valid_text(welcome_text) or not is_valid_text(help_text) or \
+       (phone and not is_valid_text(phone)) or (email and not is_valid_text(email)) or (website and not is_valid_text(website)):
+        print("Ошибка: один или несколько введенных текстов содержат недопустимые символы. Используйте буквы, цифры, пробелы и знаки препинания (кроме !, _, *, [, ], (, ), ~, `, >, #, +, -, =, |, {, }, ., ?).")
+        return
+    if not await check_token(bot_token):
+        return
+    await save_and_run(build_business_card_config(bot_name, welcome_text, phone, email, website, help_text), bot_token)
+
+async def create_faq(bot_name, bot_token, faqs):
+    if not is_valid_text(bot_name):
+        print("Ошибка: имя бота содержит недопустимые символы. Используйте буквы, цифры, пробелы и знаки препинания (кроме !, _, *, [, ], (, ), ~, `, >, #, +, -, =, |, {, }, ., ?).")
+        return
+    if not await check_token(bot_token):
+        return
+    await save_and_run(build_faq_config(bot_name, faqs), bot_token)
+
+async def create_poll(bot_name, bot_token, polls):
+    if not is_valid_text(bot_name):
+        print("Ошибка: имя бота содержит недопустимые символы. Используйте буквы, цифры, пробелы и знаки препинания (кроме !, _, *, [, ], (, ), ~, `, >, #, +, -, =, |, {, }, ., ?).")
+        return
+    if not await check_token(bot_token):
+        return
+    await save_and_run(build_poll_config(bot_name, polls), bot_token, polls)
+
+def text_error(field, value, required=True):
+    if value is None or value == "":
+        return f"не указано поле {field}" if required else None
+    if not isinstance(value, str) or not value.strip():
+        return f"поле {field} должно быть непустой строкой"
+    invalid_chars = invalid_text_chars(value)
+    if invalid_chars:
+        return f"поле {field} содержит недопустимые символы: {''.join(sorted(invalid_chars))}"
+    return None
+
+def list_error(field, value):
+    if not isinstance(value, list) or not value:
+        return f"поле {field} должно быть непустым списком"
+    if not all(isinstance(item, dict) for item in value):
+        return f"элементы {field} должны быть объектами"
+    return None
+
+def definition_config(definition):
+    """Config and polls for one import definition, or an error message."""
+    template = definition.get("template")
+    name = definition.get("name")
+    errors = [text_error("name", name)]
+    if template == "business_card":
+        contacts = {field: definition.get(field) for field in ("phone", "email", "website")}
+        errors += [text_error("welcome", definition.get("welcome")), text_error("help_text", definition.get("help_text"))]
+        errors += [text_error(field, value, required=False) for field, value in contacts.items()]
+        if any(errors):
+            return None, None, "; ".join(filter(None, errors))
+        config = build_business_card_config(
+            name, definition["welcome"], contacts["phone"], contacts["email"], contacts["website"], definition["help_text"]
+        )
+        return config, (), None
+    if template == "faq":
+        faqs = definition.get("faqs")
+        errors.append(list_error("faqs", faqs))
+        if not any(errors):
+            for i, faq in enumerate(faqs, 1):
+                errors += [text_error(f"faqs[{i}].question", faq.get("question")),
+                           text_error(f"faqs[{i}].answer", faq.get("answer"))]
+        if any(errors):
+            return None, None, "; ".join(filter(None, errors))
+        return build_faq_config(name, faqs), (), None
+    if template == "poll":
+        polls = definition.get("polls")
+        errors.append(list_error("polls", polls))
+        if not any(errors):
+            for i, poll in enumerate(polls, 1):
+                errors.append(text_error(f"polls[{i}].question", poll.get("question")))
+                options = poll.get("options")
+                if not isinstance(options, list) or not 2 <= len(options) <= 4:
+                    errors.append(f"опрос {i} должен содержать от 2 до 4 вариантов ответа")
+                else:
+                    errors += [text_error(f"polls[{i}].options", option) for option in options]
+        if any(errors):
+            return None, None, "; ".join(filter(None, errors))
+        return build_poll_config(name, polls), polls, None
+    return None, None, f"неизвестный шаблон: {template!r}"
+
+def prepare_definition(line_no, line):
+    """Parse and validate one JSONL line. Returns ``(line_no, row, error)``."""
+    try:
+        definition = json.loads(line)
+    except ValueError as e:
+        return line_no, None, f"некорректный JSON: {e}"
+    if not isinstance(definition, dict):
+        return line_no, None, "строка должна содержать JSON-объект"
+    bot_token = definition.get("token")
+    is_valid, error = validate_bot_token(bot_token)
+    if not is_valid:
+        return line_no, None, error
+    user_id = definition.get("user_id", 1)
+    if not isinstance(user_id, int):
+        return line_no, None, "user_id должен быть числом"
+    config, polls, error = definition_config(definition)
+    if error:
+        return line_no, None, error
+    is_valid, error = validate_config(config)
+    if not is_valid:
+        return line_no, None, f"ошибка в конфигурации: {error}"
+    stored = CanonicalConfig(config)
+    return line_no, (user_id, config["bot_name"], stored.text, stored.digest, bot_token, polls), None
+
+def prepare_chunk(chunk):
+    return [prepare_definition(line_no, line) for line_no, line in chunk]
+
+def generate_bot_file(config_text, config_id, config_hash):
+    from generate import generate
+    output_file = f"bots/bot_{config_id}.py"
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    generate(json.loads(config_text), output_file, config_id, config_hash)
+    return output_file
+
+def read_definitions(path):
+    """``(line_no, line)`` chunks of the non-empty lines of a JSONL file ("-" is stdin)."""
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        chunk = []
+        for line_no, line in enumerate(f, 1):
+            if line.strip():
+                chunk.append((line_no, line))
+                if len(chunk) >= IMPORT_CHUNK_SIZE:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+def iter_prepared(chunks, pool, window):
+    """Validate chunks in ``pool`` (inline when None), keeping at most ``window`` in flight, in input order."""
+    if pool is None:
+        for chunk in chunks:
+            yield from prepare_chunk(chunk)
+        return
+    pending = deque()
+    for chunk in chunks:
+        pending.append(pool.submit(prepare_chunk, chunk))
+        if len(pending) >= window:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
+
+def insert_batch(conn, batch):
+    """Insert prepared rows in one transaction; a failing row is rolled back alone."""
+    inserted, errors = [], []
+    c = conn.cursor()
+    c.execute("BEGIN")
+    for line_no, row in batch:
+        user_id, bot_name, config_text, config_hash, bot_token, polls = row
+        c.execute("SAVEPOINT import_row")
+        try:
+            config_id = insert_bot(c, user_id, bot_name, config_text, config_hash, bot_token, polls)
+        except sqlite3.Error as e:
+            c.execute("ROLLBACK TO import_row")
+            errors.append((line_no, f"ошибка базы данных: {e}"))
+        else:
+            inserted.append((line_no, config_id, row))
+        c.execute("RELEASE import_row")
+    c.execute("COMMIT")
+    return inserted, errors
+
+async def finish_batch(conn, batch, pool, action, counts, report):
+    inserted, errors = insert_batch(conn, batch)
+    for line_no, error in errors:
+        report(line_no, error)
+    counts["imported"] += len(inserted)
+    if not action:
+        return
+    if pool is not None:
+        futures = [pool.submit(generate_bot_file, row[2], config_id, row[3]) for _, config_id, row in inserted]
+    for i, (line_no, config_id, row) in enumerate(inserted):
+        try:
+            if pool is None:
+                generate_bot_file(row[2], config_id, row[3])
+            else:
+                futures[i].result()
+        except Exception as e:
+            report(line_no, f"ошибка генерации бота {config_id}: {e}")
+            continue
+        counts["generated"] += 1
+        if action == "launch":
+            try:
+                # The script was just generated with the same hash, so only the process is started
+                await generate_and_run_bot(CanonicalConfig(json.loads(row[2])), row[4], config_id)
+            except Exception as e:
+                report(line_no, f"ошибка запуска бота {config_id}: {e}")
+            else:
+                counts["launched"] += 1
+
+async def import_bots(path, workers, batch_size, action=None):
+    """Create bots from a JSONL file; ``action`` is None, "generate" or "launch"."""
+    counts = {"imported": 0, "failed": 0, "generated": 0, "launched": 0}
+
+    def report(line_no, error):
+        counts["failed"] += 1
+        print(f"Строка {line_no}: {error}")
+
+    pool = None
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(workers)
+    conn = connect_db(isolation_level=None)
+    try:
+        batch = []
+        results = iter_prepared(read_definitions(path), pool, window=workers * 4)
+        for line_no, row, error in results:
+            if error:
+                report(line_no, error)
+            else:
+                batch.append((line_no, row))
+            if len(batch) >= batch_size:
+                await finish_batch(conn, batch, pool, action, counts, report)
+                batch = []
+        if batch:
+            await finish_batch(conn, batch, pool, action, counts, report)
+    finally:
+        conn.close()
+        if pool is not None:
+            pool.shutdown()
+    print(f"Импорт завершен: создано {counts['imported']}, ошибок {counts['failed']}"
+          + (f", сгенерировано {counts['generated']}" if action else "")
+          + (f", запущено {counts['launched']}" if action == "launch" else ""))
+    return counts
+
+async def broadcast(config_id, text, resume_id, concurrency):
+    from utils.utils_broadcast import create_broadcast, run_broadcast
+    if resume_id:
+        broadcast_id = resume_id
+    else:
+        if not text or not text.strip():
+            print("Ошибка: текст рассылки не может быть пустым.")
+            return
+        conn = connect_db()
+        c = conn.cursor()
+        c.execute("SELECT user_id FROM bot_configs WHERE config_id = ?", (config_id,))
+        row = c.fetchone()
+        conn.close()
+        if not row:
+            print(f"Ошибка: бот с ID {config_id} не найден.")
+            return
+        # The builder reports to the owner when it resumes the job
+        broadcast_id = create_broadcast(config_id, row[0], text)
+    print(f"Рассылка {broadcast_id} запущена...")
+    try:
+        counts = await run_broadcast(broadcast_id, concurrency=concurrency)
+    except ValueError as e:
+        print(f"Ошибка: {e}.")
+        return
+    print(f"Рассылка {broadcast_id} завершена. Доставлено: {counts['delivered']}, "
+          f"заблокировали бота: {counts['blocked']}, ошибок: {counts['failed']}")
+
+async def profile(config_id, seconds, limit):
+    from utils.utils_profiler import PROFILE_WAIT_SLACK, read_collapsed, request_profile, top_functions, wait_for_profile
+    conn = connect_db()
+    c = conn.cursor()
+    c.execute("SELECT pid FROM bot_configs WHERE config_id = ?", (config_id,))
+    row = c.fetchone()
+    conn.close()
+    if not row:
+        print(f"Ошибка: бот с ID {config_id} не найден.")
+        return
+    if not row[0]:
+        print(f"Ошибка: бот {config_id} не запущен.")
+        return
+    try:
+        since = request_profile(config_id, row[0], seconds)
+    except OSError as e:
+        print(f"Ошибка: не удалось запустить профилирование: {e}")
+        return
+    print(f"Профилирую бота {config_id} {seconds} с...")
+    path = await wait_for_profile(config_id, since, seconds + PROFILE_WAIT_SLACK)
+    if path is None:
+        print(f"Ошибка: бот {config_id} не прислал профиль.")
+        return
+    counts = read_collapsed(path)
+    print(f"Профиль записан в {path} ({sum(counts.values())} сэмплов)")
+    for name, count, share in top_functions(counts, limit):
+        print(f"{share:6.1%} {count:6d}  {name}")
+
+def poll_stats(config_id, resolution, buckets):
+    import time
+    from utils.utils_poll_stats import DAY, HOUR, stats_table
+    step = {"hour": HOUR, "day": DAY}[resolution]
+    conn = connect_db()
+    c = conn.cursor()
+    c.execute("SELECT poll_id, question FROM polls WHERE config_id = ? ORDER BY poll_id", (config_id,))
+    polls = c.fetchall()
+    conn.close()
+    if not polls:
+        print(f"Ошибка: у бота {config_id} нет опросов.")
+        return
+    since = time.time() - buckets * step
+    for poll_id, question in polls:
+        print(f"Опрос {poll_id}: {question}")
+        print(stats_table(poll_id, step, since) or "нет ответов")
+        print()
+
+async def serve_fleet(concurrency, check_tokens):
+    from utils.utils_supervisor import serve
+
+    def report(counts):
+        print(f"Боты запущены: готовы {counts['ready']}, еще не готовы {counts['slow']}, "
+              f"ошибок {counts['failed']}, отклонено токенов {counts['rejected']}. "
+              f"Слежу за процессами, остановка по SIGTERM или Ctrl+C.")
+
+    counts = await serve(concurrency, check_tokens, on_started=report)
+    print(f"Остановлено. Перезапусков за время работы: {counts['restarts']}")
+
+def bench(names, sizes, repeat, seed, output, baseline):
+    from benchmarks import suite
+    print(suite.RESULT_HEADER)
+    try:
+        report = suite.run(names, sizes, repeat, seed, progress=lambda row: print(suite.format_result(row), flush=True))
+    except ValueError as e:
+        print(f"Ошибка: {e}")
+        return
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output == "-":
+        print(text)
+    else:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"Результаты записаны в {output}")
+    if baseline:
+        with open(baseline, encoding="utf-8") as f:
+            previous = json.load(f)
+        print(f"\n{'бенчмарк':<20}{'размер':>8}{'было мс':>12}{'стало мс':>12}{'x':>8}")
+        for name, size, before, after, ratio in suite.compare(report, previous):
+            print(f"{name:<20}{size:>8}{before:>12.4f}{after:>12.4f}{ratio:>8.2f}")
+
 def main():
+    setup_logging()
     init_db()
     parser = argparse.ArgumentParser(description="CLI для генерации Telegram-ботов")
     subparsers = parser.add_subparsers(dest="command")
@@ -220,12 +520,58 @@ def main():
     parser_poll.add_argument("--token", required=True, help="Токен бота от @BotFather")
     parser_poll.add_argument("--polls", nargs="+", help="Список опросов в формате 'вопрос:вариант1,вариант2,...'")
 
+    # Команда для рассылки сообщения всем пользователям бота
+    parser_broadcast = subparsers.add_parser("broadcast", help="Разослать сообщение всем пользователям бота")
+    parser_broadcast.add_argument("--id", type=int, help="ID бота")
+    parser_broadcast.add_argument("--text", help="Текст рассылки")
+    parser_broadcast.add_argument("--resume", type=int, help="ID прерванной рассылки для продолжения")
+    parser_broadcast.add_argument("--concurrency", type=int, default=10, help="Число одновременных отправок")
+
+    # Команда для профилирования запущенного бота
+    parser_profile = subparsers.add_parser("profile", help="Снять профиль CPU запущенного бота")
+    parser_profile.add_argument("--id", type=int, required=True, help="ID бота")
+    parser_profile.add_argument("--seconds", type=float, default=10, help="Длительность профилирования")
+    parser_profile.add_argument("--top", type=int, default=15, help="Сколько функций показать")
+
+    # Команда для статистики опросов по времени
+    parser_poll_stats = subparsers.add_parser("poll_stats", help="Показать ответы на опросы бота по часам или дням")
+    parser_poll_stats.add_argument("--id", type=int, required=True, help="ID бота")
+    parser_poll_stats.add_argument("--resolution", choices=("hour", "day"), default="hour", help="Шаг таблицы")
+    parser_poll_stats.add_argument("--buckets", type=int, default=24, help="Сколько последних часов или дней показать")
+
+    # Команда для массового импорта ботов из JSONL
+    parser_import = subparsers.add_parser("import", help="Создать ботов из JSONL-файла, по одному на строку")
+    parser_import.add_argument("--file", required=True, help="Путь к JSONL-файлу или - для stdin")
+    parser_import.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Процессов для проверки")
+    parser_import.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="Строк в одной транзакции")
+    action = parser_import.add_mutually_exclusive_group()
+    action.add_argument("--generate", action="store_const", const="generate", dest="action",
+                        help="Сгенерировать скрипты ботов")
+    action.add_argument("--launch", action="store_const", const="launch", dest="action",
+                        help="Сгенерировать и запустить ботов")
+
+    # Команда для запуска всех сохраненных ботов
+    parser_serve = subparsers.add_parser("serve", help="Запустить всех сохраненных ботов и следить за ними")
+    parser_serve.add_argument("--concurrency", type=int, default=os.cpu_count() or 1,
+                              help="Сколько ботов запускать одновременно")
+    parser_serve.add_argument("--no-token-check", action="store_false", dest="check_tokens",
+                              help="Не проверять токены через getMe перед запуском")
+
+    # Команда для замеров производительности
+    parser_bench = subparsers.add_parser("bench", help="Запустить набор бенчмарков и сохранить результаты в JSON")
+    parser_bench.add_argument("--only", help="Бенчмарки через запятую (по умолчанию все)")
+    parser_bench.add_argument("--sizes", default="10,100,1000", help="Размеры входных данных через запятую")
+    parser_bench.add_argument("--repeat", type=int, default=5, help="Повторов каждого замера")
+    parser_bench.add_argument("--seed", type=int, default=1, help="Seed генератора входных данных")
+    parser_bench.add_argument("--output", default="bench.json", help="Файл для JSON с результатами или - для stdout")
+    parser_bench.add_argument("--compare", help="JSON предыдущего запуска для сравнения")
+
     args = parser.parse_args()
 
     if args.command == "business_card":
-        asyncio.run(create_business_card(
+        asyncio.run(run_command(create_business_card(
             args.name, args.token, args.welcome, args.phone, args.email, args.website, args.help_text
-        ))
+        )))
     elif args.command == "faq":
         faqs = []
         if args.faqs:
@@ -240,7 +586,7 @@ def main():
         if not faqs:
             print("Ошибка: укажите хотя бы один вопрос и ответ в формате 'вопрос:ответ'.")
             return
-        asyncio.run(create_faq(args.name, args.token, faqs))
+        asyncio.run(run_command(create_faq(args.name, args.token, faqs)))
     elif args.command == "poll":
         polls = []
         if args.polls:
@@ -259,7 +605,24 @@ def main():
         if not polls:
             print("Ошибка: укажите хотя бы один опрос в формате 'вопрос:вариант1,вариант2,...'.")
             return
-        asyncio.run(create_poll(args.name, args.token, polls))
+        asyncio.run(run_command(create_poll(args.name, args.token, polls)))
+    elif args.command == "broadcast":
+        if not args.resume and (args.id is None or args.text is None):
+            print("Ошибка: укажите --id и --text или --resume.")
+            return
+        asyncio.run(broadcast(args.id, args.text, args.resume, args.concurrency))
+    elif args.command == "import":
+        asyncio.run(import_bots(args.file, args.workers, max(1, args.batch_size), args.action))
+    elif args.command == "serve":
+        asyncio.run(run_command(serve_fleet(args.concurrency, args.check_tokens)))
+    elif args.command == "bench":
+        names = [name.strip() for name in args.only.split(",")] if args.only else None
+        sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+        bench(names, sizes, max(2, args.repeat), args.seed, args.output, args.compare)
+    elif args.command == "profile":
+        asyncio.run(profile(args.id, args.seconds, args.top))
+    elif args.command == "poll_stats":
+        poll_stats(args.id, args.resolution, max(1, args.buckets))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
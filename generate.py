@@ -1,82 +1,130 @@
+import hashlib
 import os
-import json
+import re
 import logging
-from aiogram import Bot, Dispatcher
-from aiogram.enums import ParseMode
-from aiogram.filters import Command
-from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
-from aiogram.fsm.storage.memory import MemoryStorage
-from aiogram.client.default import DefaultBotProperties
-from dotenv import load_dotenv
-import sqlite3
+
+from utils.utils_callbacks import assign_version, encode_token
 
 logger = logging.getLogger(__name__)
 
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+CONFIG_HASH_PREFIX = "# config_hash: "
+GENERATOR_VERSION_PREFIX = " generator: "
+# Changes whenever this file does, so scripts are regenerated after a generator change
+with open(__file__, 'rb') as _source:
+    GENERATOR_VERSION = hashlib.sha256(_source.read()).hexdigest()[:12]
+# Keyboards with more rows are split into pages with ◀️/▶️ navigation
+KEYBOARD_PAGE_ROWS = 8
+
 def escape_python_string(text):
     if not text:
         return '""'
     return repr(text)[1:-1].replace('\"', '\\\"')
 
-def generate(config, output_file, config_id):
-    script_lines = [
-        "import sqlite3",
-        "import logging",
-        "import os",
-        "import sys",
-        "from aiogram import Bot, Dispatcher",
-        "from aiogram.enums import ParseMode",
-        "from aiogram.filters import Command",
-        "from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery",
-        "from aiogram.fsm.storage.memory import MemoryStorage",
-        "from aiogram.client.default import DefaultBotProperties",
-        "from dotenv import load_dotenv",
-        "",
-        "logging.basicConfig(level=logging.DEBUG, stream=sys.stdout)",
-        "logger = logging.getLogger(__name__)",
-        "",
-        "load_dotenv()",
-        "BOT_TOKEN = os.getenv('BOT_TOKEN', 'YOUR_TELEGRAM_BOT_TOKEN')",
-        "",
-        "def init_db():",
-        "    conn = sqlite3.connect('bot_users.db')",
-        "    c = conn.cursor()",
-        "    c.execute('''",
-        "        CREATE TABLE IF NOT EXISTS polls (",
-        "            poll_id INTEGER PRIMARY KEY AUTOINCREMENT,",
-        "            config_id INTEGER,",
-        "            question TEXT,",
-        "            options TEXT,",
-        "            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,",
-        "            FOREIGN KEY (config_id) REFERENCES bot_configs (config_id)",
-        "        )",
-        "    ''')",
-        "    c.execute('''",
-        "        CREATE TABLE IF NOT EXISTS poll_responses (",
-        "            response_id INTEGER PRIMARY KEY AUTOINCREMENT,",
-        "            user_id INTEGER,",
-        "            poll_id INTEGER,",
-        "            config_id INTEGER,",
-        "            option_text TEXT,",
-        "            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,",
-        "            FOREIGN KEY (config_id) REFERENCES bot_configs (config_id),",
-        "            FOREIGN KEY (poll_id) REFERENCES polls (poll_id)",
-        "        )",
-        "    ''')",
-        "    conn.commit()",
-        "    conn.close()",
-        "",
-        "def save_poll_response(user_id, poll_id, config_id, option_text):",
-        "    conn = sqlite3.connect('bot_users.db')",
-        "    c = conn.cursor()",
-        "    c.execute('INSERT INTO poll_responses (user_id, poll_id, config_id, option_text) VALUES (?, ?, ?, ?)',",
-        "              (user_id, poll_id, config_id, option_text))",
-        "    conn.commit()",
-        "    conn.close()",
-        "",
-        "dp = Dispatcher(storage=MemoryStorage())",
-        "bot = Bot(BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN_V2))",
-        "",
-    ]
+def generated_config_hash(output_file):
+    # Generated scripts record the hash of the config they were built from and
+    # the generator version; a script from another version counts as outdated
+    try:
+        with open(output_file, encoding='utf-8') as f:
+            first_line = f.readline().rstrip("\n")
+    except OSError:
+        return None
+    if not first_line.startswith(CONFIG_HASH_PREFIX):
+        return None
+    config_hash, _, version = first_line[len(CONFIG_HASH_PREFIX):].partition(GENERATOR_VERSION_PREFIX)
+    return config_hash if version == GENERATOR_VERSION else None
+
+def generate(config, output_file, config_id, config_hash=None):
+    # Configs built with MessageBuilder carry plain text plus entities;
+    # older configs hold MarkdownV2-escaped text.
+    use_entities = config.get('format') == 'entities'
+    # Seconds between in-place edits of a poll message showing its results
+    live_results = config.get('live_results')
+    live_polls = {}
+    entity_lines = []
+    keyboards = []
+    paged_keyboards = []
+    handler_lines = []
+    # Every callback key gets a dense id; keyboards are rendered once the
+    # version of the key table is known
+    callback_ids = {}
+    callback_functions = {}
+    # Questions and answers of the /faq menu, matched against free text
+    faq_entries = []
+    faq_answers = []
+
+    def send_args(text, entities=None):
+        literal = f'"{escape_python_string(text)}"'
+        if not use_entities:
+            return f"{literal}, parse_mode=ParseMode.MARKDOWN_V2"
+        if not entities:
+            return f"{literal}, parse_mode=None"
+        # Entity lists are built once at import, not on every send
+        name = f"ENTITIES_{len(entity_lines)}"
+        entity_lines.append(f"{name} = [{', '.join(f'MessageEntity(**{entity!r})' for entity in entities)}]")
+        return f"{literal}, entities={name}, parse_mode=None"
+
+    def button_source(button, version):
+        button_text = escape_python_string(button['text'])
+        if button.get('url'):
+            return f'{{ "text": "{button_text}", "url": "{escape_python_string(button["url"])}" }}'
+        callback_data = encode_token(version, callback_ids[button['callback_data']])
+        return f'{{ "text": "{button_text}", "callback_data": "{callback_data}" }}'
+
+    def markup_source(rows, version):
+        return "InlineKeyboardMarkup(inline_keyboard=[{}])".format(
+            ', '.join(f"[{', '.join(button_source(button, version) for button in row)}]" for row in rows)
+        )
+
+    def keyboard_source(reply_markup):
+        rows = reply_markup.get('inline_keyboard', [])
+        name = f"KEYBOARD_{len(keyboards)}"
+        if len(rows) <= KEYBOARD_PAGE_ROWS:
+            pages = None
+            reference = name
+        else:
+            keyboard_index = len(paged_keyboards)
+            page_count = (len(rows) + KEYBOARD_PAGE_ROWS - 1) // KEYBOARD_PAGE_ROWS
+            pages = []
+            for page in range(page_count):
+                navigation = [{"text": f"{page + 1}/{page_count}", "callback_data": "pg"}]
+                if page > 0:
+                    navigation.insert(0, {"text": "◀️", "callback_data": f"pg:{keyboard_index}:{page - 1}"})
+                if page < page_count - 1:
+                    navigation.append({"text": "▶️", "callback_data": f"pg:{keyboard_index}:{page + 1}"})
+                pages.append(rows[page * KEYBOARD_PAGE_ROWS:(page + 1) * KEYBOARD_PAGE_ROWS] + [navigation])
+            paged_keyboards.append(f"{name}_PAGES")
+            reference = f"{name}_PAGES[0]"
+        for page_rows in pages or [rows]:
+            for row in page_rows:
+                for button in row:
+                    if not button.get('url'):
+                        callback_ids.setdefault(button['callback_data'], len(callback_ids))
+        keyboards.append((name, rows, pages))
+        return reference
+
+    def keyboard_lines(version):
+        # Markups are built once at import and shared by every send
+        lines = []
+        for name, rows, pages in keyboards:
+            if pages is None:
+                lines.append(f"{name} = {markup_source(rows, version)}")
+            else:
+                lines.append(f"{name}_PAGES = [\n" + "".join(f"    {markup_source(page, version)},\n" for page in pages) + "]")
+        if paged_keyboards:
+            lines.append(f"KEYBOARD_PAGES = [{', '.join(paged_keyboards)}]")
+        return lines
+
+    def save_response_lines(save_response):
+        poll_id = save_response.get('poll_id')
+        option_text = escape_python_string(save_response.get('option_text'))
+        thank_you = send_args(save_response.get('thank_you_text'), save_response.get('thank_you_entities'))
+        return [
+            f"    await asyncio.to_thread(save_poll_response, callback.from_user.id, {poll_id}, {config_id}, '{option_text}')",
+            f"    await callback.message.answer({thank_you})",
+        ]
+
+    callback_handlers = {h['callback_query'] for h in config.get('handlers', []) if h.get('callback_query')}
 
     for handler in config.get('handlers', []):
         command = handler.get('command')
@@ -85,78 +133,219 @@ def generate(config, output_file, config_id):
         reply_markup = handler.get('reply_markup')
         save_response = handler.get('save_response')
 
-        escaped_text = f'"{escape_python_string(text)}"'
+        if callback_query and save_response and live_results:
+            # The vote edits the poll message instead of answering with new ones
+            poll_id = save_response.get('poll_id')
+            option_text = save_response.get('option_text')
+            # The first line of the handler text heads the results, which list the options themselves
+            question = (text or '').split("\n", 1)[0]
+            if not use_entities:
+                question = re.sub(r'\\(.)', r'\1', question)
+            live_polls.setdefault(poll_id, (question, []))[1].append(option_text)
+            function_name = callback_functions[callback_query] = "callback_{}_handler".format(re.sub(r'\W', '_', callback_query))
+            handler_lines += [
+                f"async def {function_name}(callback: CallbackQuery) -> None:",
+                f'    await asyncio.to_thread(save_poll_response, callback.from_user.id, {poll_id}, {config_id}, "{escape_python_string(option_text)}")',
+                f'    await LIVE_RESULTS.vote(callback, {poll_id}, "{escape_python_string(option_text)}")',
+                "",
+            ]
+            continue
+
+        text_args = send_args(text, handler.get('entities'))
 
         if command:
-            script_lines.append(f"@dp.message(Command('{command[1:]}'))")
-            script_lines.append(f"async def command_{command[1:]}_handler(message: Message) -> None:")
+            handler_lines.append(f"@dp.message(Command('{command[1:]}'))")
+            handler_lines.append(f"async def command_{command[1:]}_handler(message: Message) -> None:")
             if reply_markup:
-                keyboard_buttons = []
-                for row in reply_markup.get('inline_keyboard', []):
-                    row_buttons = []
-                    for button in row:
-                        button_text = escape_python_string(button['text'])
-                        callback_data = escape_python_string(button['callback_data'])
-                        row_buttons.append(f'{{ "text": "{button_text}", "callback_data": "{callback_data}" }}')
-                    keyboard_buttons.append(f"[{', '.join(row_buttons)}]")
-                keyboard = f"InlineKeyboardMarkup(inline_keyboard=[{', '.join(keyboard_buttons)}])"
-                script_lines.append(f"    keyboard = {keyboard}")
-                script_lines.append(f"    await message.answer({escaped_text}, reply_markup=keyboard, parse_mode=ParseMode.MARKDOWN_V2)")
+                handler_lines.append(f"    await message.answer({text_args}, reply_markup={keyboard_source(reply_markup)})")
             else:
-                script_lines.append(f"    await message.answer({escaped_text}, parse_mode=ParseMode.MARKDOWN_V2)")
-            script_lines.append("")
+                handler_lines.append(f"    await message.answer({text_args})")
+            handler_lines.append("")
+
+            # Buttons that answer with a fixed response get their own callback handler
+            for row in (reply_markup or {}).get('inline_keyboard', []):
+                for button in row:
+                    data = button.get('callback_data')
+                    if not data or 'response' not in button or data in callback_handlers:
+                        continue
+                    callback_handlers.add(data)
+                    response_args = send_args(button['response'], button.get('response_entities'))
+                    if command == '/faq':
+                        faq_entries.append((button['text'], button['response']))
+                        faq_answers.append(f"dict(text={response_args})")
+                    function_name = callback_functions[data] = "callback_{}_handler".format(re.sub(r'\W', '_', data))
+                    handler_lines.append(f"async def {function_name}(callback: CallbackQuery) -> None:")
+                    handler_lines.append(f"    await callback.message.answer({response_args})")
+                    handler_lines.append("    await callback.answer()")
+                    handler_lines.append("")
 
         elif callback_query:
+            function_name = callback_functions[callback_query] = "callback_{}_handler".format(re.sub(r'\W', '_', callback_query))
+            handler_lines.append(f"async def {function_name}(callback: CallbackQuery) -> None:")
             if reply_markup:
-                keyboard_buttons = []
-                for row in reply_markup.get('inline_keyboard', []):
-                    row_buttons = []
-                    for button in row:
-                        button_text = escape_python_string(button['text'])
-                        callback_data = escape_python_string(button['callback_data'])
-                        row_buttons.append(f'{{ "text": "{button_text}", "callback_data": "{callback_data}" }}')
-                    keyboard_buttons.append(f"[{', '.join(row_buttons)}]")
-                keyboard = f"InlineKeyboardMarkup(inline_keyboard=[{', '.join(keyboard_buttons)}])"
-
-                script_lines.append(f"@dp.callback_query(lambda c: c.data == '{callback_query}')")
-                script_lines.append(f"async def callback_{callback_query}_handler(callback: CallbackQuery) -> None:")
-                script_lines.append(f"    keyboard = {keyboard}")
-                script_lines.append(f"    await callback.message.answer({escaped_text}, reply_markup=keyboard, parse_mode=ParseMode.MARKDOWN_V2)")
-                if save_response:
-                    poll_id = save_response.get('poll_id')
-                    option_text = escape_python_string(save_response.get('option_text'))
-                    thank_you_text = escape_python_string(save_response.get('thank_you_text'))
-                    script_lines.append(f"    save_poll_response(callback.from_user.id, {poll_id}, {config_id}, '{option_text}')")
-                    script_lines.append(f"    await callback.message.answer('{thank_you_text}', parse_mode=ParseMode.MARKDOWN_V2)")
-                script_lines.append("    await callback.answer()")
-                script_lines.append("")
-            elif save_response:
-                poll_id = save_response.get('poll_id')
-                option_text = escape_python_string(save_response.get('option_text'))
-                thank_you_text = escape_python_string(save_response.get('thank_you_text'))
-                script_lines.append(f"@dp.callback_query(lambda c: c.data == '{callback_query}')")
-                script_lines.append(f"async def callback_{callback_query}_handler(callback: CallbackQuery) -> None:")
-                script_lines.append(f"    await callback.message.answer({escaped_text}, parse_mode=ParseMode.MARKDOWN_V2)")
-                script_lines.append(f"    save_poll_response(callback.from_user.id, {poll_id}, {config_id}, '{option_text}')")
-                script_lines.append(f"    await callback.message.answer('{thank_you_text}', parse_mode=ParseMode.MARKDOWN_V2)")
-                script_lines.append("    await callback.answer()")
-                script_lines.append("")
+                handler_lines.append(
+                    f"    await callback.message.answer({text_args}, reply_markup={keyboard_source(reply_markup)})"
+                )
             else:
-                script_lines.append(f"@dp.callback_query(lambda c: c.data == '{callback_query}')")
-                script_lines.append(f"async def callback_{callback_query}_handler(callback: CallbackQuery) -> None:")
-                script_lines.append(f"    await callback.message.answer({escaped_text}, parse_mode=ParseMode.MARKDOWN_V2)")
-                script_lines.append("    await callback.answer()")
-                script_lines.append("")
+                handler_lines.append(f"    await callback.message.answer({text_args})")
+            if save_response:
+                handler_lines.extend(save_response_lines(save_response))
+            handler_lines.append("    await callback.answer()")
+            handler_lines.append("")
+
+    if paged_keyboards:
+        handler_lines += [
+            "async def show_keyboard_page(callback: CallbackQuery, keyboard: int, page: int) -> None:",
+            "    await callback.message.edit_reply_markup(reply_markup=KEYBOARD_PAGES[keyboard][page])",
+            "    await callback.answer()",
+            "",
+        ]
+        for data in callback_ids:
+            if data in callback_functions:
+                continue
+            if data == 'pg':
+                # The page counter only needs an answer
+                callback_functions[data] = "lambda callback: callback.answer()"
+            elif data.startswith('pg:'):
+                _, keyboard, page = data.split(':')
+                callback_functions[data] = f"lambda callback: show_keyboard_page(callback, {keyboard}, {page})"
+
+    callback_keys = list(callback_ids)
+    version, versions = assign_version(output_file, callback_keys) if callback_keys else (0, {})
+    if callback_keys:
+        # One handler resolves every press by indexing the table of the button's version
+        # Older versions map each of their ids to the current id of the same key
+        old_versions = [(old, tuple(callback_ids.get(key) for key in keys))
+                        for old, keys in sorted(versions.items()) if old != version]
+        handler_lines.append("CALLBACK_KEYS = (")
+        handler_lines += [f'    "{escape_python_string(key)}",' for key in callback_keys]
+        handler_lines.append(")")
+        handler_lines.append(f"CALLBACKS = CallbackTable({version}, (")
+        handler_lines += [f"    {callback_functions.get(key, 'None')}," for key in callback_keys]
+        handler_lines.append("), CALLBACK_KEYS, {")
+        handler_lines += [f"    {old}: {ids!r}," for old, ids in old_versions]
+        handler_lines.append("})")
+        handler_lines += [
+            "",
+            "@dp.callback_query()",
+            "async def callback_handler(callback: CallbackQuery) -> None:",
+            "    handler = CALLBACKS.resolve(callback.data)",
+            "    if handler is None:",
+            "        await callback.answer(STALE_BUTTON_TEXT)",
+            "    else:",
+            "        await handler(callback)",
+            "",
+        ]
+
+    if faq_entries:
+        # Registered last so commands and buttons take precedence
+        handler_lines += [
+            "@dp.message(lambda m: m.text is not None and not m.text.startswith('/'))",
+            "async def faq_search_handler(message: Message) -> None:",
+            "    entry_id = FAQ_INDEX.answer(message.text)",
+            "    if entry_id is None:",
+            "        await command_faq_handler(message)",
+            "    else:",
+            "        await message.answer(**FAQ_ANSWERS[entry_id])",
+            "",
+        ]
+
+    # Import only what the handlers above use: every module costs bot startup time
+    has_callbacks = bool(callback_keys or callback_handlers)
+    has_keyboards = bool(keyboards)
+    saves_responses = any('save_poll_response' in line for line in handler_lines)
+    types = ["Message"] + (["MessageEntity"] if entity_lines else []) + \
+        (["InlineKeyboardMarkup"] if has_keyboards else []) + (["CallbackQuery"] if has_callbacks else [])
+
+    script_lines = [f"{CONFIG_HASH_PREFIX}{config_hash}{GENERATOR_VERSION_PREFIX}{GENERATOR_VERSION}"] if config_hash else []
+    script_lines += ["import logging", "import os", "import sys"]
+    if saves_responses:
+        # Votes are written off the event loop
+        script_lines.append("import asyncio")
+    script_lines.append("from aiogram import Dispatcher")
+    if not use_entities:
+        script_lines.append("from aiogram.client.default import DefaultBotProperties")
+        script_lines.append("from aiogram.enums import ParseMode")
+    script_lines.append("from aiogram.filters import Command")
+    script_lines.append(f"from aiogram.types import {', '.join(types)}")
+    script_lines += [
+        "",
+        # Scripts live in <project>/bots/; resolved at run time so the checkout can move
+        "PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))",
+        "sys.path.insert(0, PROJECT_ROOT)",
+        "from utils.utils_telegram import create_bot",
+        "from utils.utils_dedup import DedupMiddleware",
+        "from utils.utils_logging import bot_log_file, setup_logging",
+        "from utils.utils_profiler import bot_profile_dir, install_profiler",
+    ]
+    if callback_keys:
+        script_lines.append("from utils.utils_callbacks import STALE_BUTTON_TEXT, CallbackTable")
+    if saves_responses:
+        script_lines.append("from utils.utils_db import connect_db")
+        script_lines.append("from utils.utils_polls import init_poll_tables, save_poll_response")
+    if faq_entries:
+        script_lines.append("from utils.utils_faq import FaqIndex")
+    if live_polls:
+        script_lines.append("from utils.utils_live import LiveResults")
+    script_lines += [
+        "",
+        "logger = logging.getLogger(__name__)",
+        "",
+        "if 'BOT_TOKEN' not in os.environ:",
+        "    from dotenv import load_dotenv",
+        "    load_dotenv()",
+        "BOT_TOKEN = os.getenv('BOT_TOKEN', 'YOUR_TELEGRAM_BOT_TOKEN')",
+        "",
+    ]
+    if saves_responses:
+        script_lines += [
+            "def init_db():",
+            "    conn = connect_db()",
+            "    init_poll_tables(conn)",
+            "    conn.close()",
+            "",
+        ]
+    script_lines += [
+        "dp = Dispatcher()",
+        "dp.update.outer_middleware(DedupMiddleware())",
+        "bot = create_bot(BOT_TOKEN)" if use_entities else
+        "bot = create_bot(BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN_V2))",
+        "",
+    ]
+    script_lines.extend(entity_lines)
+    if entity_lines:
+        script_lines.append("")
+    script_lines.extend(keyboard_lines(version))
+    if keyboards:
+        script_lines.append("")
+    if live_polls:
+        script_lines.append("LIVE_RESULTS = LiveResults({")
+        for poll_id, (question, options) in live_polls.items():
+            option_literals = "".join(f'"{escape_python_string(option)}", ' for option in options)
+            script_lines.append(f'    {poll_id}: ("{escape_python_string(question)}", ({option_literals})),')
+        script_lines += [f"}}, interval={live_results!r})", ""]
+    if faq_entries:
+        # The index is built once at startup, lookups then stay sub-millisecond
+        script_lines.append("FAQ_INDEX = FaqIndex([")
+        script_lines += [f'    ("{escape_python_string(question)}", "{escape_python_string(answer)}"),'
+                         for question, answer in faq_entries]
+        script_lines.append("])")
+        script_lines.append("FAQ_ANSWERS = [")
+        script_lines += [f"    {answer}," for answer in faq_answers]
+        script_lines += ["]", ""]
+    script_lines.extend(handler_lines)
 
     script_lines.append("async def main():")
-    script_lines.append("    init_db()")
+    if saves_responses:
+        script_lines.append("    init_db()")
     script_lines.append("    await dp.start_polling(bot)")
     script_lines.append("")
     script_lines.append("if __name__ == '__main__':")
     script_lines.append("    import asyncio")
-    script_lines.append("    import sys")
+    script_lines.append(f"    setup_logging(bot_log_file({config_id}, os.path.dirname(os.path.abspath(__file__))), bot_id={config_id})")
+    script_lines.append(f"    install_profiler({config_id}, bot_profile_dir(os.path.dirname(os.path.abspath(__file__))))")
     script_lines.append("    asyncio.run(main())")
 
     with open(output_file, 'w', encoding='utf-8') as f:
         f.write("\n".join(script_lines))
-    logger.info(f"Successfully generated bot script at {output_file}")
\ No newline at end of file
+    logger.info("Successfully generated bot script at %s", output_file)
\ No newline at end of file
@@ -1,98 +1,78 @@
 
 import asyncio
-import sys
-import sqlite3
 import json
 import os
-import subprocess
-import psutil
-import aiohttp
 import logging
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
-from aiogram.filters import CommandStart, Command
-from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
+from aiogram.filters import CommandStart, Command, CommandObject
+from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery, FSInputFile
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.client.default import DefaultBotProperties
-from utils.utils_validation import validate_config, validate_block_schema
+from utils.utils_validation import is_valid_text, validate_config, validate_bot_token
+from utils.utils_telegram import check_bot_token, close_session, create_bot
+from utils.utils_broadcast import claim_unfinished_broadcasts, create_broadcast, run_broadcast
+from utils.utils_dedup import DedupMiddleware
+from utils.utils_fleet import FleetSampler
+from utils.utils_config import CanonicalConfig
+from utils.utils_db import connect_db
+from utils.utils_logging import LogTail, bot_log_file, format_log_line, setup_logging
+from utils.utils_metrics import (
+    BOTS_CREATED, REGISTRY, ApiMetricsMiddleware, HandlerMetricsMiddleware, start_metrics_server
+)
+from utils.utils_poll_stats import DAY, HOUR, stats_table
+from utils.utils_profiler import PROFILE_WAIT_SLACK, read_collapsed, request_profile, top_functions, wait_for_profile
+from utils.utils_ratelimit import limiter_stats, observe_waits
+from utils.utils_runner import generate_and_run_bot, init_db
+from utils.utils_text import MessageBuilder, escape_markdown
 from dotenv import load_dotenv
 
-logging.basicConfig(level=logging.DEBUG, stream=sys.stdout)
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN", "YOUR_TELEGRAM_BOT_TOKEN")
 
-def init_db():
-    conn = sqlite3.connect('bot_users.db')
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            user_id INTEGER PRIMARY KEY,
-            username TEXT,
-            first_name TEXT,
-            last_name TEXT,
-            registered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS bot_configs (
-            config_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            bot_name TEXT,
-            config_json TEXT,
-            bot_token TEXT,
-            pid INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (user_id)
-        )
-    ''')
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS polls (
-            poll_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            config_id INTEGER,
-            question TEXT,
-            options TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (config_id) REFERENCES bot_configs (config_id)
-        )
-    ''')
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS poll_responses (
-            response_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            poll_id INTEGER,
-            config_id INTEGER,
-            option_text TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (config_id) REFERENCES bot_configs (config_id),
-            FOREIGN KEY (poll_id) REFERENCES polls (poll_id)
-        )
-    ''')
-    try:
-        c.execute('ALTER TABLE bot_configs ADD COLUMN bot_token TEXT')
-    except sqlite3.OperationalError:
-        pass
-    try:
-        c.execute('ALTER TABLE bot_configs ADD COLUMN pid INTEGER')
-    except sqlite3.OperationalError:
-        pass
-    c.execute('SELECT config_id, pid FROM bot_configs WHERE pid IS NOT NULL')
-    for config_id, pid in c.fetchall():
-        try:
-            process = psutil.Process(pid)
-            process.terminate()
-            process.wait(timeout=3)
-        except (psutil.NoSuchProcess, psutil.TimeoutExpired):
-            pass
-        c.execute('UPDATE bot_configs SET pid = NULL WHERE config_id = ?', (config_id,))
-    conn.commit()
-    conn.close()
-
 dp = Dispatcher(storage=MemoryStorage())
-bot = Bot(BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN_V2))
+dedup_middleware = DedupMiddleware(counter=REGISTRY.counter(
+    "builder_dedup_dropped_total", "Duplicate updates and repeated presses dropped"))
+dp.update.outer_middleware(dedup_middleware)
+dp.message.middleware(HandlerMetricsMiddleware())
+dp.callback_query.middleware(HandlerMetricsMiddleware())
+bot = create_bot(BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN_V2))
+bot.session.middleware(ApiMetricsMiddleware())
+# Empty METRICS_PORT turns the endpoint off
+METRICS_PORT = os.getenv("METRICS_PORT", "9100")
+ADMIN_IDS = {int(user_id) for user_id in os.getenv("ADMIN_IDS", "").replace(",", " ").split()}
+fleet_sampler = FleetSampler()
+
+
+def active_wizards():
+    counts = {}
+    for record in dp.storage.storage.values():
+        if record.state:
+            form = (record.state.split(":", 1)[0],)
+            counts[form] = counts.get(form, 0) + 1
+    return counts
+
+
+REGISTRY.gauge("builder_active_wizards", "Users in the middle of a wizard, by form", ("form",),
+               callback=active_wizards)
+REGISTRY.gauge("telegram_send_queue_depth", "Sends waiting for the rate limiter, by bot", ("bot_id",),
+               callback=lambda: {(bot_id,): stats["queue_depth"] for bot_id, stats in limiter_stats().items()})
+observe_waits(REGISTRY.histogram("telegram_send_wait_seconds", "Time sends waited for the rate limiter, by bot",
+                                 ("bot_id",)))
+for name, key, help_text in (
+    ("fleet_bots_running", "bots", "Generated bots sampled in the last pass"),
+    ("fleet_bots_missing", "missing", "Bots with a pid whose process is gone"),
+    ("fleet_outliers", "outliers", "Bots over the CPU or RSS alert level"),
+    ("fleet_cpu_percent", "cpu", "CPU used by all generated bots, percent of one core"),
+    ("fleet_rss_bytes", "rss", "Resident memory of all generated bots"),
+    ("fleet_open_fds", "fds", "Open file descriptors of all generated bots"),
+    ("fleet_threads", "threads", "Threads of all generated bots"),
+):
+    REGISTRY.gauge(name, help_text, callback=lambda key=key: fleet_sampler.totals()[key])
 
 class RegistrationForm(StatesGroup):
     name = State()
@@ -108,6 +88,12 @@ class BotCreationForm(StatesGroup):
     website = State()
     help_text = State()
 
+# Generated bots page long keyboards, so these only bound the wizard's length
+MAX_FAQS = 200
+MAX_POLLS = 100
+# Seconds between in-place edits of a poll message in live-results mode
+LIVE_RESULTS_INTERVAL = 5
+
 class FAQCreationForm(StatesGroup):
     faq_count = State()
     faq_question = State()
@@ -118,55 +104,113 @@ class PollCreationForm(StatesGroup):
     poll_question = State()
     poll_options_count = State()
     poll_option = State()
+    live_results = State()
 
 class BotDeleteForm(StatesGroup):
     config_id = State()
 
+class BroadcastForm(StatesGroup):
+    config_id = State()
+    text = State()
+
+# Menus are sent as plain text plus entities, built once at import
+MAIN_MENU_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [
+        InlineKeyboardButton(text="Создать бота", callback_data="menu_create_bot"),
+        InlineKeyboardButton(text="Список ботов", callback_data="menu_list_bots"),
+    ],
+    [
+        InlineKeyboardButton(text="Удалить бота", callback_data="menu_delete_bot"),
+    ],
+])
+TEMPLATE_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [
+        InlineKeyboardButton(text="Визитка", callback_data="template_business_card"),
+        InlineKeyboardButton(text="FAQ", callback_data="template_faq"),
+        InlineKeyboardButton(text="Опросник", callback_data="template_poll"),
+    ],
+])
+WELCOME_MESSAGE = MessageBuilder().bold("Привет!").text(" 👋 Добро пожаловать в билдер Telegram-ботов.\nВыберите действие:").as_kwargs()
+MENU_MESSAGE = MessageBuilder().bold("Меню").text(" 📋\nВыберите действие:").as_kwargs()
+CREATE_BOT_MESSAGE = MessageBuilder().bold("Создание бота").text(" 🤖\nВыберите шаблон для нового бота:").as_kwargs()
+NO_BOTS_MESSAGE = MessageBuilder().text("У вас пока ").bold("нет ботов").text(".").as_kwargs()
+
+def error_message(details):
+    return MessageBuilder().bold("Ошибка").text(f" ⚠️\n{details}").as_kwargs()
+
+def success_message(bot_name, config_id):
+    return MessageBuilder().bold("Успех").text(f" 🎉\nБот '{bot_name}' успешно создан и запущен! ID: {config_id}").as_kwargs()
+
+LOGS_DEFAULT_LINES = 20
+LOGS_MAX_LINES = 100
+# Telegram's limit is 4096 characters, leave room for the header
+LOGS_MAX_CHARS = 4000
+log_tails = {}
+STATS_TOP_BOTS = 5
+PROFILE_DEFAULT_SECONDS = 10
+PROFILE_MAX_SECONDS = 60
+POLL_STATS_RESOLUTIONS = {"hour": HOUR, "day": DAY}
+# One message per poll, the newest ones
+POLL_STATS_MAX_POLLS = 10
+
+def profile_message(config_id, counts):
+    total = sum(counts.values())
+    lines = "\n".join(f"{share:6.1%} {name}" for name, _, share in top_functions(counts))
+    builder = MessageBuilder().bold(f"Профиль бота {config_id}").text(f"\nСэмплов: {total}. Чаще всего на вершине стека:\n")
+    return builder.pre(lines or "пусто").as_kwargs()
+
+def poll_stats_message(poll_id, question, table):
+    if len(table) > LOGS_MAX_CHARS:
+        table = table[-LOGS_MAX_CHARS:].split("\n", 1)[-1]
+    builder = MessageBuilder().bold(f"Опрос {poll_id}").text(f"\n{question[:LOGS_MAX_CHARS // 4]}\n")
+    return builder.pre(table or "нет ответов").as_kwargs()
+
+def fleet_stats_message(sampler):
+    totals = sampler.totals()
+    builder = MessageBuilder().bold("Ресурсы ботов").text(
+        f"\nЗапущено: {totals['bots']}, пропало: {totals['missing']}, с перегрузкой: {totals['outliers']}\n"
+        f"CPU: {totals['cpu']:.1f}%, RSS: {totals['rss'] / 2**20:.1f} МБ, "
+        f"файлов: {totals['fds']}, потоков: {totals['threads']}"
+    )
+    top = sorted(sampler.latest.items(), key=lambda item: item[1]['rss'], reverse=True)[:STATS_TOP_BOTS]
+    if top:
+        lines = "\n".join(
+            f"{config_id}: CPU {sample['cpu']:.1f}%, RSS {sample['rss'] / 2**20:.1f} МБ"
+            + (f" ⚠️ {', '.join(sampler.outliers[config_id])}" if config_id in sampler.outliers else "")
+            for config_id, sample in top
+        )
+        builder.text("\n\n").bold("Больше всего памяти").text("\n").pre(lines)
+    if sampler.missing:
+        builder.text(f"\n\nПроцесс не найден: {', '.join(map(str, sorted(sampler.missing)))}")
+    return builder.as_kwargs()
+
+def bots_list_message(bots):
+    if not bots:
+        return NO_BOTS_MESSAGE
+    lines = "\n".join(f"ID: {config_id}, Имя: {bot_name}" for config_id, bot_name in bots)
+    return MessageBuilder().bold("Ваши боты").text(f" 🤖\n{lines}").as_kwargs()
+
 @dp.message(Command("start"))
 async def command_start_handler(message: Message, state: FSMContext) -> None:
     logger.debug("Processing /start command")
-    conn = sqlite3.connect('bot_users.db')
+    conn = connect_db()
     c = conn.cursor()
     c.execute('SELECT * FROM users WHERE user_id = ?', (message.from_user.id,))
     user = c.fetchone()
     conn.close()
     if user:
-        keyboard_buttons = [
-            [
-                InlineKeyboardButton(text="Создать бота", callback_data="menu_create_bot"),
-                InlineKeyboardButton(text="Список ботов", callback_data="menu_list_bots"),
-            ],
-            [
-                InlineKeyboardButton(text="Удалить бота", callback_data="menu_delete_bot"),
-            ],
-        ]
-        keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
-        text = "*Привет\\!* 👋 Добро пожаловать в билдер Telegram\\-ботов\\.\nВыберите действие:"
-        logger.debug(f"Sending message: {text}")
-        await message.answer(text, reply_markup=keyboard, parse_mode=ParseMode.MARKDOWN_V2)
+        logger.debug("Sending message: %s", WELCOME_MESSAGE['text'])
+        await message.answer(**WELCOME_MESSAGE, reply_markup=MAIN_MENU_KEYBOARD)
     else:
         text = "*Привет\\!* 👋 Давай зарегистрируем тебя\\.\nВведи свое имя:"
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.set_state(RegistrationForm.name)
 
-def escape_markdown(text):
-
-    if not text:
-        return text
-    special_chars = r'_[]()*~`>#+-=|{}.!?'
-    escaped_text = ''
-    for char in text:
-        if char in special_chars:
-            escaped_text += '\\' + char
-        else:
-            escaped_text += char
-    return escaped_text
-
 @dp.message(Command("help"))
 async def command_help_handler(message: Message) -> None:
     text = "*Помощь* ℹ️\nИспользуйте /menu для управления ботами или /start для начала работы\\."
-    logger.debug(f"Sending message: {text}")
+    logger.debug("Sending message: %s", text)
     await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
 
 @dp.message(Command("faq"))
@@ -183,50 +227,41 @@ async def command_faq_handler(message: Message) -> None:
     ]
     keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
     text = "*Часто задаваемые вопросы* ❓\nВыберите интересующий вопрос\\."
-    logger.debug(f"Sending message: {text}")
+    logger.debug("Sending message: %s", text)
     await message.answer(text, reply_markup=keyboard, parse_mode=ParseMode.MARKDOWN_V2)
 
 @dp.callback_query(lambda c: c.data == "faq_what_do_you_do")
 async def callback_faq_what_do_you_do_handler(callback: CallbackQuery) -> None:
     text = "Мы создаем *крутые Telegram\\-боты*\\! 🚀"
-    logger.debug(f"Sending message: {text}")
+    logger.debug("Sending message: %s", text)
     await callback.message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
     await callback.answer()
 
 @dp.callback_query(lambda c: c.data == "faq_contact")
 async def callback_faq_contact_handler(callback: CallbackQuery) -> None:
     text = "Напишите на почту user\\@example\\.com или позвоните \\+1234567890\\."
-    logger.debug(f"Sending message: {text}")
+    logger.debug("Sending message: %s", text)
     await callback.message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
     await callback.answer()
 
 @dp.callback_query(lambda c: c.data == "faq_location")
 async def callback_faq_location_handler(callback: CallbackQuery) -> None:
     text = "Наш офис находится в *центре города*\\."
-    logger.debug(f"Sending message: {text}")
+    logger.debug("Sending message: %s", text)
     await callback.message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
     await callback.answer()
 
 @dp.callback_query(lambda c: c.data == "faq_q2")
 async def callback_faq_q2_handler(callback: CallbackQuery) -> None:
     text = "Ответ на вопрос 2"
-    logger.debug(f"Sending message: {text}")
+    logger.debug("Sending message: %s", text)
     await callback.message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
     await callback.answer()
 
 @dp.message(Command("create_bot"))
 async def create_bot_handler(message: Message, state: FSMContext) -> None:
-    keyboard_buttons = [
-        [
-            InlineKeyboardButton(text="Визитка", callback_data="template_business_card"),
-            InlineKeyboardButton(text="FAQ", callback_data="template_faq"),
-            InlineKeyboardButton(text="Опросник", callback_data="template_poll"),
-        ],
-    ]
-    keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
-    text = "*Создание бота* 🤖\nВыберите шаблон для нового бота:"
-    logger.debug(f"Sending message: {text}")
-    await message.answer(text, reply_markup=keyboard, parse_mode=ParseMode.MARKDOWN_V2)
+    logger.debug("Sending message: %s", CREATE_BOT_MESSAGE['text'])
+    await message.answer(**CREATE_BOT_MESSAGE, reply_markup=TEMPLATE_KEYBOARD)
     await state.set_state(BotCreationForm.template)
 
 @dp.callback_query(lambda c: c.data.startswith("template_"))
@@ -235,19 +270,19 @@ async def process_template_selection(callback: CallbackQuery, state: FSMContext)
     if template == "business_card":
         await state.update_data(template=template, config={"bot_name": "", "handlers": []})
         text = "Введите *имя нового бота*:"
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await callback.message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.set_state(BotCreationForm.bot_name)
     elif template == "faq":
         await state.update_data(template=template, config={"bot_name": "", "handlers": []}, faq_list=[])
         text = "Введите *имя нового бота*:"
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await callback.message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.set_state(BotCreationForm.bot_name)
     elif template == "poll":
         await state.update_data(template=template, config={"bot_name": "", "handlers": []}, poll_list=[])
         text = "Введите *имя нового бота*:"
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await callback.message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.set_state(BotCreationForm.bot_name)
     await callback.answer()
@@ -256,13 +291,13 @@ async def process_template_selection(callback: CallbackQuery, state: FSMContext)
 async def process_bot_name(message: Message, state: FSMContext) -> None:
     if message.text == "/cancel":
         text = "*Создание бота отменено* ❌"
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.clear()
         return
     if not is_valid_text(message.text):
         text = "*Ошибка* ⚠️\nИмя бота содержит недопустимые символы\\.\nИспользуйте буквы, цифры, пробелы и знаки препинания \\(кроме \\_\\, \\*\\, \\[\\, \\]\\, \\(\\, \\)\\, \\~\\, \\`\\, \\>\\, \\#\\, \\+\\, \\-\\, \\=\\, \\|\\, \\{\\, \\}\\, \\.\\, \\!\\, \\?\\)\\."
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         return
     await state.update_data(bot_name=message.text)
@@ -271,7 +306,7 @@ async def process_bot_name(message: Message, state: FSMContext) -> None:
     config['bot_name'] = message.text
     await state.update_data(config=config)
     text = "Введите *токен бота*, полученный от @BotFather \\(или /cancel\\):"
-    logger.debug(f"Sending message: {text}")
+    logger.debug("Sending message: %s", text)
     await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
     await state.set_state(BotCreationForm.bot_token)
 
@@ -279,62 +314,61 @@ async def process_bot_name(message: Message, state: FSMContext) -> None:
 async def process_bot_token(message: Message, state: FSMContext) -> None:
     if message.text == "/cancel":
         text = "*Создание бота отменено* ❌"
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.clear()
         return
     bot_token = message.text.strip()
-    if not bot_token.count(":") == 1 or not bot_token.split(":")[0].isdigit():
+    is_valid, error = validate_bot_token(bot_token)
+    if not is_valid:
         text = "*Ошибка* ⚠️\nНекорректный формат токена\\.\nПопробуйте снова или /cancel\\."
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
+        await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
+        return
+    is_valid, error = await check_bot_token(bot_token)
+    if not is_valid:
+        text = f"*Ошибка* ⚠️\nНедействительный токен: {escape_markdown(error)}\\.\nПопробуйте снова или /cancel\\."
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         return
-    async with aiohttp.ClientSession() as session:
-        async with session.get(f"https://api.telegram.org/bot{bot_token}/getMe") as response:
-            data = await response.json()
-            if not data.get("ok"):
-                text = f"*Ошибка* ⚠️\nНедействительный токен: {escape_markdown(str(data.get('description', 'Ошибка')))}\\.\nПопробуйте снова или /cancel\\."
-                logger.debug(f"Sending message: {text}")
-                await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
-                return
     await state.update_data(bot_token=bot_token)
     template = (await state.get_data())['template']
     if template == "business_card":
         text = "Введите *текст приветствия* для команды /start \\(или /skip для значения по умолчанию\\):"
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.set_state(BotCreationForm.welcome_text)
     elif template == "faq":
-        text = "Сколько вопросов FAQ вы хотите добавить\\? \\(*1\\-4* или /cancel\\):"
-        logger.debug(f"Sending message: {text}")
+        text = f"Сколько вопросов FAQ вы хотите добавить\\? \\(*1\\-{MAX_FAQS}* или /cancel\\):"
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.set_state(FAQCreationForm.faq_count)
     elif template == "poll":
-        text = "Сколько опросов вы хотите добавить\\? \\(*1\\-4* или /cancel\\):"
-        logger.debug(f"Sending message: {text}")
+        text = f"Сколько опросов вы хотите добавить\\? \\(*1\\-{MAX_POLLS}* или /cancel\\):"
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.set_state(PollCreationForm.poll_count)
     text = "*Токен принят* ✅"
-    logger.debug(f"Sending message: {text}")
+    logger.debug("Sending message: %s", text)
     await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
 
 @dp.message(BotCreationForm.welcome_text)
 async def process_welcome_text(message: Message, state: FSMContext) -> None:
     if message.text == "/cancel":
         text = "*Создание бота отменено* ❌"
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.clear()
         return
-    welcome_text = message.text if message.text != "/skip" else "Привет\\! Я бот\\-визитка\\.\nЗдесь вы можете найти всю необходимую информацию обо мне\\."
+    welcome_text = message.text if message.text != "/skip" else "Привет! Я бот-визитка.\nЗдесь вы можете найти всю необходимую информацию обо мне."
     if not is_valid_text(welcome_text):
         text = "*Ошибка* ⚠️\nТекст приветствия содержит недопустимые символы\\.\nИспользуйте буквы, цифры, пробелы и знаки препинания \\(кроме \\_\\, \\*\\, \\[\\, \\]\\, \\(\\, \\)\\, \\~\\, \\`\\, \\>\\, \\#\\, \\+\\, \\-\\, \\=\\, \\|\\, \\{\\, \\}\\, \\.\\, \\!\\, \\?\\)\\."
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         return
     await state.update_data(welcome_text=welcome_text)
     text = "Введите *номер телефона* \\(например, \\+1234567890\\) или /skip:"
-    logger.debug(f"Sending message: {text}")
+    logger.debug("Sending message: %s", text)
     await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
     await state.set_state(BotCreationForm.phone)
 
@@ -342,7 +376,7 @@ async def process_welcome_text(message: Message, state: FSMContext) -> None:
 async def process_phone(message: Message, state: FSMContext) -> None:
     if message.text == "/cancel":
         text = "*Создание бота отменено* ❌"
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.clear()
         return
@@ -351,12 +385,12 @@ async def process_phone(message: Message, state: FSMContext) -> None:
         phone = phone.replace(" ", "").replace("tel:", "")
         if not phone.startswith("+") or not phone[1:].isdigit() or len(phone) < 7:
             text = "*Ошибка* ⚠️\nНомер телефона должен начинаться с \\+ и содержать только цифры \\(например, \\+79522046894\\)\\.\nМинимум 6 цифр\\.\nПопробуйте снова или /skip\\."
-            logger.debug(f"Sending message: {text}")
+            logger.debug("Sending message: %s", text)
             await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
             return
     await state.update_data(phone=phone)
     text = "Введите *email* \\(например, user\\@example\\.com\\) или /skip:"
-    logger.debug(f"Sending message: {text}")
+    logger.debug("Sending message: %s", text)
     await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
     await state.set_state(BotCreationForm.email)
 
@@ -364,19 +398,19 @@ async def process_phone(message: Message, state: FSMContext) -> None:
 async def process_email(message: Message, state: FSMContext) -> None:
     if message.text == "/cancel":
         text = "*Создание бота отменено* ❌"
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.clear()
         return
     email = message.text if message.text != "/skip" else None
     if email and "@" not in email:
         text = "*Ошибка* ⚠️\nНекорректный формат email\\.\nПопробуйте снова или /skip\\."
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         return
     await state.update_data(email=email)
     text = "Введите *URL сайта* \\(например, https://example\\.com\\) или /skip:"
-    logger.debug(f"Sending message: {text}")
+    logger.debug("Sending message: %s", text)
     await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
     await state.set_state(BotCreationForm.website)
 
@@ -384,19 +418,19 @@ async def process_email(message: Message, state: FSMContext) -> None:
 async def process_website(message: Message, state: FSMContext) -> None:
     if message.text == "/cancel":
         text = "*Создание бота отменено* ❌"
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.clear()
         return
     website = message.text if message.text != "/skip" else None
     if website and not website.startswith(('http://', 'https://')):
         text = "*Ошибка* ⚠️\nURL должен начинаться с http:// или https://\\.\nПопробуйте снова или /skip\\."
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         return
     await state.update_data(website=website)
     text = "Введите *текст для команды /help* \\(или /skip для значения по умолчанию\\):"
-    logger.debug(f"Sending message: {text}")
+    logger.debug("Sending message: %s", text)
     await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
     await state.set_state(BotCreationForm.help_text)
 
@@ -404,74 +438,60 @@ async def process_website(message: Message, state: FSMContext) -> None:
 async def process_help_text(message: Message, state: FSMContext) -> None:
     if message.text == "/cancel":
         text = "*Создание бота отменено* ❌"
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.clear()
         return
-    help_text = message.text if message.text != "/skip" else "Используйте /start для просмотра визитки\\."
+    help_text = message.text if message.text != "/skip" else "Используйте /start для просмотра визитки."
     if not is_valid_text(help_text):
         text = "*Ошибка* ⚠️\nТекст помощи содержит недопустимые символы\\.\nИспользуйте буквы, цифры, пробелы и знаки препинания \\(кроме \\_\\, \\*\\, \\[\\, \\]\\, \\(\\, \\)\\, \\~\\, \\`\\, \\>\\, \\#\\, \\+\\, \\-\\, \\=\\, \\|\\, \\{\\, \\}\\, \\.\\, \\!\\, \\?\\)\\."
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         return
     await state.update_data(help_text=help_text)
     await finalize_business_card(message, state)
 
-def is_valid_text(text):
-
-    if not text:
-        return False
-    allowed_chars = set(
-        "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 ,:;@#$%^&" +
-        "абвгдеёжзийклмнопрстуфхцчшщъыьэюяАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ"
-    )
-    invalid_chars = set(text) - allowed_chars
-    if invalid_chars:
-        logger.debug(f"Invalid characters found in text: {invalid_chars}")
-        return False
-    return len(text.strip()) > 0
-
 @dp.message(FAQCreationForm.faq_count)
 async def process_faq_count(message: Message, state: FSMContext) -> None:
     if message.text == "/cancel":
         text = "*Создание бота отменено* ❌"
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.clear()
         return
     try:
         faq_count = int(message.text)
-        if faq_count < 1 or faq_count > 4:
-            text = "*Ошибка* ⚠️\nЧисло вопросов должно быть от *1* до *4*\\.\nПопробуйте снова или /cancel\\."
-            logger.debug(f"Sending message: {text}")
+        if faq_count < 1 or faq_count > MAX_FAQS:
+            text = f"*Ошибка* ⚠️\nЧисло вопросов должно быть от *1* до *{MAX_FAQS}*\\.\nПопробуйте снова или /cancel\\."
+            logger.debug("Sending message: %s", text)
             await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
             return
         await state.update_data(faq_count=faq_count, current_faq=1)
         text = "Введите текст *первого вопроса FAQ*:"
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.set_state(FAQCreationForm.faq_question)
     except ValueError:
         text = "*Ошибка* ⚠️\nВведите число или /cancel\\."
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
 
 @dp.message(FAQCreationForm.faq_question)
 async def process_faq_question(message: Message, state: FSMContext) -> None:
     if message.text == "/cancel":
         text = "*Создание бота отменено* ❌"
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.clear()
         return
     if not is_valid_text(message.text):
         text = "*Ошибка* ⚠️\nВопрос FAQ содержит недопустимые символы\\.\nИспользуйте буквы, цифры, пробелы и знаки препинания \\(кроме \\_\\, \\*\\, \\[\\, \\]\\, \\(\\, \\)\\, \\~\\, \\`\\, \\>\\, \\#\\, \\+\\, \\-\\, \\=\\, \\|\\, \\{\\, \\}\\, \\.\\, \\!\\, \\?\\)\\."
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         return
     await state.update_data(faq_question=message.text)
     text = f"Введите *ответ* на вопрос '{escape_markdown(message.text)}':"
-    logger.debug(f"Sending message: {text}")
+    logger.debug("Sending message: %s", text)
     await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
     await state.set_state(FAQCreationForm.faq_answer)
 
@@ -479,13 +499,13 @@ async def process_faq_question(message: Message, state: FSMContext) -> None:
 async def process_faq_answer(message: Message, state: FSMContext) -> None:
     if message.text == "/cancel":
         text = "*Создание бота отменено* ❌"
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.clear()
         return
     if not is_valid_text(message.text):
         text = "*Ошибка* ⚠️\nОтвет FAQ содержит недопустимые символы\\.\nИспользуйте буквы, цифры, пробелы и знаки препинания \\(кроме \\_\\, \\*\\, \\[\\, \\]\\, \\(\\, \\)\\, \\~\\, \\`\\, \\>\\, \\#\\, \\+\\, \\-\\, \\=\\, \\|\\, \\{\\, \\}\\, \\.\\, \\!\\, \\?\\)\\."
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         return
     user_data = await state.get_data()
@@ -497,7 +517,7 @@ async def process_faq_answer(message: Message, state: FSMContext) -> None:
     if current_faq < faq_count:
         await state.update_data(current_faq=current_faq + 1)
         text = f"Введите текст вопроса FAQ *{current_faq + 1}*:"
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.set_state(FAQCreationForm.faq_question)
     else:
@@ -507,43 +527,43 @@ async def process_faq_answer(message: Message, state: FSMContext) -> None:
 async def process_poll_count(message: Message, state: FSMContext) -> None:
     if message.text == "/cancel":
         text = "*Создание бота отменено* ❌"
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.clear()
         return
     try:
         poll_count = int(message.text)
-        if poll_count < 1 or poll_count > 4:
-            text = "*Ошибка* ⚠️\nЧисло опросов должно быть от *1* до *4*\\.\nПопробуйте снова или /cancel\\."
-            logger.debug(f"Sending message: {text}")
+        if poll_count < 1 or poll_count > MAX_POLLS:
+            text = f"*Ошибка* ⚠️\nЧисло опросов должно быть от *1* до *{MAX_POLLS}*\\.\nПопробуйте снова или /cancel\\."
+            logger.debug("Sending message: %s", text)
             await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
             return
         await state.update_data(poll_count=poll_count, current_poll=1, current_options=[])
         text = "Введите текст *первого вопроса опроса*:"
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.set_state(PollCreationForm.poll_question)
     except ValueError:
         text = "*Ошибка* ⚠️\nВведите число или /cancel\\."
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
 
 @dp.message(PollCreationForm.poll_question)
 async def process_poll_question(message: Message, state: FSMContext) -> None:
     if message.text == "/cancel":
         text = "*Создание бота отменено* ❌"
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.clear()
         return
     if not is_valid_text(message.text):
         text = "*Ошибка* ⚠️\nВопрос опроса содержит недопустимые символы\\.\nИспользуйте буквы, цифры, пробелы и знаки препинания \\(кроме \\_\\, \\*\\, \\[\\, \\]\\, \\(\\, \\)\\, \\~\\, \\`\\, \\>\\, \\#\\, \\+\\, \\-\\, \\=\\, \\|\\, \\{\\, \\}\\, \\.\\, \\!\\, \\?\\)\\."
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         return
     await state.update_data(poll_question=message.text)
     text = "Сколько вариантов ответа для этого опроса\\? \\(*2\\-4* или /cancel\\):"
-    logger.debug(f"Sending message: {text}")
+    logger.debug("Sending message: %s", text)
     await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
     await state.set_state(PollCreationForm.poll_options_count)
 
@@ -551,7 +571,7 @@ async def process_poll_question(message: Message, state: FSMContext) -> None:
 async def process_poll_options_count(message: Message, state: FSMContext) -> None:
     if message.text == "/cancel":
         text = "*Создание бота отменено* ❌"
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.clear()
         return
@@ -559,30 +579,30 @@ async def process_poll_options_count(message: Message, state: FSMContext) -> Non
         options_count = int(message.text)
         if options_count < 2 or options_count > 4:
             text = "*Ошибка* ⚠️\nЧисло вариантов ответа должно быть от *2* до *4*\\.\nПопробуйте снова или /cancel\\."
-            logger.debug(f"Sending message: {text}")
+            logger.debug("Sending message: %s", text)
             await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
             return
         await state.update_data(options_count=options_count, current_option=1, current_options=[])
         text = "Введите текст *первого варианта ответа* для опроса:"
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.set_state(PollCreationForm.poll_option)
     except ValueError:
         text = "*Ошибка* ⚠️\nВведите число или /cancel\\."
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
 
 @dp.message(PollCreationForm.poll_option)
 async def process_poll_option(message: Message, state: FSMContext) -> None:
     if message.text == "/cancel":
         text = "*Создание бота отменено* ❌"
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.clear()
         return
     if not is_valid_text(message.text):
         text = "*Ошибка* ⚠️\nВариант ответа содержит недопустимые символы\\.\nИспользуйте буквы, цифры, пробелы и знаки препинания \\(кроме \\_\\, \\*\\, \\[\\, \\]\\, \\(\\, \\)\\, \\~\\, \\`\\, \\>\\, \\#\\, \\+\\, \\-\\, \\=\\, \\|\\, \\{\\, \\}\\, \\.\\, \\!\\, \\?\\)\\."
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         return
     user_data = await state.get_data()
@@ -594,7 +614,7 @@ async def process_poll_option(message: Message, state: FSMContext) -> None:
     if current_option < options_count:
         await state.update_data(current_option=current_option + 1)
         text = f"Введите текст *варианта ответа {current_option + 1}*:"
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.set_state(PollCreationForm.poll_option)
     else:
@@ -609,38 +629,60 @@ async def process_poll_option(message: Message, state: FSMContext) -> None:
         if current_poll < poll_count:
             await state.update_data(current_poll=current_poll + 1, current_options=[])
             text = f"Введите текст вопроса опроса *{current_poll + 1}*:"
-            logger.debug(f"Sending message: {text}")
+            logger.debug("Sending message: %s", text)
             await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
             await state.set_state(PollCreationForm.poll_question)
         else:
-            await finalize_poll(message, state)
+            text = "Показывать *результаты голосования* прямо в сообщении опроса\\? \\(*да/нет* или /cancel\\):"
+            logger.debug("Sending message: %s", text)
+            await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
+            await state.set_state(PollCreationForm.live_results)
+
+@dp.message(PollCreationForm.live_results)
+async def process_poll_live_results(message: Message, state: FSMContext) -> None:
+    if message.text == "/cancel":
+        text = "*Создание бота отменено* ❌"
+        logger.debug("Sending message: %s", text)
+        await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
+        await state.clear()
+        return
+    answer = (message.text or "").lower()
+    if answer not in ("да", "нет"):
+        text = "*Ошибка* ⚠️\nОтветьте *да* или *нет*, или /cancel\\."
+        logger.debug("Sending message: %s", text)
+        await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
+        return
+    await state.update_data(live_results=answer == "да")
+    await finalize_poll(message, state)
 
 async def finalize_business_card(message: Message, state: FSMContext):
     user_data = await state.get_data()
     config = user_data['config']
     bot_token = user_data['bot_token']
-    welcome_text = escape_markdown(user_data['welcome_text'])
-    phone = escape_markdown(user_data.get('phone')) if user_data.get('phone') else None
-    email = escape_markdown(user_data.get('email')) if user_data.get('email') else None
-    website = escape_markdown(user_data.get('website')) if user_data.get('website') else None
-    help_text = escape_markdown(user_data['help_text'])
+    welcome_text = user_data['welcome_text']
+    phone = user_data.get('phone')
+    email = user_data.get('email')
+    website = user_data.get('website')
+    help_text = user_data['help_text']
 
-    config['bot_name'] = escape_markdown(config['bot_name'])
+    config['format'] = 'entities'
 
-    contact_text = f"*{welcome_text}*\n\n📋 *Контактная информация:*\n"
+    card = MessageBuilder().bold(welcome_text).text("\n\n📋 ").bold("Контактная информация:").text("\n")
     if website:
-        contact_text += f"🌐 *Website:* {website}\n"
+        card.text("🌐 ").bold("Website:").text(" ").link(website, website).text("\n")
     if email:
-        contact_text += f"📧 *Email:* {email}\n"
+        card.text("📧 ").bold("Email:").text(f" {email}\n")
     if phone:
-        contact_text += f"📞 *Phone:* {phone}\n"
+        card.text("📞 ").bold("Phone:").text(f" {phone}\n")
     if not any([website, email, phone]):
-        contact_text += "ℹ️ Контактная информация не указана\\.\n"
+        card.text("ℹ️ Контактная информация не указана.\n")
+    contact_text, contact_entities = card.build()
 
     handlers = [
         {
             "command": "/start",
-            "text": contact_text
+            "text": contact_text,
+            "entities": contact_entities
         },
         {
             "command": "/help",
@@ -648,15 +690,15 @@ async def finalize_business_card(message: Message, state: FSMContext):
         },
         {
             "command": "/create_bot",
-            "text": "Начать создание нового бота\\."
+            "text": "Начать создание нового бота."
         },
         {
             "command": "/list_bots",
-            "text": "Показать список ваших ботов\\."
+            "text": "Показать список ваших ботов."
         },
         {
             "command": "/delete_bot",
-            "text": "Удалить бота\\."
+            "text": "Удалить бота."
         },
         {
             "command": "/menu",
@@ -664,11 +706,11 @@ async def finalize_business_card(message: Message, state: FSMContext):
             "reply_markup": {
                 "inline_keyboard": [
                     [
-                        {"text": "Создать бота", "callback_data": "menu_create_bot", "response": "Начнем создание бота\\!"},
-                        {"text": "Список ботов", "callback_data": "menu_list_bots", "response": "Показываю ваши боты\\."}
+                        {"text": "Создать бота", "callback_data": "menu_create_bot", "response": "Начнем создание бота!"},
+                        {"text": "Список ботов", "callback_data": "menu_list_bots", "response": "Показываю ваши боты."}
                     ],
                     [
-                        {"text": "Удалить бота", "callback_data": "menu_delete_bot", "response": "Выберите бота для удаления\\."}
+                        {"text": "Удалить бота", "callback_data": "menu_delete_bot", "response": "Выберите бота для удаления."}
                     ]
                 ]
             }
@@ -677,42 +719,37 @@ async def finalize_business_card(message: Message, state: FSMContext):
 
     config['handlers'] = handlers
 
-    logger.debug(f"Business card config: {json.dumps(config, ensure_ascii=False)}")
-    is_valid, error = validate_config(config)
+    config = CanonicalConfig(config)
+    logger.debug("Business card config: %s", config)
+    is_valid, error = validate_config(config.config)
     if not is_valid:
-        text = f"*Ошибка* ⚠️\nОшибка в конфигурации: {escape_markdown(str(error))}"
-        logger.debug(f"Sending message: {text}")
-        await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
-        await state.clear()
-        return
-    is_valid, error = validate_block_schema(config)
-    if not is_valid:
-        text = f"*Ошибка* ⚠️\nОшибка в конфигурации: {escape_markdown(str(error))}"
-        logger.debug(f"Sending message: {text}")
-        await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
+        reply = error_message(f"Ошибка в конфигурации: {error}")
+        logger.debug("Sending message: %s", reply['text'])
+        await message.answer(**reply)
         await state.clear()
         return
 
-    conn = sqlite3.connect('bot_users.db')
+    conn = connect_db()
     c = conn.cursor()
     c.execute(
-        'INSERT INTO bot_configs (user_id, bot_name, config_json, bot_token) VALUES (?, ?, ?, ?)',
-        (message.from_user.id, config['bot_name'], json.dumps(config), bot_token)
+        'INSERT INTO bot_configs (user_id, bot_name, config_json, config_hash, bot_token) VALUES (?, ?, ?, ?, ?)',
+        (message.from_user.id, config['bot_name'], config.text, config.digest, bot_token)
     )
     config_id = c.lastrowid
     conn.commit()
     conn.close()
+    BOTS_CREATED.inc("business_card")
 
     try:
         await generate_and_run_bot(config, bot_token, config_id)
-        text = f"*Успех* 🎉\nБот '{escape_markdown(config['bot_name'])}' успешно создан и запущен\\! ID: {config_id}"
-        logger.debug(f"Sending message: {text}")
-        await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
+        reply = success_message(config['bot_name'], config_id)
+        logger.debug("Sending message: %s", reply['text'])
+        await message.answer(**reply)
     except Exception as e:
-        logger.error(f"Error generating bot: {str(e)}")
-        text = f"*Ошибка* ⚠️\nОшибка при запуске бота: {escape_markdown(str(e))}"
-        logger.debug(f"Sending message: {text}")
-        await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
+        logger.error("Error generating bot: %s", e)
+        reply = error_message(f"Ошибка при запуске бота: {e}")
+        logger.debug("Sending message: %s", reply['text'])
+        await message.answer(**reply)
     finally:
         await state.clear()
 
@@ -722,13 +759,9 @@ async def finalize_faq(message: Message, state: FSMContext):
     bot_token = user_data['bot_token']
     faq_list = user_data.get('faq_list', [])
 
-    faq_list = [
-        {"question": escape_markdown(faq['question']), "answer": escape_markdown(faq['answer'])}
-        for faq in faq_list
-    ]
-    config['bot_name'] = escape_markdown(config['bot_name'])
+    config['format'] = 'entities'
 
-    faq_text = "*Часто задаваемые вопросы* ❓\nВыберите интересующий вопрос\\."
+    faq_text, faq_entities = MessageBuilder().bold("Часто задаваемые вопросы").text(" ❓\nВыберите интересующий вопрос.").build()
     keyboard_buttons = []
 
     for i, faq in enumerate(faq_list, 1):
@@ -744,59 +777,51 @@ async def finalize_faq(message: Message, state: FSMContext):
     handlers = [
         {
             "command": "/start",
-            "text": "Добро пожаловать в бот FAQ\\! Используйте /faq для просмотра вопросов\\."
+            "text": "Добро пожаловать в бот FAQ! Используйте /faq для просмотра вопросов."
         },
         {
             "command": "/faq",
             "text": faq_text,
+            "entities": faq_entities,
             "reply_markup": {"inline_keyboard": keyboard_buttons}
         }
     ]
 
     config['handlers'] = handlers
 
-    try:
-        logger.debug(f"FAQ config: {json.dumps(config, ensure_ascii=False)}")
-    except Exception as e:
-        logger.error(f"Failed to log config: {str(e)}")
+    config = CanonicalConfig(config)
+    logger.debug("FAQ config: %s", config)
 
-    is_valid, error = validate_config(config)
+    is_valid, error = validate_config(config.config)
     if not is_valid:
-        logger.error(f"Config validation failed: {error}")
-        text = f"*Ошибка* ⚠️\nОшибка в конфигурации: {escape_markdown(str(error))}"
-        logger.debug(f"Sending message: {text}")
-        await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
-        await state.clear()
-        return
-    is_valid, error = validate_block_schema(config)
-    if not is_valid:
-        logger.error(f"Schema validation failed: {error}")
-        text = f"*Ошибка* ⚠️\nОшибка в конфигурации: {escape_markdown(str(error))}"
-        logger.debug(f"Sending message: {text}")
-        await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
+        logger.error("Config validation failed: %s", error)
+        reply = error_message(f"Ошибка в конфигурации: {error}")
+        logger.debug("Sending message: %s", reply['text'])
+        await message.answer(**reply)
         await state.clear()
         return
 
-    conn = sqlite3.connect('bot_users.db')
+    conn = connect_db()
     c = conn.cursor()
     c.execute(
-        'INSERT INTO bot_configs (user_id, bot_name, config_json, bot_token) VALUES (?, ?, ?, ?)',
-        (message.from_user.id, config['bot_name'], json.dumps(config), bot_token)
+        'INSERT INTO bot_configs (user_id, bot_name, config_json, config_hash, bot_token) VALUES (?, ?, ?, ?, ?)',
+        (message.from_user.id, config['bot_name'], config.text, config.digest, bot_token)
     )
     config_id = c.lastrowid
     conn.commit()
     conn.close()
+    BOTS_CREATED.inc("faq")
 
     try:
         await generate_and_run_bot(config, bot_token, config_id)
-        text = f"*Успех* 🎉\nБот '{escape_markdown(config['bot_name'])}' успешно создан и запущен\\! ID: {config_id}"
-        logger.debug(f"Sending message: {text}")
-        await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
+        reply = success_message(config['bot_name'], config_id)
+        logger.debug("Sending message: %s", reply['text'])
+        await message.answer(**reply)
     except Exception as e:
-        logger.error(f"Error generating bot: {str(e)}")
-        text = f"*Ошибка* ⚠️\nОшибка при запуске бота: {escape_markdown(str(e))}"
-        logger.debug(f"Sending message: {text}")
-        await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
+        logger.error("Error generating bot: %s", e)
+        reply = error_message(f"Ошибка при запуске бота: {e}")
+        logger.debug("Sending message: %s", reply['text'])
+        await message.answer(**reply)
     finally:
         await state.clear()
 
@@ -806,24 +831,18 @@ async def finalize_poll(message: Message, state: FSMContext):
     bot_token = user_data['bot_token']
     poll_list = user_data.get('poll_list', [])
 
-    # Escape all poll questions and options
-    poll_list = [
-        {
-            "question": escape_markdown(poll['question']),
-            "options": [escape_markdown(opt) for opt in poll['options']]
-        }
-        for poll in poll_list
-    ]
-    config['bot_name'] = escape_markdown(config['bot_name'])
+    config['format'] = 'entities'
+    if user_data.get('live_results'):
+        config['live_results'] = LIVE_RESULTS_INTERVAL
 
-    poll_text = "*Опросы* 📊\nВыберите интересующий опрос\\."
+    poll_text, poll_entities = MessageBuilder().bold("Опросы").text(" 📊\nВыберите интересующий опрос.").build()
     keyboard_buttons = []
 
     # Store poll IDs for reference in generated bot
     poll_id_map = {}
 
     # Insert polls into database and map poll questions to IDs
-    conn = sqlite3.connect('bot_users.db')
+    conn = connect_db()
     c = conn.cursor()
     for i, poll in enumerate(poll_list, 1):
         c.execute(
@@ -847,11 +866,12 @@ async def finalize_poll(message: Message, state: FSMContext):
     handlers = [
         {
             "command": "/start",
-            "text": "Добро пожаловать в бот опросов\\! Используйте /poll для просмотра опросов\\."
+            "text": "Добро пожаловать в бот опросов! Используйте /poll для просмотра опросов."
         },
         {
             "command": "/poll",
             "text": poll_text,
+            "entities": poll_entities,
             "reply_markup": {
                 "inline_keyboard": keyboard_buttons
             }
@@ -861,7 +881,7 @@ async def finalize_poll(message: Message, state: FSMContext):
     # Add callback handlers for poll selection
     for i, poll in enumerate(poll_list, 1):
         callback_data = f"poll_{i}"
-        options_text = "\n".join([f"\\- {opt}" for opt in poll['options']])
+        options_text = "\n".join([f"- {opt}" for opt in poll['options']])
         response_text = f"Вопрос: {poll['question']}\nВарианты ответа:\n{options_text}"
         handlers.append({
             "callback_query": callback_data,
@@ -878,114 +898,77 @@ async def finalize_poll(message: Message, state: FSMContext):
     for i, poll in enumerate(poll_list, 1):
         for j, opt in enumerate(poll['options'], 1):
             callback_data = f"poll_{i}_option_{j}"
-            options_text = "\n".join([f"\\- {opt}" for opt in poll['options']])
+            options_text = "\n".join([f"- {opt}" for opt in poll['options']])
             response_text = f"Вопрос: {poll['question']}\nВарианты ответа:\n{options_text}"
+            thank_you_text, thank_you_entities = (
+                MessageBuilder().bold("Спасибо за ваш ответ!").text(f" ✅\nВы выбрали: {opt}").build()
+            )
             handlers.append({
                 "callback_query": callback_data,
                 "text": response_text,
                 "save_response": {
                     "poll_id": poll_id_map[f"poll_{i}"],
                     "option_text": opt,
-                    "thank_you_text": f"*Спасибо за ваш ответ\\!* ✅\nВы выбрали: {opt}"
+                    "thank_you_text": thank_you_text,
+                    "thank_you_entities": thank_you_entities
                 }
             })
 
     config['handlers'] = handlers
 
-    try:
-        logger.debug(f"Poll config: {json.dumps(config, ensure_ascii=False)}")
-    except Exception as e:
-        logger.error(f"Failed to log config: {str(e)}")
+    config = CanonicalConfig(config)
+    logger.debug("Poll config: %s", config)
 
-    is_valid, error = validate_config(config)
-    if not is_valid:
-        logger.error(f"Config validation failed: {error}")
-        text = f"*Ошибка* ⚠️\nОшибка в конфигурации: {escape_markdown(str(error))}"
-        logger.debug(f"Sending message: {text}")
-        await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
-        await state.clear()
-        return
-    is_valid, error = validate_block_schema(config)
+    is_valid, error = validate_config(config.config)
     if not is_valid:
-        logger.error(f"Schema validation failed: {error}")
-        text = f"*Ошибка* ⚠️\nОшибка в конфигурации: {escape_markdown(str(error))}"
-        logger.debug(f"Sending message: {text}")
-        await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
+        logger.error("Config validation failed: %s", error)
+        reply = error_message(f"Ошибка в конфигурации: {error}")
+        logger.debug("Sending message: %s", reply['text'])
+        await message.answer(**reply)
         await state.clear()
         return
 
-    conn = sqlite3.connect('bot_users.db')
+    conn = connect_db()
     c = conn.cursor()
     c.execute(
-        'INSERT INTO bot_configs (user_id, bot_name, config_json, bot_token) VALUES (?, ?, ?, ?)',
-        (message.from_user.id, config['bot_name'], json.dumps(config), bot_token)
+        'INSERT INTO bot_configs (user_id, bot_name, config_json, config_hash, bot_token) VALUES (?, ?, ?, ?, ?)',
+        (message.from_user.id, config['bot_name'], config.text, config.digest, bot_token)
     )
     config_id = c.lastrowid
     # Update polls with correct config_id
     c.execute('UPDATE polls SET config_id = ? WHERE config_id = 0', (config_id,))
     conn.commit()
     conn.close()
+    BOTS_CREATED.inc("poll")
 
     try:
         await generate_and_run_bot(config, bot_token, config_id)
-        text = f"*Успех* 🎉\nБот '{escape_markdown(config['bot_name'])}' успешно создан и запущен\\! ID: {config_id}"
-        logger.debug(f"Sending message: {text}")
-        await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
+        reply = success_message(config['bot_name'], config_id)
+        logger.debug("Sending message: %s", reply['text'])
+        await message.answer(**reply)
     except Exception as e:
-        logger.error(f"Error generating bot: {str(e)}")
-        text = f"*Ошибка* ⚠️\nОшибка при запуске бота: {escape_markdown(str(e))}"
-        logger.debug(f"Sending message: {text}")
-        await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
+        logger.error("Error generating bot: %s", e)
+        reply = error_message(f"Ошибка при запуске бота: {e}")
+        logger.debug("Sending message: %s", reply['text'])
+        await message.answer(**reply)
     finally:
         await state.clear()
 
-async def generate_and_run_bot(config, bot_token, config_id):
-    from generate import generate
-    output_file = f"bots/bot_{config_id}.py"
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
-    generate(config, output_file, config_id)
-    env_file = f"bots/bot_{config_id}.env"
-    with open(env_file, "w", encoding="utf-8") as f:
-        f.write(f"BOT_TOKEN={bot_token}\n")
-    conn = sqlite3.connect('bot_users.db')
-    c = conn.cursor()
-    c.execute('SELECT pid FROM bot_configs WHERE config_id = ?', (config_id,))
-    result = c.fetchone()
-    if result and result[0]:
-        old_pid = result[0]
-        try:
-            old_process = psutil.Process(old_pid)
-            old_process.terminate()
-            old_process.wait(timeout=3)
-        except (psutil.NoSuchProcess, psutil.TimeoutExpired):
-            pass
-    process = subprocess.Popen(
-        [sys.executable, os.path.abspath(output_file)],
-        cwd=os.path.dirname(os.path.abspath(output_file)),
-        env={**os.environ, "BOT_TOKEN": bot_token}
-    )
-    c.execute('UPDATE bot_configs SET pid = ? WHERE config_id = ?', (process.pid, config_id))
-    conn.commit()
-    conn.close()
-
 @dp.message(Command("list_bots"))
 async def list_bots_handler(message: Message) -> None:
-    conn = sqlite3.connect('bot_users.db')
+    conn = connect_db()
     c = conn.cursor()
     c.execute('SELECT config_id, bot_name FROM bot_configs WHERE user_id = ?', (message.from_user.id,))
     bots = c.fetchall()
     conn.close()
-    if bots:
-        response = "*Ваши боты* 🤖\n" + "\n".join([f"ID: {bot[0]}, Имя: {escape_markdown(bot[1])}" for bot in bots])
-    else:
-        response = "У вас пока *нет ботов*\\."
-    logger.debug(f"Sending message: {response}")
-    await message.answer(response, parse_mode=ParseMode.MARKDOWN_V2)
+    reply = bots_list_message(bots)
+    logger.debug("Sending message: %s", reply['text'])
+    await message.answer(**reply)
 
 @dp.message(Command("delete_bot"))
 async def delete_bot_handler(message: Message, state: FSMContext) -> None:
     text = "Введите *ID бота* для удаления \\(или /cancel\\):"
-    logger.debug(f"Sending message: {text}")
+    logger.debug("Sending message: %s", text)
     await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
     await state.set_state(BotDeleteForm.config_id)
 
@@ -993,84 +976,264 @@ async def delete_bot_handler(message: Message, state: FSMContext) -> None:
 async def process_delete_id(message: Message, state: FSMContext) -> None:
     if message.text == "/cancel":
         text = "*Удаление отменено* ❌"
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.clear()
         return
     try:
         config_id = int(message.text)
-        conn = sqlite3.connect('bot_users.db')
+        conn = connect_db()
         c = conn.cursor()
         c.execute('DELETE FROM bot_configs WHERE config_id = ? AND user_id = ?', 
                   (config_id, message.from_user.id))
-        c.execute('DELETE FROM polls WHERE config_id = ?', (config_id,))
-        c.execute('DELETE FROM poll_responses WHERE config_id = ?', (config_id,))
+        # Polls and votes of someone else's bot stay untouched
         if c.rowcount > 0:
+            c.execute('DELETE FROM poll_tallies WHERE poll_id IN (SELECT poll_id FROM polls WHERE config_id = ?)',
+                      (config_id,))
+            c.execute('DELETE FROM poll_rollups WHERE poll_id IN (SELECT poll_id FROM polls WHERE config_id = ?)',
+                      (config_id,))
+            c.execute('DELETE FROM polls WHERE config_id = ?', (config_id,))
+            c.execute('DELETE FROM poll_responses WHERE config_id = ?', (config_id,))
             text = "*Успех* 🎉\nБот успешно удален\\!"
         else:
             text = "*Ошибка* ⚠️\nБот не найден или вы не владелец\\."
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         conn.commit()
         conn.close()
         await state.clear()
     except ValueError:
         text = "*Ошибка* ⚠️\nID должен быть числом\\."
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
+        await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
+        await state.clear()
+
+@dp.message(Command("logs"))
+async def logs_handler(message: Message, command: CommandObject) -> None:
+    args = (command.args or "").split()
+    if not args or not args[0].isdigit():
+        reply = MessageBuilder().text("Использование: /logs <ID бота> [число строк]").as_kwargs()
+        logger.debug("Sending message: %s", reply['text'])
+        await message.answer(**reply)
+        return
+    config_id = int(args[0])
+    count = min(int(args[1]) if len(args) > 1 and args[1].isdigit() else LOGS_DEFAULT_LINES, LOGS_MAX_LINES)
+    conn = connect_db()
+    c = conn.cursor()
+    c.execute('SELECT 1 FROM bot_configs WHERE config_id = ? AND user_id = ?', (config_id, message.from_user.id))
+    owned = c.fetchone()
+    conn.close()
+    if not owned:
+        reply = error_message(f"Бот с ID {config_id} не найден или не принадлежит вам.")
+        logger.debug("Sending message: %s", reply['text'])
+        await message.answer(**reply)
+        return
+    tail = log_tails.get(config_id)
+    if tail is None:
+        tail = log_tails[config_id] = LogTail(bot_log_file(config_id), max_lines=LOGS_MAX_LINES)
+    body = "\n".join(format_log_line(line) for line in tail.read(count))
+    if not body:
+        reply = MessageBuilder().text(f"Лог бота {config_id} пуст.").as_kwargs()
+    else:
+        if len(body) > LOGS_MAX_CHARS:
+            # Keep the newest lines that fit into one message
+            body = body[-LOGS_MAX_CHARS:].split("\n", 1)[-1]
+        reply = MessageBuilder().bold(f"Лог бота {config_id}").text("\n").pre(body).as_kwargs()
+    logger.debug("Sending message: %s", reply['text'])
+    await message.answer(**reply)
+
+@dp.message(Command("poll_stats"))
+async def poll_stats_handler(message: Message, command: CommandObject) -> None:
+    args = (command.args or "").split()
+    if not args or not args[0].isdigit() or (len(args) > 1 and args[1] not in POLL_STATS_RESOLUTIONS):
+        reply = MessageBuilder().text("Использование: /poll_stats <ID бота> [hour|day]").as_kwargs()
+        logger.debug("Sending message: %s", reply['text'])
+        await message.answer(**reply)
+        return
+    config_id = int(args[0])
+    resolution = POLL_STATS_RESOLUTIONS[args[1] if len(args) > 1 else "hour"]
+    conn = connect_db()
+    c = conn.cursor()
+    c.execute('SELECT user_id FROM bot_configs WHERE config_id = ?', (config_id,))
+    row = c.fetchone()
+    c.execute('SELECT poll_id, question FROM polls WHERE config_id = ? ORDER BY poll_id DESC LIMIT ?',
+              (config_id, POLL_STATS_MAX_POLLS))
+    polls = c.fetchall()[::-1]
+    conn.close()
+    if not row or (row[0] != message.from_user.id and message.from_user.id not in ADMIN_IDS):
+        reply = error_message(f"Бот с ID {config_id} не найден или не принадлежит вам.")
+    elif not polls:
+        reply = error_message(f"У бота {config_id} нет опросов.")
+    else:
+        for poll_id, question in polls:
+            table = await asyncio.to_thread(stats_table, poll_id, resolution)
+            reply = poll_stats_message(poll_id, question, table)
+            logger.debug("Sending message: %s", reply['text'])
+            await message.answer(**reply)
+        return
+    logger.debug("Sending message: %s", reply['text'])
+    await message.answer(**reply)
+
+@dp.message(Command("profile"))
+async def profile_handler(message: Message, command: CommandObject) -> None:
+    args = (command.args or "").split()
+    if not args or not args[0].isdigit():
+        reply = MessageBuilder().text("Использование: /profile <ID бота> [секунд]").as_kwargs()
+        logger.debug("Sending message: %s", reply['text'])
+        await message.answer(**reply)
+        return
+    config_id = int(args[0])
+    seconds = min(int(args[1]) if len(args) > 1 and args[1].isdigit() else PROFILE_DEFAULT_SECONDS, PROFILE_MAX_SECONDS)
+    conn = connect_db()
+    c = conn.cursor()
+    c.execute('SELECT user_id, pid FROM bot_configs WHERE config_id = ?', (config_id,))
+    row = c.fetchone()
+    conn.close()
+    if not row or (row[0] != message.from_user.id and message.from_user.id not in ADMIN_IDS):
+        reply = error_message(f"Бот с ID {config_id} не найден или не принадлежит вам.")
+    elif not row[1]:
+        reply = error_message(f"Бот {config_id} не запущен.")
+    else:
+        try:
+            since = request_profile(config_id, row[1], seconds)
+        except OSError as e:
+            logger.error("Profile request for bot %s failed: %s", config_id, e)
+            reply = error_message(f"Не удалось запустить профилирование: {e}")
+        else:
+            reply = MessageBuilder().text(f"Профилирую бота {config_id} {seconds} с...").as_kwargs()
+            logger.debug("Sending message: %s", reply['text'])
+            await message.answer(**reply)
+            path = await wait_for_profile(config_id, since, seconds + PROFILE_WAIT_SLACK)
+            if path is None:
+                reply = error_message(f"Бот {config_id} не прислал профиль.")
+            else:
+                logger.info("Profile of bot %s written to %s", config_id, path)
+                reply = profile_message(config_id, read_collapsed(path))
+                logger.debug("Sending message: %s", reply['text'])
+                await message.answer(**reply)
+                await message.answer_document(FSInputFile(path))
+                return
+    logger.debug("Sending message: %s", reply['text'])
+    await message.answer(**reply)
+
+@dp.message(Command("stats"))
+async def stats_handler(message: Message) -> None:
+    if message.from_user.id not in ADMIN_IDS:
+        reply = error_message("Команда доступна только администраторам.")
+    else:
+        reply = fleet_stats_message(fleet_sampler)
+    logger.debug("Sending message: %s", reply['text'])
+    await message.answer(**reply)
+
+@dp.message(Command("broadcast"))
+async def broadcast_handler(message: Message, state: FSMContext) -> None:
+    text = "Введите *ID бота* для рассылки \\(или /cancel\\):"
+    logger.debug("Sending message: %s", text)
+    await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
+    await state.set_state(BroadcastForm.config_id)
+
+@dp.message(BroadcastForm.config_id)
+async def process_broadcast_id(message: Message, state: FSMContext) -> None:
+    if message.text == "/cancel":
+        text = "*Рассылка отменена* ❌"
+        logger.debug("Sending message: %s", text)
+        await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
+        await state.clear()
+        return
+    try:
+        config_id = int(message.text)
+    except ValueError:
+        text = "*Ошибка* ⚠️\nID должен быть числом\\."
+        logger.debug("Sending message: %s", text)
+        await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
+        await state.clear()
+        return
+    conn = connect_db()
+    c = conn.cursor()
+    c.execute('SELECT 1 FROM bot_configs WHERE config_id = ? AND user_id = ?', (config_id, message.from_user.id))
+    owned = c.fetchone()
+    conn.close()
+    if not owned:
+        text = "*Ошибка* ⚠️\nБот не найден или вы не владелец\\."
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.clear()
+        return
+    await state.update_data(config_id=config_id)
+    text = "Введите *текст рассылки* \\(или /cancel\\):"
+    logger.debug("Sending message: %s", text)
+    await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
+    await state.set_state(BroadcastForm.text)
+
+@dp.message(BroadcastForm.text)
+async def process_broadcast_text(message: Message, state: FSMContext) -> None:
+    if message.text == "/cancel":
+        text = "*Рассылка отменена* ❌"
+        logger.debug("Sending message: %s", text)
+        await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
+        await state.clear()
+        return
+    if not message.text or not message.text.strip():
+        text = "*Ошибка* ⚠️\nТекст рассылки не может быть пустым\\."
+        logger.debug("Sending message: %s", text)
+        await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
+        return
+    config_id = (await state.get_data())['config_id']
+    broadcast_id = create_broadcast(config_id, message.from_user.id, message.text)
+    start_broadcast(broadcast_id, message.from_user.id)
+    text = f"*Рассылка запущена* 📣\nID рассылки: {broadcast_id}\\. Отчет придет по завершении\\."
+    logger.debug("Sending message: %s", text)
+    await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
+    await state.clear()
+
+broadcast_tasks = set()
+
+def start_broadcast(broadcast_id, owner_id):
+    task = asyncio.create_task(report_broadcast(broadcast_id, owner_id))
+    broadcast_tasks.add(task)
+    task.add_done_callback(broadcast_tasks.discard)
+
+async def report_broadcast(broadcast_id, owner_id):
+    try:
+        counts = await run_broadcast(broadcast_id)
+        text = (
+            f"*Рассылка {broadcast_id} завершена* ✅\n"
+            f"Доставлено: {counts['delivered']}\nЗаблокировали бота: {counts['blocked']}\nОшибок: {counts['failed']}"
+        )
+    except Exception as e:
+        logger.error("Broadcast %s failed: %s", broadcast_id, e)
+        text = f"*Ошибка* ⚠️\nРассылка {broadcast_id} прервана: {escape_markdown(str(e))}"
+    logger.debug("Sending message: %s", text)
+    await bot.send_message(owner_id, text, parse_mode=ParseMode.MARKDOWN_V2)
 
 @dp.message(Command("menu"))
 async def command_menu_handler(message: Message) -> None:
-    keyboard_buttons = [
-        [
-            InlineKeyboardButton(text="Создать бота", callback_data="menu_create_bot"),
-            InlineKeyboardButton(text="Список ботов", callback_data="menu_list_bots"),
-        ],
-        [
-            InlineKeyboardButton(text="Удалить бота", callback_data="menu_delete_bot"),
-        ],
-    ]
-    keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
-    text = "*Меню* 📋\nВыберите действие:"
-    logger.debug(f"Sending message: {text}")
-    await message.answer(text, reply_markup=keyboard, parse_mode=ParseMode.MARKDOWN_V2)
+    logger.debug("Sending message: %s", MENU_MESSAGE['text'])
+    await message.answer(**MENU_MESSAGE, reply_markup=MAIN_MENU_KEYBOARD)
 
 @dp.callback_query(lambda c: c.data == "menu_create_bot")
 async def callback_menu_create_bot_handler(callback: CallbackQuery, state: FSMContext) -> None:
-    keyboard_buttons = [
-        [
-            InlineKeyboardButton(text="Визитка", callback_data="template_business_card"),
-            InlineKeyboardButton(text="FAQ", callback_data="template_faq"),
-            InlineKeyboardButton(text="Опросник", callback_data="template_poll"),
-        ],
-    ]
-    keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
-    text = "*Создание бота* 🤖\nВыберите шаблон для нового бота:"
-    logger.debug(f"Sending message: {text}")
-    await callback.message.answer(text, reply_markup=keyboard, parse_mode=ParseMode.MARKDOWN_V2)
+    logger.debug("Sending message: %s", CREATE_BOT_MESSAGE['text'])
+    await callback.message.answer(**CREATE_BOT_MESSAGE, reply_markup=TEMPLATE_KEYBOARD)
     await state.set_state(BotCreationForm.template)
     await callback.answer()
 
 @dp.callback_query(lambda c: c.data == "menu_list_bots")
 async def callback_menu_list_bots_handler(callback: CallbackQuery) -> None:
-    conn = sqlite3.connect('bot_users.db')
+    conn = connect_db()
     c = conn.cursor()
     c.execute('SELECT config_id, bot_name FROM bot_configs WHERE user_id = ?', (callback.from_user.id,))
     bots = c.fetchall()
     conn.close()
-    if bots:
-        response = "*Ваши боты* 🤖\n" + "\n".join([f"ID: {bot[0]}, Имя: {escape_markdown(bot[1])}" for bot in bots])
-    else:
-        response = "У вас пока *нет ботов*\\."
-    logger.debug(f"Sending message: {response}")
-    await callback.message.answer(response, parse_mode=ParseMode.MARKDOWN_V2)
+    reply = bots_list_message(bots)
+    logger.debug("Sending message: %s", reply['text'])
+    await callback.message.answer(**reply)
     await callback.answer()
 
 @dp.callback_query(lambda c: c.data == "menu_delete_bot")
 async def callback_menu_delete_bot_handler(callback: CallbackQuery, state: FSMContext) -> None:
     text = "Введите *ID бота* для удаления \\(или /cancel\\):"
-    logger.debug(f"Sending message: {text}")
+    logger.debug("Sending message: %s", text)
     await callback.message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
     await state.set_state(BotDeleteForm.config_id)
     await callback.answer()
@@ -1079,12 +1242,12 @@ async def callback_menu_delete_bot_handler(callback: CallbackQuery, state: FSMCo
 async def process_name(message: Message, state: FSMContext) -> None:
     if not is_valid_text(message.text):
         text = "*Ошибка* ⚠️\nИмя содержит недопустимые символы\\.\nИспользуйте буквы, цифры, пробелы и знаки препинания \\(кроме \\_\\, \\*\\, \\[\\, \\]\\, \\(\\, \\)\\, \\~\\, \\`\\, \\>\\, \\#\\, \\+\\, \\-\\, \\=\\, \\|\\, \\{\\, \\}\\, \\.\\, \\!\\, \\?\\)\\."
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         return
     await state.update_data(name=message.text)
     text = f"Ты ввел имя: *{escape_markdown(message.text)}*\\.\nПодтвердить\\? \\(*да/нет*\\)"
-    logger.debug(f"Sending message: {text}")
+    logger.debug("Sending message: %s", text)
     await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
     await state.set_state(RegistrationForm.confirm)
 
@@ -1093,25 +1256,47 @@ async def process_confirm(message: Message, state: FSMContext) -> None:
     if message.text.lower() == "да":
         user_data = await state.get_data()
         name = user_data['name']
-        conn = sqlite3.connect('bot_users.db')
+        conn = connect_db()
         c = conn.cursor()
         c.execute('INSERT INTO users (user_id, username, first_name) VALUES (?, ?, ?)',
                   (message.from_user.id, message.from_user.username, name))
         conn.commit()
         conn.close()
         text = "*Регистрация завершена* 🎉\nНажми /start, чтобы продолжить\\."
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.clear()
     else:
         text = "*Регистрация отменена* ❌\nНажми /start, чтобы начать заново\\."
-        logger.debug(f"Sending message: {text}")
+        logger.debug("Sending message: %s", text)
         await message.answer(text, parse_mode=ParseMode.MARKDOWN_V2)
         await state.clear()
 
 async def main() -> None:
     init_db()
-    await dp.start_polling(bot)
+    # Jobs a live cli.py broadcast or another builder is sending are left to it
+    for broadcast_id, owner_id in claim_unfinished_broadcasts():
+        start_broadcast(broadcast_id, owner_id)
+    sampler_task = asyncio.create_task(fleet_sampler.run())
+    metrics_runner = None
+    if METRICS_PORT:
+        try:
+            metrics_runner = await start_metrics_server(int(METRICS_PORT))
+        except OSError as e:
+            logger.error("Metrics endpoint not started on port %s: %s", METRICS_PORT, e)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        # Cancelled broadcasts mark themselves interrupted for the next start
+        for task in broadcast_tasks:
+            task.cancel()
+        await asyncio.gather(*broadcast_tasks, return_exceptions=True)
+        sampler_task.cancel()
+        fleet_sampler.flush()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await close_session()
 
 if __name__ == "__main__":
+    setup_logging()
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,12 @@
+import pytest
+
+from utils import utils_db
+
+
+@pytest.fixture(autouse=True)
+def bot_db(tmp_path, monkeypatch):
+    """Each test gets its own builder database, also seen by the bots it starts."""
+    path = str(tmp_path / "bot_users.db")
+    monkeypatch.setattr(utils_db, "DB_PATH", path)
+    monkeypatch.setenv("BOT_DB_PATH", path)
+    return path
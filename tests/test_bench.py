@@ -0,0 +1,28 @@
+import json
+import random
+
+from benchmarks import suite
+
+
+def test_synthetic_configs_are_seeded_and_valid():
+    first = suite.synthetic_poll_config(5, random.Random("1:generate:5"))
+    second = suite.synthetic_poll_config(5, random.Random("1:generate:5"))
+    assert first == second
+    assert suite.validate_config(first[0]) == (True, "")
+    assert suite.validate_config(suite.synthetic_faq_config(5, random.Random(1))) == (True, "")
+
+
+def test_report_is_json_and_comparable(monkeypatch):
+    monkeypatch.setattr(suite, "MIN_RUN_TIME", 0.001)
+    report = suite.run(["validate_config", "escape_markdown", "sqlite_finalize"], sizes=[5], repeat=2)
+    report = json.loads(json.dumps(report))
+    assert [(row["name"], row["kind"], row["size"]) for row in report["results"]] == [
+        ("validate_config", "micro", 5), ("escape_markdown", "micro", 5), ("sqlite_finalize", "macro", 5),
+    ]
+    for row in report["results"]:
+        assert len(row["runs_ms"]) == 2 and 0 < row["best_ms"] <= row["median_ms"]
+    assert report["meta"]["seed"] == suite.DEFAULT_SEED
+
+    baseline = {"results": [{**report["results"][0], "best_ms": report["results"][0]["best_ms"] * 2}]}
+    (row,) = suite.compare(report, baseline)
+    assert row[:2] == ("validate_config", 5) and row[4] == 0.5
@@ -0,0 +1,140 @@
+import asyncio
+import socket
+import pytest
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.methods import SendMessage
+from utils import utils_broadcast, utils_polls
+from utils.utils_broadcast import (
+    claim_broadcast, claim_unfinished_broadcasts, create_broadcast, iter_recipient_batches, run_broadcast,
+)
+from utils.utils_db import connect_db
+
+
+class FakeSession:
+    async def close(self):
+        pass
+
+
+class FakeBot:
+    sent = []
+    blocked = {3}
+
+    def __init__(self, token):
+        self.session = FakeSession()
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        if chat_id in self.blocked:
+            raise TelegramForbiddenError(method=SendMessage(chat_id=chat_id, text=text), message="blocked")
+        self.sent.append(chat_id)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    from target_bot_code import init_db
+    init_db()
+    conn = connect_db()
+    conn.execute("INSERT INTO bot_configs (config_id, user_id, bot_name, bot_token) VALUES (7, 1, 'B', '1:A')")
+    conn.executemany(
+        "INSERT INTO poll_responses (user_id, poll_id, config_id, option_text) VALUES (?, ?, 7, 'x')",
+        # Users 5 and 1 answered both polls
+        [(5, 1), (1, 1), (3, 1), (5, 2), (2, 1), (4, 1), (1, 2)]
+    )
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(utils_broadcast, "create_bot", FakeBot)
+    FakeBot.sent = []
+
+
+def test_recipients_are_distinct_and_batched(db):
+    assert list(iter_recipient_batches(7, batch_size=2)) == [[1, 2], [3, 4], [5]]
+    assert list(iter_recipient_batches(7, after_user_id=3, batch_size=10)) == [[4, 5]]
+
+
+def test_voters_of_a_bot_running_in_bots_dir_are_recipients(db, tmp_path, monkeypatch):
+    (tmp_path / "bots").mkdir()
+    # Generated bots save votes with bots/ as their working directory
+    monkeypatch.chdir(tmp_path / "bots")
+    utils_polls.save_poll_response(9, 3, 7, "x")
+    monkeypatch.chdir(tmp_path)
+    assert list(iter_recipient_batches(7)) == [[1, 2, 3, 4, 5, 9]]
+
+
+@pytest.mark.asyncio
+async def test_broadcast_counts_and_checkpoint(db):
+    broadcast_id = create_broadcast(7, 1, "Hello")
+    counts = await run_broadcast(broadcast_id, batch_size=2)
+    assert counts == {'delivered': 4, 'blocked': 1, 'failed': 0}
+    assert sorted(FakeBot.sent) == [1, 2, 4, 5]
+    conn = connect_db()
+    status, last_user_id = conn.execute(
+        'SELECT status, last_user_id FROM broadcasts WHERE broadcast_id = ?', (broadcast_id,)
+    ).fetchone()
+    conn.close()
+    assert (status, last_user_id) == ('done', 5)
+
+
+@pytest.mark.asyncio
+async def test_broadcast_resumes_from_checkpoint(db):
+    broadcast_id = create_broadcast(7, 1, "Hello")
+    conn = connect_db()
+    conn.execute(
+        "UPDATE broadcasts SET status = 'running', last_user_id = 2, delivered = 2 WHERE broadcast_id = ?",
+        (broadcast_id,)
+    )
+    conn.commit()
+    conn.close()
+    counts = await run_broadcast(broadcast_id)
+    assert sorted(FakeBot.sent) == [4, 5]
+    assert counts == {'delivered': 4, 'blocked': 1, 'failed': 0}
+
+
+@pytest.mark.asyncio
+async def test_broadcast_claimed_by_a_live_runner_is_not_sent_again(db):
+    broadcast_id = create_broadcast(7, 1, "Hello")
+    assert claim_broadcast(broadcast_id, "other-host:1")
+    assert claim_unfinished_broadcasts() == []
+    with pytest.raises(ValueError):
+        await run_broadcast(broadcast_id)
+    assert FakeBot.sent == []
+    # A runner on this host whose process is gone left it without a clean shutdown
+    conn = connect_db()
+    conn.execute('UPDATE broadcasts SET runner = ? WHERE broadcast_id = ?',
+                 (f"{socket.gethostname()}:{2 ** 31 - 1}", broadcast_id))
+    conn.commit()
+    conn.close()
+    assert claim_unfinished_broadcasts() == [(broadcast_id, 1)]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_broadcast_is_interrupted_and_resumable(db, monkeypatch):
+    started = asyncio.Event()
+
+    async def hang(self, chat_id, text, parse_mode=None):
+        started.set()
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(FakeBot, "send_message", hang)
+    broadcast_id = create_broadcast(7, 1, "Hello")
+    task = asyncio.create_task(run_broadcast(broadcast_id))
+    await started.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    conn = connect_db()
+    status, = conn.execute('SELECT status FROM broadcasts WHERE broadcast_id = ?', (broadcast_id,)).fetchone()
+    conn.close()
+    assert status == 'interrupted'
+    assert claim_unfinished_broadcasts() == [(broadcast_id, 1)]
+
+
+@pytest.mark.asyncio
+async def test_cli_broadcast_belongs_to_the_bot_owner(db):
+    import cli
+    conn = connect_db()
+    conn.execute("INSERT INTO bot_configs (config_id, user_id, bot_name, bot_token) VALUES (8, 42, 'C', '1:A')")
+    conn.commit()
+    conn.close()
+    await cli.broadcast(8, "Hello", None, 2)
+    conn = connect_db()
+    assert conn.execute('SELECT user_id, status FROM broadcasts').fetchall() == [(42, 'done')]
+    conn.close()
@@ -0,0 +1,57 @@
+import os
+import runpy
+
+from generate import generate
+from utils.utils_callbacks import KEPT_VERSIONS, CallbackTable, callback_tokens, encode, encode_token, load_versions
+
+
+def faq_config(questions):
+    keyboard = [[{"text": f"Вопрос {i}", "callback_data": f"faq_{i}", "response": f"Ответ {i}"}] for i in questions]
+    return {"bot_name": "Faq", "format": "entities", "handlers": [
+        {"command": "/faq", "text": "Вопросы:", "reply_markup": {"inline_keyboard": keyboard}},
+    ]}
+
+
+def test_tokens_are_short_base36():
+    assert [encode(n) for n in (0, 35, 36, 1295)] == ["0", "z", "10", "zz"]
+    assert encode_token(3, 1000) == "3.rs"
+    assert all(len(encode_token(KEPT_VERSIONS * 1000, n).encode()) <= 64 for n in (10 ** 6, 10 ** 12))
+
+
+def test_table_resolves_current_old_and_legacy_data():
+    table = CallbackTable(1, ("a", "b"), ("faq_1", "faq_2"), {0: (None, 0)})
+    assert table.resolve("1.0") == "a" and table.resolve("1.1") == "b"
+    assert table.resolve("0.1") == "a" and table.resolve("0.0") is None
+    assert table.resolve("faq_2") == "b"
+    for data in ("1.2", "1.-1", "1._1", "1.", "2.0", "", None):
+        assert table.resolve(data) is None
+
+
+def test_old_keyboards_resolve_after_regeneration(tmp_path, monkeypatch):
+    output_file = str(tmp_path / "bot_1.py")
+    generate(faq_config([1, 2, 3]), output_file, 1)
+    old_tokens = callback_tokens(output_file)
+    # Regenerating an unchanged config keeps the version
+    generate(faq_config([1, 2, 3]), output_file, 1)
+    assert callback_tokens(output_file) == old_tokens
+
+    generate(faq_config([1, 3, 4]), output_file, 1)
+    assert sorted(load_versions(output_file)) == [0, 1]
+    monkeypatch.setitem(os.environ, "BOT_TOKEN", "123456:TEST")
+    namespace = runpy.run_path(output_file, run_name="callbacks_bot")
+    resolve = namespace["CALLBACKS"].resolve
+    new_tokens = callback_tokens(output_file)
+    assert new_tokens["faq_3"].startswith("1.")
+    assert resolve(old_tokens["faq_3"]) is resolve(new_tokens["faq_3"]) is namespace["callback_faq_3_handler"]
+    assert resolve(old_tokens["faq_1"]) is namespace["callback_faq_1_handler"]
+    assert resolve(old_tokens["faq_2"]) is None
+    assert resolve("faq_4") is namespace["callback_faq_4_handler"]
+
+
+def test_only_recent_versions_are_kept(tmp_path):
+    output_file = str(tmp_path / "bot_1.py")
+    for i in range(KEPT_VERSIONS + 2):
+        generate(faq_config([i]), output_file, 1)
+    assert sorted(load_versions(output_file)) == list(range(2, KEPT_VERSIONS + 2))
+    source = open(output_file, encoding="utf-8").read()
+    assert f"    2: (None,)," in source and "    1: " not in source
@@ -0,0 +1,60 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+from utils import utils_dedup
+from utils.utils_dedup import DedupMiddleware, RotatingSet
+from utils.utils_metrics import Registry
+
+
+def make_callback_update(update_id, callback_id="1", data="poll_1_option_1", user_id=1, message_id=10):
+    callback = SimpleNamespace(
+        id=callback_id,
+        data=data,
+        from_user=SimpleNamespace(id=user_id),
+        message=SimpleNamespace(message_id=message_id),
+        inline_message_id=None,
+        answer=AsyncMock(),
+    )
+    return SimpleNamespace(update_id=update_id, callback_query=callback)
+
+
+def test_rotating_set_forgets_after_two_generations(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(utils_dedup.time, "monotonic", lambda: now[0])
+    seen = RotatingSet(ttl=10)
+    assert seen.add("a")
+    assert not seen.add("a")
+    now[0] = 15
+    assert "a" in seen
+    now[0] = 26
+    assert "a" not in seen
+    assert seen.add("a")
+
+
+def test_rotating_set_rotates_when_full():
+    seen = RotatingSet(ttl=1000, max_size=2)
+    for key in range(5):
+        seen.add(key)
+    assert len(seen) <= 4
+    assert 4 in seen
+
+
+@pytest.mark.asyncio
+async def test_duplicate_update_and_redelivered_callback_are_dropped():
+    counter = Registry().counter("dropped_total", "Dropped")
+    middleware = DedupMiddleware(counter=counter)
+    handler = AsyncMock(return_value="handled")
+
+    assert await middleware(handler, make_callback_update(1), {}) == "handled"
+    # Telegram retry of the same update
+    assert await middleware(handler, make_callback_update(1), {}) is None
+    # The same press delivered again in another update
+    redelivered = make_callback_update(2)
+    assert await middleware(handler, redelivered, {}) is None
+    redelivered.callback_query.answer.assert_awaited_once()
+    # Pressing the same button on the same message again is a new press, e.g. A -> B -> A on a poll
+    assert await middleware(handler, make_callback_update(3, callback_id="2"), {}) == "handled"
+
+    assert handler.await_count == 2
+    assert middleware.dropped == 2
+    assert counter.get() == 2
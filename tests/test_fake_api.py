@@ -0,0 +1,61 @@
+import asyncio
+import pytest
+from utils import utils_telegram
+from utils.utils_fake_api import FakeTelegramServer
+from utils.utils_telegram import create_bot, check_bot_token, close_session
+
+TOKEN = "123456:ABCDEF"
+
+
+@pytest.mark.asyncio
+async def test_bot_talks_to_fake_server():
+    server = FakeTelegramServer()
+    await server.start(port=0)
+    bot = create_bot(TOKEN, api_url=server.url)
+    try:
+        me = await bot.get_me()
+        assert me.id == 123456
+        await bot.send_message(42, "hello")
+        assert server.bot(TOKEN).sent[0]["text"] == "hello"
+
+        server.inject_message(TOKEN, 42, "/start")
+        server.inject_callback(TOKEN, 42, "menu_list_bots")
+        updates = await bot.get_updates(timeout=0)
+        assert updates[0].message.text == "/start"
+        assert updates[1].callback_query.data == "menu_list_bots"
+        assert await bot.get_updates(offset=updates[-1].update_id + 1, timeout=0) == []
+    finally:
+        await bot.session.close()
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_fake_server_simulates_flood_wait():
+    server = FakeTelegramServer(flood_rate=1.0, retry_after=1)
+    await server.start(port=0)
+    bot = create_bot(TOKEN, api_url=server.url)
+    try:
+        send = asyncio.create_task(bot.send_message(42, "hello"))
+        while not server.floods:
+            await asyncio.sleep(0.01)
+        server.flood_rate = 0
+        # The rate limiter waits retry_after and resends
+        message = await send
+        assert message.text == "hello"
+        assert server.floods == 1
+    finally:
+        await bot.session.close()
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_token_check_against_fake_server(monkeypatch):
+    server = FakeTelegramServer()
+    await server.start(port=0)
+    monkeypatch.setattr(utils_telegram, "TELEGRAM_API_URL", server.url)
+    utils_telegram._getme_cache.clear()
+    try:
+        assert await check_bot_token(TOKEN) == (True, "")
+    finally:
+        await close_session()
+        await server.stop()
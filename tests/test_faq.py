@@ -0,0 +1,61 @@
+import os
+import random
+import runpy
+
+from generate import generate
+from utils.utils_faq import FaqIndex, words
+
+ENTRIES = [
+    ("Сколько стоит доставка?", "Доставка по Москве 300 рублей, бесплатно от 5000"),
+    ("Какие способы оплаты?", "Картой, наличными курьеру или переводом"),
+    ("Где находится магазин?", "Москва, ул. Ленина, 1. Работаем с 10 до 20"),
+    ("Как вернуть товар?", "Возврат в течение 14 дней с чеком"),
+]
+
+
+def test_words_drop_stop_words_and_fold_yo():
+    assert words("Где ВЫ находитесь? Ещё вопрос!") == ["находитесь", "еще", "вопрос"]
+
+
+def test_match_tolerates_word_forms_and_typos():
+    index = FaqIndex(ENTRIES)
+    assert index.answer("сколько стоит доставка") == 0
+    assert index.answer("стоимость доставки") == 0
+    assert index.answer("можно оплатить картой?") == 1
+    assert index.answer("где вы находитесь") == 2
+    assert index.answer("возврат товара") == 3
+    assert index.answer("вернуть тоавр") == 3
+    # Unrelated text falls below the threshold instead of guessing
+    assert index.match("какая погода") == (None, 0.0)
+    assert index.answer("где погода") is None
+    assert FaqIndex([]).match("доставка") == (None, 0.0)
+
+
+def test_lookup_finds_entries_among_thousands():
+    rng = random.Random(1)
+    syllables = "ка ро ми на то ле со пу да ви ше гу".split()
+    vocabulary = ["".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(3000)]
+    entries = [(" ".join(rng.sample(vocabulary, 5)) + " доставка", " ".join(rng.sample(vocabulary, 15)))
+               for _ in range(5000)]
+    index = FaqIndex(entries)
+    queries = [" ".join(question.split()[:3]) + " доставка" for question, _ in entries[:200]]
+    # Timing is covered by the faq_match benchmark (cli.py bench --only faq_match)
+    assert [index.answer(query) for query in queries] == list(range(200))
+
+
+def test_generated_faq_bot_answers_free_text(tmp_path, monkeypatch):
+    keyboard = [[{"text": question, "callback_data": f"faq_{i}", "response": answer}]
+                for i, (question, answer) in enumerate(ENTRIES, 1)]
+    config = {"bot_name": "Faq", "format": "entities", "handlers": [
+        {"command": "/start", "text": "Привет"},
+        {"command": "/faq", "text": "Вопросы:", "reply_markup": {"inline_keyboard": keyboard}},
+    ]}
+    path = tmp_path / "bot_1.py"
+    generate(config, str(path), 1)
+    source = path.read_text(encoding="utf-8")
+    # The free-text handler is registered after every command
+    assert source.index("async def faq_search_handler") > source.index("async def command_faq_handler")
+    monkeypatch.setitem(os.environ, "BOT_TOKEN", "123456:TEST")
+    namespace = runpy.run_path(str(path), run_name="faq_bot")
+    entry_id = namespace["FAQ_INDEX"].answer("как вернуть товар")
+    assert namespace["FAQ_ANSWERS"][entry_id] == {"text": ENTRIES[3][1], "parse_mode": None}
@@ -0,0 +1,73 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from utils.utils_db import connect_db
+from utils.utils_fleet import HOUR, MINUTE, FleetSampler, bot_history, find_outliers
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    from utils.utils_runner import init_db
+    monkeypatch.chdir(tmp_path)
+    init_db()
+    return tmp_path
+
+
+def register(config_id, pid):
+    conn = connect_db()
+    conn.execute("INSERT INTO bot_configs (config_id, user_id, bot_name, pid) VALUES (?, 1, 'B', ?)", (config_id, pid))
+    conn.commit()
+    conn.close()
+
+
+def test_sampler_reads_running_bots_and_stores_minutes(db):
+    script = db / "bot_7.py"
+    script.write_text("import time\ntime.sleep(30)\n")
+    process = subprocess.Popen([sys.executable, str(script)])
+    try:
+        register(7, process.pid)
+        # Another program running under a stale pid is not mistaken for bot 8
+        register(8, os.getpid())
+        sampler = FleetSampler()
+        now = 1_700_000_000 - 1_700_000_000 % MINUTE
+        assert sampler.sample(now) == {}
+        samples = sampler.sample(now + 15)
+        assert set(samples) == {7}
+        assert samples[7]["rss"] > 0 and samples[7]["threads"] >= 1 and samples[7]["fds"] >= 0
+        assert sampler.missing == {8}
+        assert sampler.totals()["bots"] == 1
+
+        sampler.sample(now + MINUTE)
+        rows = bot_history(7, 0)
+        assert [(bucket, samples) for bucket, samples, *_ in rows] == [(now, 1)]
+    finally:
+        process.kill()
+        process.wait()
+
+
+def test_compact_folds_old_minutes_into_hours(db):
+    sampler = FleetSampler()
+    hour = 1_700_000_000 - 1_700_000_000 % HOUR
+    sampler.flush([
+        (7, [hour, 2, 20.0, 15.0, 100, 5, 2]),
+        (7, [hour + MINUTE, 2, 40.0, 30.0, 300, 6, 3]),
+    ])
+    sampler.compact(hour + 2 * HOUR)
+    assert bot_history(7, 0) == [(hour, 2, 10.0, 15.0, 100, 5, 2), (hour + MINUTE, 2, 20.0, 30.0, 300, 6, 3)]
+    sampler.compact(hour + 26 * HOUR)
+    assert bot_history(7, 0) == []
+    assert bot_history(7, 0, resolution=HOUR) == [(hour, 4, 15.0, 30.0, 300, 6, 3)]
+
+
+def test_outliers_by_cpu_and_rss():
+    mb = 2 ** 20
+    samples = {
+        1: {"cpu": 1.0, "rss": 40 * mb},
+        2: {"cpu": 95.0, "rss": 40 * mb},
+        3: {"cpu": 1.0, "rss": 400 * mb},
+        4: {"cpu": 1.0, "rss": 45 * mb},
+    }
+    assert find_outliers(samples) == {2: ["cpu"], 3: ["rss"]}
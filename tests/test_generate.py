@@ -3,7 +3,7 @@ import sqlite3
 import os
 from generate import generate
 from jinja2 import Environment, FileSystemLoader
-from utils.utils_validation import validate_config, validate_block_schema, validate_bot_token
+from utils.utils_validation import validate_config, validate_block_schema, validate_bot_token, config_errors
 
 @pytest.fixture
 def env():
@@ -81,4 +81,172 @@ def test_invalid_generation(env, tmp_path):
     assert not is_valid, f"Ожидалась ошибка валидации: {error}"
     # Проверка, что генерация не происходит при недействительной конфигурации
     with pytest.raises(Exception):
-        generate(invalid_config, output_file)
\ No newline at end of file
+        generate(invalid_config, output_file)
+
+def test_generate_entities_config(tmp_path):
+    config = {
+        "bot_name": "Bot_1!",
+        "format": "entities",
+        "handlers": [
+            {
+                "command": "/start",
+                "text": "Привет! Выберите:",
+                "entities": [{"type": "bold", "offset": 0, "length": 7}],
+                "reply_markup": {
+                    "inline_keyboard": [
+                        [
+                            {"text": "Сайт", "url": "https://example.com"},
+                            {"text": "Контакты", "callback_data": "contact_info", "response": "Email: user@example.com"}
+                        ]
+                    ]
+                }
+            }
+        ]
+    }
+    is_valid, error = validate_config(config)
+    assert is_valid, error
+    output_file = tmp_path / "bot_1.py"
+    generate(config, str(output_file), 1)
+    source = output_file.read_text(encoding="utf-8")
+    compile(source, str(output_file), "exec")
+    assert "ENTITIES_0 = [MessageEntity(**{'type': 'bold', 'offset': 0, 'length': 7})]" in source
+    assert "entities=ENTITIES_0, parse_mode=None" in source
+    assert not any("MARKDOWN_V2" in line for line in source.splitlines() if "answer(" in line)
+    assert '"url": "https://example.com"' in source
+    assert "async def callback_contact_info_handler" in source
+
+
+def test_entities_out_of_range():
+    config = {"bot_name": "B", "handlers": [
+        {"command": "/start", "text": "Hi", "entities": [{"type": "bold", "offset": 0, "length": 3}]}
+    ]}
+    is_valid, error = validate_config(config)
+    assert not is_valid
+    assert "границы" in error
+
+
+def test_config_errors_collects_everything():
+    config = {
+        "bot_name": "",
+        "handlers": [
+            {"command": "/start", "callback_query": "x", "text": "Hi"},
+            {"command": "/faq", "text": "", "reply_markup": {"inline_keyboard": [
+                [{"text": "Q", "callback_data": "faq_1"}, {"text": ""}]
+            ]}},
+            {"callback_query": "poll_1_option_1", "text": "Q",
+             "save_response": {"poll_id": 0, "option_text": "A", "thank_you_text": "T"}},
+        ],
+    }
+    errors = config_errors(config)
+    assert errors == [
+        "Отсутствует или некорректное имя бота (bot_name)",
+        "Обработчик не может содержать одновременно command и callback_query (handlers[0])",
+        "Обработчик должен содержать непустой text (handlers[1].text)",
+        "Каждая кнопка должна содержать непустой text (handlers[1].reply_markup.inline_keyboard[0][1].text)",
+        "Кнопка с callback_data в /faq не содержит response (handlers[1].reply_markup.inline_keyboard[0][0])",
+        "poll_id в save_response должен быть положительным числом (handlers[2].save_response.poll_id)",
+    ]
+
+
+def test_unserializable_values_rejected():
+    config = {"bot_name": "B", "handlers": [{"command": "/start", "text": "Hi", "extra": {1, 2}}]}
+    is_valid, error = validate_block_schema(config)
+    assert not is_valid
+    assert "JSON" in error and "handlers[0].extra" in error
+
+
+def test_canonical_config_is_stable(tmp_path):
+    from generate import generated_config_hash
+    from utils.utils_config import CanonicalConfig
+    first = CanonicalConfig({"handlers": [{"command": "/start", "text": "Привет"}], "bot_name": "B"})
+    second = CanonicalConfig({"bot_name": "B", "handlers": [{"text": "Привет", "command": "/start"}]})
+    assert first.text == second.text == '{"bot_name":"B","handlers":[{"command":"/start","text":"Привет"}]}'
+    assert first.digest == second.digest
+    assert str(first) is first.text
+
+    output_file = tmp_path / "bot_1.py"
+    assert generated_config_hash(str(output_file)) is None
+    generate(first.config, str(output_file), 1, first.digest)
+    assert generated_config_hash(str(output_file)) == first.digest
+
+def test_scripts_from_another_generator_version_are_outdated(tmp_path, monkeypatch, sample_config):
+    import generate as generator
+    output_file = tmp_path / "bot_1.py"
+    generate(sample_config, str(output_file), 1, "abc")
+    assert generator.generated_config_hash(str(output_file)) == "abc"
+    monkeypatch.setattr(generator, "GENERATOR_VERSION", "changed")
+    assert generator.generated_config_hash(str(output_file)) is None
+    # Scripts written before the header carried a version
+    output_file.write_text("# config_hash: abc\nimport os\n", encoding="utf-8")
+    assert generator.generated_config_hash(str(output_file)) is None
+
+def test_long_keyboards_are_paginated_once_at_import(tmp_path, monkeypatch):
+    import runpy
+    from generate import KEYBOARD_PAGE_ROWS
+    from utils.utils_callbacks import callback_tokens
+    keyboard = [[{"text": f"Вопрос {i}", "callback_data": f"faq_{i}", "response": f"Ответ {i}"}]
+                for i in range(1, 2 * KEYBOARD_PAGE_ROWS + 2)]
+    config = {"bot_name": "Faq", "format": "entities", "handlers": [
+        {"command": "/faq", "text": "Вопросы:", "reply_markup": {"inline_keyboard": keyboard}},
+    ]}
+    output_file = tmp_path / "bot_1.py"
+    generate(config, str(output_file), 1)
+    monkeypatch.setitem(os.environ, "BOT_TOKEN", "123456:TEST")
+    namespace = runpy.run_path(str(output_file), run_name="paged_bot")
+    pages = namespace["KEYBOARD_PAGES"][0]
+    assert namespace["KEYBOARD_0_PAGES"] is pages and len(pages) == 3
+    keys = {token: key for key, token in callback_tokens(str(output_file)).items()}
+    navigation = [[keys[button.callback_data] for button in page.inline_keyboard[-1]] for page in pages]
+    assert navigation == [["pg", "pg:0:1"], ["pg:0:0", "pg", "pg:0:2"], ["pg:0:1", "pg"]]
+    assert [len(page.inline_keyboard) - 1 for page in pages] == [KEYBOARD_PAGE_ROWS, KEYBOARD_PAGE_ROWS, 1]
+    assert "reply_markup=KEYBOARD_0_PAGES[0]" in output_file.read_text(encoding="utf-8")
+
+
+@pytest.mark.asyncio
+async def test_turning_pages_back_and_forth_edits_every_time(tmp_path, monkeypatch):
+    import runpy
+    from aiogram import Bot
+    from aiogram.methods import EditMessageReplyMarkup
+    from aiogram.types import Update
+    from generate import KEYBOARD_PAGE_ROWS
+    from tests.test_live import RecordingSession
+    from utils.utils_callbacks import callback_tokens
+    keyboard = [[{"text": f"Вопрос {i}", "callback_data": f"faq_{i}", "response": f"Ответ {i}"}]
+                for i in range(1, 2 * KEYBOARD_PAGE_ROWS + 2)]
+    config = {"bot_name": "Faq", "handlers": [
+        {"command": "/faq", "text": "Вопросы:", "reply_markup": {"inline_keyboard": keyboard}},
+    ]}
+    output_file = tmp_path / "bot_1.py"
+    generate(config, str(output_file), 1)
+    monkeypatch.setitem(os.environ, "BOT_TOKEN", "123456:TEST")
+    namespace = runpy.run_path(str(output_file), run_name="paged_bot")
+    tokens = callback_tokens(str(output_file))
+    session = RecordingSession()
+    bot = Bot("123456:TEST", session=session)
+    # ▶️ ◀️ ▶️ on the same message within a second
+    for update_id, key in enumerate(("pg:0:1", "pg:0:0", "pg:0:1"), start=1):
+        update = Update.model_validate({"update_id": update_id, "callback_query": {
+            "id": str(update_id), "chat_instance": "1", "data": tokens[key],
+            "from": {"id": 5, "is_bot": False, "first_name": "U"},
+            "message": {"message_id": 7, "date": 0, "chat": {"id": 5, "type": "private"}, "text": "Вопросы:"},
+        }}, context={"bot": bot})
+        await namespace["dp"].feed_update(bot, update)
+
+    edits = [call for call in session.calls if isinstance(call, EditMessageReplyMarkup)]
+    pages = namespace["KEYBOARD_PAGES"][0]
+    assert [edit.reply_markup for edit in edits] == [pages[1], pages[0], pages[1]]
+
+
+def test_generated_script_finds_project_root_at_run_time(tmp_path, monkeypatch, sample_config):
+    import runpy
+    import sys
+    from generate import PROJECT_ROOT
+    output_file = tmp_path / "moved" / "bots" / "bot_1.py"
+    output_file.parent.mkdir(parents=True)
+    generate(sample_config, str(output_file), 1)
+    assert PROJECT_ROOT not in output_file.read_text(encoding="utf-8")
+    monkeypatch.setitem(os.environ, "BOT_TOKEN", "123456:TEST")
+    # The script prepends its root to sys.path
+    monkeypatch.setattr(sys, "path", list(sys.path))
+    namespace = runpy.run_path(str(output_file), run_name="moved_bot")
+    assert namespace["PROJECT_ROOT"] == str(tmp_path / "moved")
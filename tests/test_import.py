@@ -0,0 +1,66 @@
+import json
+import os
+
+import pytest
+
+import cli
+from utils.utils_db import connect_db
+
+TOKEN = "123456:ABCdef"
+
+DEFINITIONS = [
+    {"template": "faq", "name": "Faq bot", "token": TOKEN, "faqs": [{"question": "Где вы", "answer": "В Москве"}]},
+    "not json",
+    {"template": "faq", "name": "Bad!", "token": TOKEN, "faqs": [{"question": "Q", "answer": "A"}]},
+    {"template": "poll", "name": "Poll bot", "token": TOKEN, "user_id": 5,
+     "polls": [{"question": "Цвет", "options": ["Красный", "Синий"]}]},
+    {"template": "poll", "name": "Too many", "token": TOKEN, "polls": [{"question": "Q", "options": list("abcde")}]},
+    {"template": "business_card", "name": "Card", "token": "nope", "welcome": "Hi", "help_text": "Help"},
+    {"template": "business_card", "name": "Card", "token": TOKEN, "welcome": "Привет", "help_text": "Помощь",
+     "email": "me@example"},
+    {"template": "shop", "name": "Shop", "token": TOKEN},
+]
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cli.init_db()
+    path = tmp_path / "bots.jsonl"
+    lines = [item if isinstance(item, str) else json.dumps(item, ensure_ascii=False) for item in DEFINITIONS]
+    path.write_text("\n".join(lines[:2] + [""] + lines[2:]) + "\n", encoding="utf-8")
+    return path
+
+
+def stored_bots():
+    conn = connect_db()
+    rows = conn.execute("SELECT config_id, user_id, bot_name, config_hash FROM bot_configs ORDER BY config_id").fetchall()
+    polls = conn.execute("SELECT config_id, question FROM polls").fetchall()
+    conn.close()
+    return rows, polls
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("workers", [1, 2])
+async def test_import_reports_bad_lines_and_keeps_the_rest(db, capsys, workers):
+    counts = await cli.import_bots(str(db), workers, batch_size=2)
+    assert counts == {"imported": 3, "failed": 5, "generated": 0, "launched": 0}
+    rows, polls = stored_bots()
+    assert [(user_id, name) for _, user_id, name, _ in rows] == [(1, "Faq bot"), (5, "Poll bot"), (1, "Card")]
+    assert all(len(config_hash) == 64 for *_, config_hash in rows)
+    assert polls == [(rows[1][0], "Цвет")]
+    out = capsys.readouterr().out
+    # Line numbers count the blank line, which is skipped
+    for line_no in (2, 4, 6, 7, 9):
+        assert f"Строка {line_no}: " in out
+    assert "Строка 6: опрос 1 должен содержать от 2 до 4 вариантов ответа" in out
+    assert "Строка 9: неизвестный шаблон: 'shop'" in out
+
+
+@pytest.mark.asyncio
+async def test_import_generates_scripts(db):
+    counts = await cli.import_bots(str(db), 1, batch_size=100, action="generate")
+    assert counts["generated"] == 3
+    rows, _ = stored_bots()
+    for config_id, *_ in rows:
+        assert os.path.exists(f"bots/bot_{config_id}.py")
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import random
+import runpy
+
+import pytest
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import AnswerCallbackQuery, EditMessageText
+from aiogram.types import Update
+
+from benchmarks.suite import synthetic_poll_config
+from generate import generate
+from utils.utils_callbacks import callback_tokens
+from utils.utils_live import EditCoalescer, results_text
+
+
+def test_results_text_lists_every_option():
+    text = results_text("Цвет?", ("Красный", "Синий", "Зелёный"), {"Красный": 3, "Синий": 1})
+    assert text.splitlines() == [
+        "Цвет?", "",
+        "Красный — 3 (75%)", "▓▓▓▓▓▓▓▓░░",
+        "Синий — 1 (25%)", "▓▓░░░░░░░░",
+        "Зелёный — 0 (0%)", "░░░░░░░░░░",
+        "", "Всего голосов: 4",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_edits_are_coalesced_per_message():
+    coalescer = EditCoalescer(interval=0.2)
+    edits = []
+
+    def edit(key, value):
+        async def run():
+            edits.append((key, value))
+        return run
+
+    for value in range(5):
+        coalescer.schedule("a", edit("a", value))
+        await asyncio.sleep(0.01)
+    coalescer.schedule("b", edit("b", 0))
+    await coalescer.close()
+    # The first edit runs at once, the rest collapse into the latest one
+    assert edits == [("a", 0), ("b", 0), ("a", 4)]
+
+
+class RecordingSession(BaseSession):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls.append(method)
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_generated_bot_edits_poll_message_with_live_results(tmp_path, monkeypatch):
+    config, polls = synthetic_poll_config(2, random.Random(1))
+    config["live_results"] = 1
+    path = str(tmp_path / "bot_1.py")
+    generate(config, path, 1)
+    monkeypatch.setitem(os.environ, "BOT_TOKEN", "123456:TEST")
+    namespace = runpy.run_path(path, run_name="live_bot")
+    namespace["init_db"]()
+    question, options = polls[0]
+    assert namespace["LIVE_RESULTS"].polls[1] == (question, tuple(options))
+
+    session = RecordingSession()
+    bot = Bot("123456:TEST", session=session)
+    tokens = callback_tokens(path)
+    for user_id, option in ((1, 1), (2, 2), (3, 2), (1, 2)):
+        update = Update.model_validate({"update_id": user_id * 10 + option, "callback_query": {
+            "id": str(user_id * 10 + option), "chat_instance": "1", "data": tokens[f"poll_1_option_{option}"],
+            "from": {"id": user_id, "is_bot": False, "first_name": "U"},
+            "message": {"message_id": 5, "date": 0, "chat": {"id": 9, "type": "private"}, "text": question},
+        }}, context={"bot": bot})
+        await namespace["dp"].feed_update(bot, update)
+    await namespace["LIVE_RESULTS"].coalescer.close()
+
+    answers = [call for call in session.calls if isinstance(call, AnswerCallbackQuery)]
+    edits = [call for call in session.calls if isinstance(call, EditMessageText)]
+    assert len(answers) == 4 and answers[0].text == f"Спасибо! Вы выбрали: {options[0]}"
+    # The first vote is shown right away; the other three wait out the interval and share one edit
+    assert len(edits) == 2
+    assert edits[-1].text == results_text(question, options, {options[1]: 3})
+    assert (edits[-1].chat_id, edits[-1].message_id) == (9, 5)
@@ -0,0 +1,18 @@
+import pytest
+import target_bot_code
+from utils import utils_telegram
+from utils.utils_loadtest import run
+
+
+@pytest.mark.asyncio
+async def test_load_harness_completes_all_templates(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(target_bot_code, "generate_and_run_bot", target_bot_code.generate_and_run_bot)
+    monkeypatch.setattr(utils_telegram, "TELEGRAM_API_URL", utils_telegram.TELEGRAM_API_URL)
+    report = await run(users=3, concurrency=3)
+    assert report["flows_completed"] == 3
+    assert report["flows_failed"] == 0
+    for name in ("finalize_business_card", "finalize_faq", "finalize_poll"):
+        assert report["steps"][name]["count"] == 1
+        assert report["steps"][name]["p99_ms"] >= report["steps"][name]["p50_ms"]
+    assert (tmp_path / "bots" / "bot_1.py").exists()
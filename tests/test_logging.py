@@ -0,0 +1,81 @@
+import json
+import logging
+from utils.utils_logging import LogTail, SamplingFilter, format_log_line, setup_logging, stop_logging, tail_lines
+
+
+def make_record(level, msg, args=()):
+    return logging.LogRecord("test", level, __file__, 1, msg, args, None)
+
+
+def test_sampling_keeps_one_in_n_debug_per_template():
+    sampling = SamplingFilter(0.25)
+    kept = [sampling.filter(make_record(logging.DEBUG, "Sending message: %s", (i,))) for i in range(8)]
+    assert kept == [True, False, False, False, True, False, False, False]
+    assert sampling.filter(make_record(logging.DEBUG, "Other: %s", (1,)))
+    assert all(sampling.filter(make_record(logging.ERROR, "Sending message: %s", (i,))) for i in range(3))
+    assert sampling.dropped == 6
+
+
+def test_json_lines_written_by_listener(tmp_path):
+    log_file = tmp_path / "logs" / "bot_7.log"
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    try:
+        setup_logging(str(log_file), level=logging.INFO, debug_sample=1.0, bot_id=7)
+        logging.getLogger("bot").debug("hidden %s", "x")
+        logging.getLogger("bot").info("Sending message: %s", "Привет", extra={"chat_id": 42})
+        stop_logging()
+    finally:
+        root.handlers[:] = saved_handlers
+        root.setLevel(saved_level)
+    lines = log_file.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1
+    entry = json.loads(lines[0])
+    assert entry["message"] == "Sending message: Привет"
+    assert entry["bot_id"] == 7 and entry["chat_id"] == 42 and entry["level"] == "INFO"
+
+
+def test_polling_start_is_logged_above_info(tmp_path):
+    log_file = tmp_path / "logs" / "bot_7.log"
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    try:
+        setup_logging(str(log_file), level=logging.WARNING)
+        logging.getLogger("bot").info("hidden")
+        logging.getLogger("aiogram.dispatcher").info("Run polling for bot @fake id=1")
+        stop_logging()
+    finally:
+        root.handlers[:] = saved_handlers
+        root.setLevel(saved_level)
+        logging.getLogger("aiogram.dispatcher").setLevel(logging.NOTSET)
+    lines = log_file.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["message"] for line in lines] == ["Run polling for bot @fake id=1"]
+
+
+def test_tail_lines_reads_from_the_end(tmp_path):
+    log_file = tmp_path / "bot.log"
+    log_file.write_text("".join(f"line {i}\n" for i in range(5000)), encoding="utf-8")
+    assert tail_lines(str(log_file), 3, block_size=64) == ["line 4997", "line 4998", "line 4999"]
+    assert tail_lines(str(log_file), 0) == []
+
+
+def test_log_tail_picks_up_appends_and_rotation(tmp_path):
+    log_file = tmp_path / "bot.log"
+    log_file.write_text("a\nb\n", encoding="utf-8")
+    tail = LogTail(str(log_file), max_lines=3)
+    assert tail.read(10) == ["a", "b"]
+    with open(log_file, "a", encoding="utf-8") as f:
+        f.write("c\nd\npart")
+    assert tail.read(10) == ["b", "c", "d"]
+    with open(log_file, "a", encoding="utf-8") as f:
+        f.write("ial\n")
+    assert tail.read(2) == ["d", "partial"]
+    log_file.write_text("new\n", encoding="utf-8")
+    assert tail.read(10) == ["new"]
+    assert LogTail(str(tmp_path / "missing.log")).read(5) == []
+
+
+def test_format_log_line():
+    line = json.dumps({"ts": 0, "level": "INFO", "logger": "x", "message": "hi"})
+    assert format_log_line(line).endswith(" INFO hi")
+    assert format_log_line("plain text") == "plain text"
@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+
+import aiohttp
+import pytest
+
+from utils.utils_db import connect_db, query_label
+from utils.utils_metrics import (
+    DB_LATENCY, HANDLER_ERRORS, HANDLER_LATENCY, HandlerMetricsMiddleware, Registry, start_metrics_server,
+)
+from utils.utils_polls import init_poll_tables, save_poll_response
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    latency = registry.histogram("handler_seconds", "Latency", ("handler",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        latency.observe(value, "start")
+    created = registry.counter("bots_created_total", "Bots", ("template",))
+    created.inc("faq")
+    registry.gauge("wizards", "Wizards", ("form",), callback=lambda: {("PollCreationForm",): 2})
+
+    text = registry.render()
+    assert '# TYPE handler_seconds histogram' in text
+    assert 'handler_seconds_bucket{handler="start",le="0.1"} 1' in text
+    assert 'handler_seconds_bucket{handler="start",le="1.0"} 3' in text
+    assert 'handler_seconds_bucket{handler="start",le="+Inf"} 4' in text
+    assert 'handler_seconds_count{handler="start"} 4' in text
+    assert 'bots_created_total{template="faq"} 1' in text
+    assert 'wizards{form="PollCreationForm"} 2' in text
+
+
+@pytest.mark.asyncio
+async def test_handler_middleware_labels_by_callback_name():
+    async def process_start(event, data):
+        return "ok"
+
+    async def process_broken(event, data):
+        raise ValueError("boom")
+
+    middleware = HandlerMetricsMiddleware()
+    before = HANDLER_LATENCY.count("process_start")
+    assert await middleware(process_start, None, {"handler": SimpleNamespace(callback=process_start)}) == "ok"
+    assert HANDLER_LATENCY.count("process_start") == before + 1
+
+    errors = HANDLER_ERRORS.get("process_broken", "ValueError")
+    with pytest.raises(ValueError):
+        await middleware(process_broken, None, {"handler": SimpleNamespace(callback=process_broken)})
+    assert HANDLER_ERRORS.get("process_broken", "ValueError") == errors + 1
+
+
+def test_db_statements_are_timed(tmp_path):
+    assert query_label("INSERT INTO bot_configs (user_id) VALUES (?)") == "INSERT bot_configs"
+    before = DB_LATENCY.count("SELECT users")
+    conn = connect_db(str(tmp_path / "metrics.db"))
+    c = conn.cursor()
+    c.execute("CREATE TABLE users (id INTEGER)")
+    c.execute("SELECT id FROM users WHERE id = ?", (1,))
+    conn.execute("SELECT id FROM users")
+    init_poll_tables(conn)
+    conn.close()
+    assert DB_LATENCY.count("SELECT users") == before + 2
+
+    # Modules outside the builder go through the same connection
+    before = DB_LATENCY.count("INSERT poll_responses")
+    save_poll_response(1, 7, 3, "Да", db_path=str(tmp_path / "metrics.db"))
+    assert DB_LATENCY.count("INSERT poll_responses") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_serves_text_format():
+    registry = Registry()
+    registry.counter("requests_total", "Requests").inc()
+    runner = await start_metrics_server(0, registry=registry)
+    try:
+        port = runner.addresses[0][1]
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"http://127.0.0.1:{port}/metrics") as response:
+                assert response.status == 200
+                assert "requests_total 1" in await response.text()
+    finally:
+        await runner.cleanup()
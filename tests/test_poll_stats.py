@@ -0,0 +1,99 @@
+import os
+import random
+import runpy
+import sqlite3
+
+import pytest
+from aiogram import Bot
+from aiogram.types import Update
+
+from benchmarks.suite import synthetic_poll_config
+from cli import poll_stats
+from generate import PROJECT_ROOT, generate
+from tests.test_live import RecordingSession
+from utils import utils_db
+from utils.utils_callbacks import callback_tokens
+from utils.utils_poll_stats import DAY, HOUR, option_shares, poll_activity, refresh_rollups, stats_table
+from utils.utils_polls import init_poll_tables, save_poll_response
+
+# 2024-01-01 00:00 UTC
+START = 1704067200
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "bot_users.db")
+    conn = sqlite3.connect(path)
+    init_poll_tables(conn)
+    conn.close()
+    return path
+
+
+def vote(path, user_id, option, at, poll_id=7):
+    save_poll_response(user_id, poll_id, 3, option, db_path=path)
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE poll_responses SET created_at = datetime(?, 'unixepoch') WHERE poll_id = ? AND user_id = ?",
+                 (at, poll_id, user_id))
+    conn.commit()
+    conn.close()
+
+
+def test_hourly_and_daily_buckets(db):
+    vote(db, 1, "Да", START + 10)
+    vote(db, 2, "Нет", START + 20)
+    vote(db, 3, "Да", START + HOUR + 5)
+    vote(db, 4, "Да", START + DAY + 5)
+    vote(db, 5, "Да", START, poll_id=8)
+    until = START + 2 * DAY
+    assert poll_activity(7, HOUR, START, until, db_path=db) == [(START, 2), (START + HOUR, 1), (START + DAY, 1)]
+    assert option_shares(7, DAY, START, until, db_path=db) == [(START, {"Да": 2, "Нет": 1}), (START + DAY, {"Да": 1})]
+    assert poll_activity(7, HOUR, START + HOUR, START + DAY - 1, db_path=db) == [(START + HOUR, 1)]
+    assert stats_table(7, DAY, START, until, db_path=db).splitlines() == [
+        "2024-01-01       3  Да 67%, Нет 33%",
+        "2024-01-02       1  Да 100%, Нет 0%",
+    ]
+
+
+def test_refresh_is_incremental_and_counts_changed_votes(db):
+    vote(db, 1, "Да", START)
+    vote(db, 2, "Нет", START)
+    assert refresh_rollups(db) == 2
+    assert refresh_rollups(db) == 0
+    # The same vote again is not an event, a changed one is
+    vote(db, 1, "Да", START + 60)
+    vote(db, 2, "Да", START + 120)
+    assert refresh_rollups(db) == 1
+    assert option_shares(7, HOUR, START, START + HOUR, db_path=db) == [(START, {"Да": 2, "Нет": 1})]
+    assert poll_activity(7, HOUR, START, START + HOUR, db_path=db) == [(START, 3)]
+
+
+@pytest.mark.asyncio
+async def test_votes_from_a_generated_bot_reach_stats_read_in_the_project_root(bot_db, tmp_path, monkeypatch, capsys):
+    assert utils_db.PROJECT_ROOT == PROJECT_ROOT
+    config, polls = synthetic_poll_config(1, random.Random(1))
+    bots = tmp_path / "bots"
+    bots.mkdir()
+    path = str(bots / "bot_1.py")
+    generate(config, path, 1)
+    monkeypatch.setitem(os.environ, "BOT_TOKEN", "123456:TEST")
+    # Generated bots are started with bots/ as their working directory
+    monkeypatch.chdir(bots)
+    namespace = runpy.run_path(path, run_name="poll_bot")
+    namespace["init_db"]()
+    bot = Bot("123456:TEST", session=RecordingSession())
+    update = Update.model_validate({"update_id": 1, "callback_query": {
+        "id": "1", "chat_instance": "1", "data": callback_tokens(path)["poll_1_option_2"],
+        "from": {"id": 5, "is_bot": False, "first_name": "U"},
+        "message": {"message_id": 5, "date": 0, "chat": {"id": 5, "type": "private"}, "text": "x"},
+    }}, context={"bot": bot})
+    await namespace["dp"].feed_update(bot, update)
+    assert not (bots / "bot_users.db").exists()
+
+    conn = sqlite3.connect(bot_db)
+    conn.execute("INSERT INTO polls (poll_id, config_id, question, options) VALUES (1, 1, ?, '[]')", (polls[0][0],))
+    conn.commit()
+    conn.close()
+    poll_stats(1, "hour", 24)
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == f"Опрос 1: {polls[0][0]}"
+    assert lines[1].endswith(f"       1  {polls[0][1][1]} 100%")
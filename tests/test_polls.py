@@ -0,0 +1,78 @@
+import sqlite3
+from unittest.mock import AsyncMock
+
+import pytest
+
+from utils.utils_polls import init_poll_tables, poll_tallies, save_poll_response
+
+LEGACY_RESPONSES = [(1, 7, "Красный"), (1, 7, "Синий"), (2, 7, "Синий"), (1, 8, "Да"), (1, 7, "Синий")]
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "bot_users.db")
+    conn = sqlite3.connect(path)
+    init_poll_tables(conn)
+    conn.close()
+    return path
+
+
+def responses(path):
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT user_id, poll_id, option_text FROM poll_responses ORDER BY poll_id, user_id").fetchall()
+    conn.close()
+    return rows
+
+
+def test_repeated_votes_count_once_and_can_change(db):
+    assert save_poll_response(1, 7, 3, "Красный", db_path=db) is None
+    assert save_poll_response(1, 7, 3, "Красный", db_path=db) == "Красный"
+    assert save_poll_response(2, 7, 3, "Красный", db_path=db) is None
+    assert poll_tallies(7, db_path=db) == {"Красный": 2}
+    assert save_poll_response(1, 7, 3, "Синий", db_path=db) == "Красный"
+    assert poll_tallies(7, db_path=db) == {"Красный": 1, "Синий": 1}
+    assert responses(db) == [(1, 7, "Синий"), (2, 7, "Красный")]
+
+
+def test_migration_keeps_latest_vote_and_recounts(tmp_path):
+    path = str(tmp_path / "bot_users.db")
+    conn = sqlite3.connect(path)
+    # A database from before the unique index, with repeated presses
+    conn.execute("CREATE TABLE poll_responses (response_id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, "
+                 "poll_id INTEGER, config_id INTEGER, option_text TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+    conn.executemany("INSERT INTO poll_responses (user_id, poll_id, config_id, option_text) VALUES (?, ?, 3, ?)",
+                     LEGACY_RESPONSES)
+    conn.commit()
+    init_poll_tables(conn)
+    init_poll_tables(conn)
+    conn.close()
+    assert responses(path) == [(1, 7, "Синий"), (2, 7, "Синий"), (1, 8, "Да")]
+    assert poll_tallies(7, db_path=path) == {"Синий": 2}
+    save_poll_response(2, 7, 3, "Красный", db_path=path)
+    assert poll_tallies(7, db_path=path) == {"Синий": 1, "Красный": 1}
+
+
+@pytest.mark.asyncio
+async def test_deleting_someone_elses_bot_keeps_its_votes(bot_db, tmp_path, monkeypatch):
+    from target_bot_code import init_db, process_delete_id
+    monkeypatch.chdir(tmp_path)
+    init_db()
+    conn = sqlite3.connect(bot_db)
+    conn.execute("INSERT INTO bot_configs (config_id, user_id, bot_name, bot_token) VALUES (3, 1, 'B', '1:A')")
+    conn.execute("INSERT INTO polls (poll_id, config_id, question, options) VALUES (7, 3, 'Цвет?', '[]')")
+    conn.commit()
+    conn.close()
+    save_poll_response(1, 7, 3, "Синий")
+    message = AsyncMock(text="3")
+
+    message.from_user.id = 2
+    await process_delete_id(message, AsyncMock())
+    assert "не владелец" in message.answer.call_args.args[0]
+    assert poll_tallies(7) == {"Синий": 1}
+    assert responses(bot_db) == [(1, 7, "Синий")]
+
+    message.from_user.id = 1
+    await process_delete_id(message, AsyncMock())
+    assert "успешно удален" in message.answer.call_args.args[0]
+    assert poll_tallies(7) == {}
+    assert responses(bot_db) == []
@@ -0,0 +1,63 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import pytest
+
+from utils.utils_profiler import find_profile, read_collapsed, request_profile, top_functions, wait_for_profile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BUSY_BOT = """
+import sys, time
+sys.path.insert(0, {root!r})
+from utils.utils_profiler import install_profiler
+
+def burn_cpu():
+    total = 0
+    for i in range(10_000):
+        total += i * i
+    return total
+
+install_profiler(7, {profiles!r})
+print("ready", flush=True)
+deadline = time.time() + 20
+while time.time() < deadline:
+    burn_cpu()
+"""
+
+
+def test_top_functions_counts_leaf_frames(tmp_path):
+    path = tmp_path / "bot_1-1.collapsed"
+    path.write_text("main (bot.py:1);handle (bot.py:5) 3\nmain (bot.py:1);select (loop.py:9) 1\n")
+    counts = read_collapsed(str(path))
+    assert counts == Counter({"main (bot.py:1);handle (bot.py:5)": 3, "main (bot.py:1);select (loop.py:9)": 1})
+    assert top_functions(counts) == [("handle (bot.py:5)", 3, 0.75), ("select (loop.py:9)", 1, 0.25)]
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGUSR1"), reason="needs SIGUSR1")
+@pytest.mark.asyncio
+async def test_running_bot_writes_profile_on_signal(tmp_path):
+    profiles = str(tmp_path / "profiles")
+    script = tmp_path / "bot_7.py"
+    script.write_text(BUSY_BOT.format(root=ROOT, profiles=profiles))
+    process = subprocess.Popen([sys.executable, str(script)], stdout=subprocess.PIPE, text=True)
+    try:
+        assert process.stdout.readline().strip() == "ready"
+        assert find_profile(7, 0, profiles) is None
+        since = request_profile(7, process.pid, 0.5, profiles)
+        path = await wait_for_profile(7, since, 10, profiles, poll_interval=0.1)
+        assert path is not None
+        assert not os.path.exists(os.path.join(profiles, "bot_7.ctl"))
+        counts = read_collapsed(path)
+        assert sum(counts.values()) > 10
+        assert any("burn_cpu (bot_7.py:" in stack for stack in counts)
+        # Profiling stops after the requested time, the bot keeps running
+        time.sleep(0.2)
+        assert process.poll() is None
+    finally:
+        process.kill()
+        process.wait()
@@ -0,0 +1,87 @@
+import asyncio
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage, GetMe
+from utils.utils_ratelimit import (
+    OutboundLimiter, RateLimitMiddleware, TokenBucket, PRIORITY_HIGH, PRIORITY_LOW, get_limiter
+)
+
+
+class FakeBot:
+    id = 42
+
+
+def test_token_bucket_delay():
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.delay() == 0
+    bucket.consume()
+    bucket.consume()
+    assert 0 < bucket.delay() <= 0.1
+    bucket.pause(5)
+    assert bucket.delay() > 4
+
+
+@pytest.mark.asyncio
+async def test_priority_order_under_global_limit():
+    limiter = OutboundLimiter(global_rate=50, chat_rate=100, chat_burst=100)
+    limiter.global_bucket.tokens = 0
+    order = []
+
+    async def send(name, priority):
+        await limiter.acquire(None, priority)
+        order.append(name)
+
+    await asyncio.gather(send("low", PRIORITY_LOW), send("high", PRIORITY_HIGH))
+    assert order == ["high", "low"]
+    assert limiter.stats()["sent"] == 2
+    assert limiter.stats()["queue_depth"] == 0
+
+
+@pytest.mark.asyncio
+async def test_per_chat_limit_spaces_messages():
+    limiter = OutboundLimiter(global_rate=100, chat_rate=20, chat_burst=1)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    for _ in range(3):
+        await limiter.acquire(chat_id=1)
+    assert loop.time() - started >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_middleware_retries_after_flood_wait():
+    method = SendMessage(chat_id=1, text="hi")
+    calls = []
+
+    async def make_request(bot, method):
+        calls.append(method)
+        if len(calls) == 1:
+            raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=0)
+        return "ok"
+
+    middleware = RateLimitMiddleware(max_retries=1)
+    assert await middleware(make_request, FakeBot(), method) == "ok"
+    assert len(calls) == 2
+    assert get_limiter(FakeBot.id).stats()["retries"] == 1
+
+
+@pytest.mark.asyncio
+async def test_middleware_skips_non_send_methods():
+    async def make_request(bot, method):
+        return "me"
+
+    assert await RateLimitMiddleware()(make_request, FakeBot(), GetMe()) == "me"
+
+
+@pytest.mark.asyncio
+async def test_waits_are_observed_into_histogram(monkeypatch):
+    from utils import utils_ratelimit
+    from utils.utils_metrics import Registry
+    histogram = Registry().histogram("wait", "Limiter wait", ("bot_id",))
+    monkeypatch.setattr(utils_ratelimit, "_wait_histogram", None)
+    utils_ratelimit.observe_waits(histogram)
+    limiter = OutboundLimiter(global_rate=100, chat_rate=20, chat_burst=1, bot_id=7)
+    for _ in range(3):
+        await limiter.acquire(chat_id=1)
+    assert histogram.count(7) == 3
+    # The second and third sends waited for the chat bucket
+    assert histogram.values[(7,)][1] >= 0.09
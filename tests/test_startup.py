@@ -0,0 +1,23 @@
+from benchmarks.suite import measure_generated_bot, measure_imports
+
+RUNTIME_MODULES = ("aiogram", "aiohttp", "psutil")
+# Modules a generated bot may load on top of aiogram's own Dispatcher import
+GENERATED_BOT_MODULE_BUDGET = 25
+
+
+def loads_any(result, prefixes):
+    return [name for name in result["loaded"] if name.split(".")[0] in prefixes]
+
+
+def test_cli_and_validators_skip_bot_runtime():
+    assert loads_any(measure_imports("import utils.utils_validation"), RUNTIME_MODULES) == []
+    assert loads_any(measure_imports("import cli"), RUNTIME_MODULES) == []
+
+
+def test_generated_bot_import_budget(tmp_path):
+    baseline = measure_imports("from aiogram import Dispatcher")
+    result = measure_generated_bot("business_card", str(tmp_path))
+    assert loads_any(result, ("sqlite3", "dotenv", "psutil")) == []
+    assert result["modules"] <= baseline["modules"] + GENERATED_BOT_MODULE_BUDGET, (
+        set(result["loaded"]) - set(baseline["loaded"])
+    )
@@ -0,0 +1,116 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+
+from utils import utils_supervisor
+from utils.utils_db import connect_db
+from utils.utils_supervisor import BotSupervisor, wait_until_ready
+from utils.utils_telegram import TOKEN_OK, TOKEN_REJECTED
+
+# Bot 1 starts polling, bot 2 crashes on start, bot 3's token is rejected
+FAKE_BOT = """
+import os, sys, time
+config_id = int(sys.argv[1])
+if config_id == 2:
+    sys.exit(1)
+os.makedirs("bots/logs", exist_ok=True)
+with open(f"bots/logs/bot_{config_id}.log", "a") as f:
+    f.write('{"message": "Run polling for bot @fake id=1"}\\n')
+time.sleep(60)
+"""
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    from utils.utils_runner import init_db
+    monkeypatch.chdir(tmp_path)
+    init_db()
+    conn = connect_db()
+    conn.executemany(
+        "INSERT INTO bot_configs (config_id, user_id, bot_name, config_json, bot_token) VALUES (?, 1, 'B', '{}', ?)",
+        [(1, "1:A"), (2, "2:B"), (3, "bad")]
+    )
+    conn.commit()
+    conn.close()
+    script = tmp_path / "fake_bot.py"
+    script.write_text(FAKE_BOT)
+    launches = []
+
+    async def fake_run(config, bot_token, config_id):
+        launches.append(config_id)
+        process = subprocess.Popen([sys.executable, str(script), str(config_id)])
+        conn = connect_db()
+        conn.execute('UPDATE bot_configs SET pid = ? WHERE config_id = ?', (process.pid, config_id))
+        conn.commit()
+        conn.close()
+        return process
+
+    async def fake_status(bot_token):
+        return (TOKEN_REJECTED, "Unauthorized") if bot_token == "bad" else (TOKEN_OK, "")
+
+    monkeypatch.setattr(utils_supervisor, "generate_and_run_bot", fake_run)
+    monkeypatch.setattr(utils_supervisor, "token_status", fake_status)
+    return launches
+
+
+def pids():
+    conn = connect_db()
+    rows = dict(conn.execute("SELECT config_id, pid FROM bot_configs").fetchall())
+    conn.close()
+    return rows
+
+
+@pytest.mark.asyncio
+async def test_serve_counts_and_restarts_crashed_bots(db):
+    supervisor = BotSupervisor(concurrency=2, restart_delay=0.1, check_interval=0.1, ready_timeout=10)
+    try:
+        assert await supervisor.start_all() == {"ready": 1, "slow": 0, "failed": 1, "rejected": 1, "restarts": 0}
+        assert sorted(db) == [1, 2]
+
+        supervise = asyncio.create_task(supervisor.supervise())
+        await asyncio.sleep(1.5)
+        assert supervisor.counts["restarts"] >= 1
+        assert db.count(2) >= 2 and db.count(1) == 1
+        assert pids()[2] is None
+        running = supervisor.processes[1]
+    finally:
+        await supervisor.stop()
+    await supervise
+    assert running.poll() is not None
+    assert all(pid is None for pid in pids().values())
+    assert not os.path.exists("bots/logs/bot_3.log")
+
+
+@pytest.mark.asyncio
+async def test_ready_marker_is_found_after_the_log_rotates(tmp_path):
+    log_file = tmp_path / "bot_1.log"
+    log_file.write_text("old line\n" * 100)
+    offset = log_file.stat().st_size
+    process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        waiting = asyncio.create_task(wait_until_ready(process, str(log_file), offset, timeout=5, poll_interval=0.05))
+        await asyncio.sleep(0.2)
+        # RotatingFileHandler renames the full file and starts a new, shorter one
+        log_file.rename(tmp_path / "bot_1.log.1")
+        log_file.write_text('{"message": "Run polling for bot @fake id=1"}\n')
+        assert await waiting
+    finally:
+        process.kill()
+        process.wait()
+
+
+@pytest.mark.asyncio
+async def test_running_bot_that_does_not_log_readiness_is_slow_not_failed(db, monkeypatch):
+    async def silent_run(config, bot_token, config_id):
+        return subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+
+    monkeypatch.setattr(utils_supervisor, "generate_and_run_bot", silent_run)
+    supervisor = BotSupervisor(concurrency=1, check_tokens=False, ready_timeout=0.5)
+    try:
+        assert await supervisor.launch(1, "{}", "1:A") == "slow"
+        assert supervisor.processes[1].poll() is None
+    finally:
+        await supervisor.stop()
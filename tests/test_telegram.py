@@ -0,0 +1,74 @@
+import pytest
+from utils import utils_telegram
+from utils.utils_telegram import TTLCache, check_bot_token
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def json(self, content_type=None):
+        return self.data
+
+
+class FakeSession:
+    def __init__(self, data):
+        self.data = data
+        self.calls = 0
+
+    def get(self, url):
+        self.calls += 1
+        return FakeResponse(self.data)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    utils_telegram._getme_cache.clear()
+
+
+def test_ttl_cache_expiry(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(utils_telegram.time, "monotonic", lambda: now[0])
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1, ttl=10)
+    assert cache.get("a") == 1
+    now[0] += 11
+    assert cache.get("a") is None
+    cache.set("a", 1, ttl=10)
+    cache.set("b", 2, ttl=10)
+    cache.set("c", 3, ttl=10)
+    assert len(cache) == 2
+    assert cache.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_check_bot_token_caches_positive_result(monkeypatch):
+    session = FakeSession({"ok": True, "result": {"id": 123456}})
+    monkeypatch.setattr(utils_telegram, "get_session", lambda: session)
+    assert await check_bot_token("123456:ABCDEF") == (True, "")
+    assert await check_bot_token("123456:ABCDEF") == (True, "")
+    assert session.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_check_bot_token_caches_rejected_token(monkeypatch):
+    session = FakeSession({"ok": False, "error_code": 401, "description": "Unauthorized"})
+    monkeypatch.setattr(utils_telegram, "get_session", lambda: session)
+    assert await check_bot_token("123456:ABCDEF") == (False, "Unauthorized")
+    assert await check_bot_token("123456:ABCDEF") == (False, "Unauthorized")
+    assert session.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_check_bot_token_rejects_bad_format_without_request(monkeypatch):
+    session = FakeSession({"ok": True})
+    monkeypatch.setattr(utils_telegram, "get_session", lambda: session)
+    is_valid, error = await check_bot_token("invalid_token")
+    assert not is_valid
+    assert session.calls == 0
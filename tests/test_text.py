@@ -0,0 +1,48 @@
+from utils.utils_text import escape_markdown, MessageBuilder, MARKDOWN_V2_SPECIAL_CHARS, ESCAPE_CACHE_MAX_LEN
+
+
+def escape_markdown_loop(text):
+    # The implementation escape_markdown replaced, kept as the reference
+    if not text:
+        return text
+    special_chars = r'_[]()*~`>#+-=|{}.!?'
+    escaped_text = ''
+    for char in text:
+        if char in special_chars:
+            escaped_text += '\\' + char
+        else:
+            escaped_text += char
+    return escaped_text
+
+
+def test_escape_markdown_matches_reference():
+    text = "Привет! Цена: 100-200 руб. (скидка_10%) #акция " + MARKDOWN_V2_SPECIAL_CHARS
+    assert escape_markdown(text) == escape_markdown_loop(text)
+    assert escape_markdown("Привет!") == "Привет\\!"
+    long_text = text * (ESCAPE_CACHE_MAX_LEN // len(text) + 1)
+    assert escape_markdown(long_text) == escape_markdown_loop(long_text)
+
+
+def test_escape_markdown_empty_values():
+    assert escape_markdown("") == ""
+    assert escape_markdown(None) is None
+
+
+def test_message_builder_offsets_in_utf16():
+    text, entities = (
+        MessageBuilder().text("📋 ").bold("Контакты:").text(" ").link("сайт", "https://example.com").build()
+    )
+    assert text == "📋 Контакты: сайт"
+    # The emoji is two UTF-16 code units
+    assert entities == [
+        {"type": "bold", "offset": 3, "length": 9},
+        {"type": "text_link", "offset": 13, "length": 4, "url": "https://example.com"},
+    ]
+
+
+def test_message_builder_kwargs_disable_parse_mode():
+    kwargs = MessageBuilder().italic("a_b*c!").as_kwargs()
+    assert kwargs["text"] == "a_b*c!"
+    assert kwargs["parse_mode"] is None
+    assert kwargs["entities"][0].type == "italic"
+    assert MessageBuilder().text("plain").as_kwargs()["entities"] is None
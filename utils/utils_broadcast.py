@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import os
+import socket
+
+import psutil
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError
+
+from utils.utils_db import connect_db
+from utils.utils_ratelimit import send_priority, PRIORITY_LOW
+from utils.utils_telegram import create_bot
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_CONCURRENCY = 10
+BROADCAST_BATCH_SIZE = 200
+
+
+def create_broadcast(config_id, owner_id, text):
+    conn = connect_db()
+    c = conn.cursor()
+    c.execute('INSERT INTO broadcasts (config_id, user_id, text) VALUES (?, ?, ?)', (config_id, owner_id, text))
+    broadcast_id = c.lastrowid
+    conn.commit()
+    conn.close()
+    return broadcast_id
+
+
+def runner_id():
+    """Who runs a claimed broadcast: this host and process."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _runner_gone(runner):
+    # Jobs claimed before runners were recorded have none
+    if runner is None:
+        return True
+    host, _, pid = runner.rpartition(":")
+    return host == socket.gethostname() and pid.isdigit() and not psutil.pid_exists(int(pid))
+
+
+def claim_broadcast(broadcast_id, runner=None):
+    """Mark the broadcast as running by ``runner``. Returns False if it is done or another runner has it.
+
+    Pending and interrupted jobs can be claimed, and so can running ones whose
+    process on this host died without a clean shutdown.
+    """
+    runner = runner or runner_id()
+    conn = connect_db()
+    c = conn.cursor()
+    c.execute('SELECT status, runner FROM broadcasts WHERE broadcast_id = ?', (broadcast_id,))
+    row = c.fetchone()
+    if row and row[0] == 'running' and (row[1] == runner or _runner_gone(row[1])):
+        # Only if nobody claimed it since it was read
+        c.execute("UPDATE broadcasts SET runner = ? WHERE broadcast_id = ? AND status = 'running' AND runner IS ?",
+                  (runner, broadcast_id, row[1]))
+    else:
+        c.execute("UPDATE broadcasts SET status = 'running', runner = ? "
+                  "WHERE broadcast_id = ? AND status IN ('pending', 'interrupted')", (runner, broadcast_id))
+    claimed = c.rowcount > 0
+    conn.commit()
+    conn.close()
+    return claimed
+
+
+def claim_unfinished_broadcasts(runner=None):
+    """``[(broadcast_id, owner_id)]`` of the unfinished broadcasts this runner claimed."""
+    conn = connect_db()
+    c = conn.cursor()
+    c.execute("SELECT broadcast_id, user_id FROM broadcasts WHERE status != 'done'")
+    rows = c.fetchall()
+    conn.close()
+    return [(broadcast_id, owner_id) for broadcast_id, owner_id in rows if claim_broadcast(broadcast_id, runner)]
+
+
+def iter_recipient_batches(config_id, after_user_id=0, batch_size=BROADCAST_BATCH_SIZE):
+    """Yield sorted batches of distinct recipient ids with user_id > after_user_id.
+
+    Keyset pagination keeps memory flat and lets a resumed job continue from
+    the last checkpointed user_id.
+    """
+    conn = connect_db()
+    c = conn.cursor()
+    try:
+        while True:
+            c.execute(
+                'SELECT DISTINCT user_id FROM poll_responses WHERE config_id = ? AND user_id > ? '
+                'ORDER BY user_id LIMIT ?',
+                (config_id, after_user_id, batch_size)
+            )
+            batch = [row[0] for row in c.fetchall()]
+            if not batch:
+                return
+            yield batch
+            after_user_id = batch[-1]
+    finally:
+        conn.close()
+
+
+def _checkpoint(broadcast_id, last_user_id, counts, status='running'):
+    conn = connect_db()
+    c = conn.cursor()
+    c.execute(
+        'UPDATE broadcasts SET last_user_id = ?, delivered = ?, blocked = ?, failed = ?, status = ?, '
+        "finished_at = CASE WHEN ? = 'done' THEN CURRENT_TIMESTAMP ELSE finished_at END "
+        'WHERE broadcast_id = ?',
+        (last_user_id, counts['delivered'], counts['blocked'], counts['failed'], status, status, broadcast_id)
+    )
+    conn.commit()
+    conn.close()
+
+
+async def run_broadcast(broadcast_id, concurrency=BROADCAST_CONCURRENCY, batch_size=BROADCAST_BATCH_SIZE):
+    """Send (or resume sending) a broadcast. Returns delivered/blocked/failed counts.
+
+    The job is claimed first, so a broadcast another process is sending is
+    refused with ValueError. Progress is checkpointed after every batch, so
+    after a crash at most one batch is sent twice; a cancelled or failed run
+    leaves the job interrupted for the next claim.
+    """
+    conn = connect_db()
+    c = conn.cursor()
+    c.execute(
+        'SELECT b.config_id, b.text, b.status, b.last_user_id, b.delivered, b.blocked, b.failed, bc.bot_token '
+        'FROM broadcasts b JOIN bot_configs bc ON bc.config_id = b.config_id WHERE b.broadcast_id = ?',
+        (broadcast_id,)
+    )
+    row = c.fetchone()
+    conn.close()
+    if not row:
+        raise ValueError(f"Рассылка {broadcast_id} не найдена")
+    config_id, text, status, last_user_id, delivered, blocked, failed, bot_token = row
+    counts = {'delivered': delivered, 'blocked': blocked, 'failed': failed}
+    if status == 'done':
+        return counts
+    if not claim_broadcast(broadcast_id):
+        raise ValueError(f"Рассылка {broadcast_id} уже выполняется")
+
+    bot = create_bot(bot_token)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(user_id):
+        async with semaphore:
+            try:
+                await bot.send_message(user_id, text, parse_mode=None)
+                return 'delivered'
+            except TelegramForbiddenError:
+                return 'blocked'
+            except TelegramAPIError as e:
+                logger.warning("Broadcast %s: sending to %s failed: %s", broadcast_id, user_id, e)
+                return 'failed'
+
+    try:
+        with send_priority(PRIORITY_LOW):
+            for batch in iter_recipient_batches(config_id, last_user_id, batch_size):
+                for result in await asyncio.gather(*(send(user_id) for user_id in batch)):
+                    counts[result] += 1
+                last_user_id = batch[-1]
+                _checkpoint(broadcast_id, last_user_id, counts)
+        _checkpoint(broadcast_id, last_user_id, counts, status='done')
+    except BaseException:
+        # Shut down or failed but still alive to say so: free the job for the
+        # next claim. The batch in flight is resent on resume.
+        _checkpoint(broadcast_id, last_user_id, counts, status='interrupted')
+        raise
+    finally:
+        await bot.session.close()
+    logger.info("Broadcast %s finished: %s", broadcast_id, counts)
+    return counts
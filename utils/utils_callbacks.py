@@ -0,0 +1,98 @@
+"""Compact callback_data for generated bots.
+
+The generator gives every callback key a bot's keyboards use (``faq_3``,
+``poll_2_option_1``, page navigation) a dense id in order of appearance.
+Buttons carry ``<version>.<id>`` with both numbers in base 36, and a press
+is resolved by indexing the handler tuple of that version, not by testing
+one filter per button.
+
+Each regeneration with a different set of keys gets a new version. The key
+tables of the last KEPT_VERSIONS versions are stored in
+``bot_N.callbacks.json`` next to the script, so buttons still in the chat
+history keep resolving after a config reload.
+"""
+import json
+import os
+
+SEPARATOR = "."
+DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+KEPT_VERSIONS = 8
+STALE_BUTTON_TEXT = "Эта кнопка устарела, откройте меню заново."
+
+
+def encode(number):
+    """``number`` in base 36, the base int(token, 36) decodes."""
+    token = ""
+    while True:
+        number, digit = divmod(number, len(DIGITS))
+        token = DIGITS[digit] + token
+        if not number:
+            return token
+
+
+def encode_token(version, callback_id):
+    return f"{encode(version)}{SEPARATOR}{encode(callback_id)}"
+
+
+def versions_file(output_file):
+    return os.path.splitext(output_file)[0] + ".callbacks.json"
+
+
+def load_versions(output_file):
+    """Kept key tables of the bot generated at ``output_file``, by version."""
+    try:
+        with open(versions_file(output_file), encoding="utf-8") as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {int(version): keys for version, keys in stored.get("versions", {}).items()}
+
+
+def assign_version(output_file, keys):
+    """Version for the key table ``keys`` and all kept tables, recorded next to ``output_file``."""
+    versions = load_versions(output_file)
+    latest = max(versions, default=None)
+    if latest is not None and versions[latest] == list(keys):
+        return latest, versions
+    version = 0 if latest is None else latest + 1
+    versions[version] = list(keys)
+    for old in sorted(versions)[:-KEPT_VERSIONS]:
+        del versions[old]
+    path = versions_file(output_file)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"versions": {str(v): versions[v] for v in sorted(versions)}}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return version, versions
+
+
+def callback_tokens(output_file):
+    """callback_data the current version of a generated bot sends, by key."""
+    versions = load_versions(output_file)
+    if not versions:
+        return {}
+    version = max(versions)
+    return {key: encode_token(version, callback_id) for callback_id, key in enumerate(versions[version])}
+
+
+class CallbackTable:
+    def __init__(self, version, handlers, keys, old_versions=None):
+        """``handlers`` and ``keys`` are indexed by id in ``version``; ``old_versions``
+        maps each older version to the current id of each of its ids, None if gone."""
+        self.versions = {encode(version): tuple(handlers)}
+        for old, ids in (old_versions or {}).items():
+            self.versions[encode(old)] = tuple(None if i is None else handlers[i] for i in ids)
+        # Keyboards sent before tokens were introduced carry the bare keys
+        self.legacy = dict(zip(keys, handlers))
+
+    def resolve(self, data):
+        """Handler for ``data``, or None for a button of an unknown or dropped version."""
+        version, separator, token = (data or "").partition(SEPARATOR)
+        handlers = self.versions.get(version) if separator else None
+        # int() would also take signs and underscores
+        if handlers is not None and token.isalnum():
+            try:
+                return handlers[int(token, 36)]
+            except (ValueError, IndexError):
+                pass
+        return self.legacy.get(data)
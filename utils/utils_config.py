@@ -0,0 +1,45 @@
+import hashlib
+import json
+
+
+class CanonicalConfig:
+    """A bot config serialized once into compact, key-sorted JSON.
+
+    The same text is stored in ``bot_configs.config_json``, hashed into
+    ``config_hash`` and written to logs, so a config is never dumped twice.
+    ``str()`` returns the text, which keeps ``logger.debug("%s", config)``
+    free when DEBUG is off. Do not mutate ``config`` after wrapping it.
+    """
+
+    __slots__ = ('config', '_text', '_digest')
+
+    def __init__(self, config):
+        self.config = config
+        self._text = None
+        self._digest = None
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = json.dumps(self.config, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+        return self._text
+
+    @property
+    def payload(self):
+        return self.text.encode('utf-8')
+
+    @property
+    def digest(self):
+        if self._digest is None:
+            self._digest = hashlib.sha256(self.payload).hexdigest()
+        return self._digest
+
+    def __getitem__(self, key):
+        return self.config[key]
+
+    def __str__(self):
+        return self.text
+
+
+def canonical(config):
+    return config if isinstance(config, CanonicalConfig) else CanonicalConfig(config)
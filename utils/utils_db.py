@@ -0,0 +1,71 @@
+"""Location of the builder database, shared by every module that opens it.
+
+The builder runs from the project root, generated bots from ``bots/`` and
+the cli from wherever it is called, so the database is addressed by an
+absolute path: ``bot_users.db`` in the project root unless ``BOT_DB_PATH``
+points elsewhere. Generated bots inherit the variable from the builder.
+
+Every connection times its statements, labelled by ``query_label``, into
+the histogram given to ``time_queries``; the builder passes its
+``builder_db_query_duration_seconds``.
+"""
+import os
+import re
+import sqlite3
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.abspath(os.getenv('BOT_DB_PATH') or os.path.join(PROJECT_ROOT, 'bot_users.db'))
+
+# Set by time_queries; generated bots and the cli never import the metrics module
+_query_histogram = None
+
+_QUERY_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|TABLE|EXISTS)\s+(\w+)', re.IGNORECASE)
+_query_labels = {}
+
+
+def time_queries(histogram):
+    """Observe the duration of every statement into ``histogram``, labelled by query."""
+    global _query_histogram
+    _query_histogram = histogram
+
+
+def query_label(sql):
+    """``SELECT bot_configs`` style label for a statement, cached per SQL text."""
+    label = _query_labels.get(sql)
+    if label is None:
+        words = sql.split(None, 1)
+        match = _QUERY_TABLE.search(sql)
+        label = f"{words[0].upper() if words else '?'} {match.group(1) if match else '?'}"
+        if len(_query_labels) < 1000:
+            _query_labels[sql] = label
+    return label
+
+
+class TimedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        if _query_histogram is None:
+            return super().execute(sql, parameters)
+        with _query_histogram.time(query_label(sql)):
+            return super().execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+        if _query_histogram is None:
+            return super().executemany(sql, parameters)
+        with _query_histogram.time(query_label(sql)):
+            return super().executemany(sql, parameters)
+
+
+class TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+        return self.cursor().executemany(sql, parameters)
+
+
+def connect_db(db_path=None, **kwargs):
+    """Timed connection to ``db_path``, or to DB_PATH as it is set at call time."""
+    return sqlite3.connect(db_path or DB_PATH, factory=TimedConnection, **kwargs)
@@ -0,0 +1,96 @@
+import logging
+import time
+
+from aiogram import BaseMiddleware
+from aiogram.exceptions import TelegramAPIError
+
+logger = logging.getLogger(__name__)
+
+# Telegram re-delivers an update, or the same callback query, within minutes
+UPDATE_TTL = 600
+CALLBACK_TTL = 600
+MAX_GENERATION_SIZE = 100_000
+
+
+class RotatingSet:
+    """Set that forgets keys after between ``ttl`` and ``2 * ttl`` seconds.
+
+    Two generations are kept; when the current one is ``ttl`` old (or full)
+    it becomes the previous one and the oldest is dropped wholesale, so
+    memory stays bounded without per-key timestamps.
+    """
+
+    def __init__(self, ttl, max_size=MAX_GENERATION_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.current = set()
+        self.previous = set()
+        self.rotated_at = time.monotonic()
+
+    def _rotate(self):
+        now = time.monotonic()
+        elapsed = now - self.rotated_at
+        if elapsed >= self.ttl or len(self.current) >= self.max_size:
+            self.previous = self.current if elapsed < 2 * self.ttl else set()
+            self.current = set()
+            self.rotated_at = now
+
+    def add(self, key):
+        """Remember ``key``. Returns False if it was already seen."""
+        self._rotate()
+        if key in self.current or key in self.previous:
+            return False
+        self.current.add(key)
+        return True
+
+    def __contains__(self, key):
+        self._rotate()
+        return key in self.current or key in self.previous
+
+    def __len__(self):
+        return len(self.current) + len(self.previous)
+
+
+class DedupMiddleware(BaseMiddleware):
+    """Outer update middleware that drops retried updates and re-delivered callback queries.
+
+    Callback queries are keyed on their id, which is unique per press: pressing
+    the same button again, to turn a page back and forth or to change a vote,
+    is a new press and goes through.
+
+    Install with ``dp.update.outer_middleware(DedupMiddleware())``. Drops are
+    counted in ``dropped`` and, if given, in the metrics ``counter``; it is
+    passed in so generated bots do not load the metrics module.
+    """
+
+    def __init__(self, update_ttl=UPDATE_TTL, callback_ttl=CALLBACK_TTL, counter=None):
+        self.update_ids = RotatingSet(update_ttl)
+        self.callback_ids = RotatingSet(callback_ttl)
+        self.dropped = 0
+        self.counter = counter
+        if counter is not None:
+            # Exported as 0 from the start, not only after the first drop
+            counter.inc(amount=0)
+
+    def _drop(self):
+        self.dropped += 1
+        if self.counter is not None:
+            self.counter.inc()
+
+    async def __call__(self, handler, event, data):
+        if not self.update_ids.add(event.update_id):
+            self._drop()
+            logger.debug("Dropped duplicate update %s", event.update_id)
+            return None
+        callback = event.callback_query
+        if callback is not None:
+            if not self.callback_ids.add(callback.id):
+                self._drop()
+                logger.debug("Dropped re-delivered callback %s from %s", callback.id, callback.from_user.id)
+                try:
+                    # Stop the button spinner, nothing else happens
+                    await callback.answer()
+                except TelegramAPIError:
+                    pass
+                return None
+        return await handler(event, data)
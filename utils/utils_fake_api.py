@@ -0,0 +1,285 @@
+"""Local stand-in for the Telegram Bot API, for load and latency testing.
+
+Implements the methods the builder and generated bots use: getMe,
+getUpdates, sendMessage, answerCallbackQuery, setWebhook/deleteWebhook and
+message edits. Updates are injected from Python (or at a fixed rate from
+the command line); latency and 429 flood errors can be simulated.
+
+    python -m utils.utils_fake_api --port 8081 --latency 0.05 --flood-rate 0.01
+    TELEGRAM_API_URL=http://127.0.0.1:8081 python target_bot_code.py
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import time
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+SEND_METHODS = {"sendMessage", "editMessageText", "editMessageReplyMarkup"}
+
+
+class FakeBotState:
+    def __init__(self, token):
+        self.token = token
+        self.bot_id = int(token.split(":")[0])
+        self.updates = []
+        self.new_update = asyncio.Event()
+        self.message_ids = itertools.count(1)
+        self.sent = []
+        self.webhook_url = ""
+        self.chat_waiters = {}
+
+    def bot_user(self):
+        return {"id": self.bot_id, "is_bot": True, "first_name": f"Bot {self.bot_id}", "username": f"bot{self.bot_id}"}
+
+
+class FakeTelegramServer:
+    def __init__(self, latency=0.0, jitter=0.0, flood_rate=0.0, retry_after=1, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.bots = {}
+        self.update_ids = itertools.count(1)
+        self.requests = 0
+        self.floods = 0
+        # Called with (token, message) for every message a bot sends
+        self.listeners = []
+        self._runner = None
+        self.url = None
+
+    def bot(self, token):
+        state = self.bots.get(token)
+        if state is None:
+            state = self.bots[token] = FakeBotState(token)
+        return state
+
+    # --- update injection -------------------------------------------------
+
+    def inject_update(self, token, update):
+        state = self.bot(token)
+        update = {"update_id": next(self.update_ids), **update}
+        state.updates.append(update)
+        state.new_update.set()
+        return update
+
+    def inject_message(self, token, chat_id, text, first_name="User"):
+        user = {"id": chat_id, "is_bot": False, "first_name": first_name, "username": f"user{chat_id}"}
+        message = {
+            "message_id": next(self.bot(token).message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": user,
+            "text": text,
+        }
+        if text.startswith("/"):
+            command = text.split()[0]
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+        return self.inject_update(token, {"message": message})
+
+    def inject_callback(self, token, chat_id, data, message_id=None):
+        state = self.bot(token)
+        user = {"id": chat_id, "is_bot": False, "first_name": "User", "username": f"user{chat_id}"}
+        message = {
+            "message_id": message_id or next(state.message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": state.bot_user(),
+            "text": "menu",
+        }
+        callback = {
+            "id": str(next(self.update_ids)),
+            "from": user,
+            "chat_instance": str(chat_id),
+            "message": message,
+            "data": data,
+        }
+        return self.inject_update(token, {"callback_query": callback})
+
+    async def inject_at_rate(self, token, make_update, rate, count):
+        """Inject ``count`` updates built by ``make_update(i)`` at ``rate`` per second."""
+        interval = 1 / rate
+        started = time.monotonic()
+        for i in range(count):
+            delay = started + i * interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.inject_update(token, make_update(i))
+
+    async def wait_for_message(self, token, chat_id, timeout=10):
+        """Wait for the next message the bot sends to ``chat_id``."""
+        future = asyncio.get_running_loop().create_future()
+        self.bot(token).chat_waiters.setdefault(chat_id, []).append(future)
+        return await asyncio.wait_for(future, timeout)
+
+    # --- API methods ------------------------------------------------------
+
+    def get_me(self, state, params):
+        return state.bot_user()
+
+    async def get_updates(self, state, params):
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        if offset:
+            state.updates = [u for u in state.updates if u["update_id"] >= offset]
+        if not state.updates and timeout:
+            state.new_update.clear()
+            try:
+                await asyncio.wait_for(state.new_update.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return state.updates[:limit]
+
+    def send_message(self, state, params):
+        chat_id = int(params["chat_id"])
+        message = {
+            "message_id": next(state.message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": state.bot_user(),
+            "text": params.get("text", ""),
+        }
+        for key in ("entities", "reply_markup"):
+            if params.get(key):
+                value = params[key]
+                message[key] = json.loads(value) if isinstance(value, str) else value
+        state.sent.append(message)
+        for listener in self.listeners:
+            listener(state.token, message)
+        for future in state.chat_waiters.pop(chat_id, []):
+            if not future.done():
+                future.set_result(message)
+        return message
+
+    def edit_message(self, state, params):
+        message = self.send_message(state, params)
+        message["message_id"] = int(params.get("message_id") or message["message_id"])
+        return message
+
+    def set_webhook(self, state, params):
+        state.webhook_url = params.get("url", "")
+        return True
+
+    def delete_webhook(self, state, params):
+        state.webhook_url = ""
+        return True
+
+    def answer_callback_query(self, state, params):
+        return True
+
+    # --- HTTP plumbing ----------------------------------------------------
+
+    async def handle(self, request):
+        self.requests += 1
+        token = request.match_info["token"]
+        method = request.match_info["method"]
+        params = dict(request.query)
+        if request.body_exists:
+            if request.content_type == "application/json":
+                params.update(await request.json())
+            else:
+                params.update(await request.post())
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + self.random.uniform(0, self.jitter))
+
+        handlers = {
+            "getme": self.get_me,
+            "getupdates": self.get_updates,
+            "sendmessage": self.send_message,
+            "editmessagetext": self.edit_message,
+            "editmessagereplymarkup": self.edit_message,
+            "answercallbackquery": self.answer_callback_query,
+            "setwebhook": self.set_webhook,
+            "deletewebhook": self.delete_webhook,
+        }
+        handler = handlers.get(method.lower())
+        if handler is None:
+            return web.json_response({"ok": False, "error_code": 404, "description": "Not Found: method not found"}, status=404)
+        if method in SEND_METHODS and self.flood_rate and self.random.random() < self.flood_rate:
+            self.floods += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }, status=429)
+        result = handler(self.bot(token), params)
+        if asyncio.iscoroutine(result):
+            result = await result
+        return web.json_response({"ok": True, "result": result})
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self.handle)
+        return app
+
+    async def start(self, host="127.0.0.1", port=8081):
+        self._runner = web.AppRunner(self.make_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = self._runner.addresses[0][1]
+        self.url = f"http://{host}:{bound_port}"
+        logger.info("Fake Telegram API listening on %s", self.url)
+        return self.url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def serve(args):
+    server = FakeTelegramServer(latency=args.latency, jitter=args.jitter, flood_rate=args.flood_rate,
+                                retry_after=args.retry_after)
+    await server.start(args.host, args.port)
+    print(f"Fake Telegram API: {server.url}")
+    try:
+        if args.token and args.rate:
+            await server.inject_at_rate(
+                args.token,
+                lambda i: {"message": {
+                    "message_id": i + 1,
+                    "date": int(time.time()),
+                    "chat": {"id": 1000 + i % args.chats, "type": "private"},
+                    "from": {"id": 1000 + i % args.chats, "is_bot": False, "first_name": "User"},
+                    "text": args.text,
+                }},
+                args.rate, args.count,
+            )
+        while True:
+            await asyncio.sleep(3600)
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальный фейковый Telegram Bot API для нагрузочного тестирования")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка ответа, секунды")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Случайная добавка к задержке, секунды")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="Доля отправок, получающих 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="retry_after для ответов 429")
+    parser.add_argument("--token", help="Токен бота, которому слать сгенерированные апдейты")
+    parser.add_argument("--rate", type=float, default=0.0, help="Апдейтов в секунду")
+    parser.add_argument("--count", type=int, default=1000, help="Сколько апдейтов отправить")
+    parser.add_argument("--chats", type=int, default=100, help="Число разных чатов")
+    parser.add_argument("--text", default="/start", help="Текст сообщений")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
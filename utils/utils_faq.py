@@ -0,0 +1,113 @@
+"""Free-text matching of user questions against a bot's FAQ.
+
+``FaqIndex`` is built once when a generated FAQ bot loads. Words of every
+question and answer go into an inverted index weighted by inverse document
+frequency, question words counting more than answer words. Query words
+that match no indexed word exactly (typos, other word forms) fall back to
+a trigram index. ``match`` returns the best entry and a confidence in
+[0, 1]: the share of the query's weight that entry covers.
+"""
+import math
+import re
+
+DEFAULT_THRESHOLD = 0.4
+QUESTION_WEIGHT = 1.0
+ANSWER_WEIGHT = 0.5
+# A fuzzy word match counts for less than an exact one, and only when
+# enough of the word's trigrams are found
+FUZZY_WEIGHT = 0.8
+FUZZY_MIN_SIMILARITY = 0.5
+# Words and trigrams present in more than this share of entries are
+# common: common trigrams are not looked up, common words only add to
+# entries that already matched a rarer word
+COMMON_SHARE = 0.2
+MIN_COMMON_ENTRIES = 20
+
+STOP_WORDS = frozenset(
+    "а в во вы ваш ваша ваше ваши вас вам где да для до же за и из или как какой какая какие к ко когда кто ли "
+    "мне мой можно мы на не нет но о об от по при про с со так то ты у что чтобы это я".split()
+)
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def words(text):
+    """Lowercased words of ``text`` without stop words; ``ё`` is folded into ``е``."""
+    return [word for word in WORD_PATTERN.findall(text.lower().replace("ё", "е")) if word not in STOP_WORDS]
+
+
+def trigrams(word):
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FaqIndex:
+    def __init__(self, entries):
+        """``entries`` is a sequence of ``(question, answer)`` strings."""
+        self.size = len(entries)
+        word_weights = {}
+        trigram_weights = {}
+        for entry_id, (question, answer) in enumerate(entries):
+            weights = dict.fromkeys(words(answer or ""), ANSWER_WEIGHT)
+            weights.update(dict.fromkeys(words(question or ""), QUESTION_WEIGHT))
+            for word, weight in weights.items():
+                word_weights.setdefault(word, {})[entry_id] = weight
+                for gram in trigrams(word):
+                    postings = trigram_weights.setdefault(gram, {})
+                    if postings.get(entry_id, 0) < weight:
+                        postings[entry_id] = weight
+
+        # Unknown words weigh as much as the rarest known ones
+        self.max_idf = math.log(1 + self.size) if self.size else 1.0
+        self.common = max(MIN_COMMON_ENTRIES, self.size * COMMON_SHARE)
+        self.words = {word: (math.log(1 + self.size / len(postings)), postings)
+                      for word, postings in word_weights.items()}
+        self.trigrams = {gram: tuple(postings.items()) for gram, postings in trigram_weights.items()
+                         if len(postings) <= self.common}
+
+    def _fuzzy(self, word, idf, scores):
+        grams = trigrams(word)
+        found = {}
+        for gram in grams:
+            for entry_id, weight in self.trigrams.get(gram, ()):
+                count, best = found.get(entry_id, (0, 0.0))
+                found[entry_id] = (count + 1, max(best, weight))
+        for entry_id, (count, weight) in found.items():
+            similarity = count / len(grams)
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                scores[entry_id] = scores.get(entry_id, 0.0) + idf * similarity * weight * FUZZY_WEIGHT
+
+    def match(self, query):
+        """Best ``(entry_id, confidence)`` for ``query``, or ``(None, 0.0)``."""
+        scores = {}
+        total = 0.0
+        known = []
+        for word in set(words(query)):
+            indexed = self.words.get(word)
+            if indexed is not None:
+                known.append(indexed)
+                continue
+            total += self.max_idf
+            if len(word) > 2:
+                self._fuzzy(word, self.max_idf, scores)
+        # Rarest words first, so common ones can be limited to rescoring
+        known.sort(key=lambda indexed: -indexed[0])
+        for idf, postings in known:
+            total += idf
+            if scores and len(postings) > self.common:
+                for entry_id in scores:
+                    weight = postings.get(entry_id)
+                    if weight:
+                        scores[entry_id] += idf * weight
+                continue
+            for entry_id, weight in postings.items():
+                scores[entry_id] = scores.get(entry_id, 0.0) + idf * weight
+        if not scores:
+            return None, 0.0
+        # Lowest id wins a tie, so answers are stable across restarts
+        entry_id = min(scores, key=lambda i: (-scores[i], i))
+        return entry_id, min(scores[entry_id] / total, 1.0)
+
+    def answer(self, query, threshold=DEFAULT_THRESHOLD):
+        """Entry id to answer ``query`` with, or None when the match is not confident enough."""
+        entry_id, confidence = self.match(query)
+        return entry_id if confidence >= threshold else None
@@ -0,0 +1,215 @@
+"""Resource usage of the generated bot processes.
+
+``FleetSampler`` walks every bot with a ``pid`` in ``bot_configs`` once per
+``FLEET_SAMPLE_INTERVAL`` seconds and reads CPU%, RSS, open fds and thread
+count under one ``psutil`` oneshot per process. Samples are folded into
+one-minute rows in ``bot_stats``; rows older than a day are compacted to
+hourly ones and hourly rows are kept for ``FLEET_RETENTION_DAYS``.
+"""
+import asyncio
+import logging
+import os
+import statistics
+import time
+
+import psutil
+
+from utils.utils_db import connect_db
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_INTERVAL = float(os.getenv("FLEET_SAMPLE_INTERVAL", 15))
+MINUTE = 60
+HOUR = 3600
+HOURLY_AFTER = 24 * HOUR
+RETENTION = int(os.getenv("FLEET_RETENTION_DAYS", 30)) * 24 * HOUR
+CPU_ALERT_PERCENT = float(os.getenv("FLEET_CPU_ALERT", 80))
+# A bot is an RSS outlier when it uses this many times the fleet median
+RSS_OUTLIER_FACTOR = 3
+RSS_OUTLIER_MIN = 50 * 1024 * 1024
+
+
+def _read(process):
+    with process.oneshot():
+        return {
+            "pid": process.pid,
+            "cpu": process.cpu_percent(None),
+            "rss": process.memory_info().rss,
+            "fds": process.num_fds() if hasattr(process, "num_fds") else process.num_handles(),
+            "threads": process.num_threads(),
+        }
+
+
+def find_outliers(samples):
+    """Config ids whose CPU is above the alert level or whose RSS is far above the fleet median."""
+    if not samples:
+        return {}
+    median_rss = statistics.median(sample["rss"] for sample in samples.values())
+    rss_limit = max(median_rss * RSS_OUTLIER_FACTOR, RSS_OUTLIER_MIN)
+    outliers = {}
+    for config_id, sample in samples.items():
+        reasons = []
+        if sample["cpu"] >= CPU_ALERT_PERCENT:
+            reasons.append("cpu")
+        if sample["rss"] > rss_limit:
+            reasons.append("rss")
+        if reasons:
+            outliers[config_id] = reasons
+    return outliers
+
+
+class FleetSampler:
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        # config_id -> psutil.Process, kept between passes so cpu_percent() measures the interval
+        self.processes = {}
+        self.latest = {}
+        self.missing = set()
+        self.outliers = {}
+        # config_id -> [minute, samples, cpu_sum, cpu_max, rss_max, fds_max, threads_max]
+        self.pending = {}
+        self.compacted_at = 0
+
+    def running_bots(self):
+        conn = connect_db()
+        c = conn.cursor()
+        c.execute('SELECT config_id, pid FROM bot_configs WHERE pid IS NOT NULL')
+        bots = c.fetchall()
+        conn.close()
+        return bots
+
+    def _process(self, config_id, pid):
+        process = self.processes.get(config_id)
+        if process is not None and process.pid == pid:
+            return process, False
+        process = psutil.Process(pid)
+        # The pid may have been reused since the bot died
+        if not any(f"bot_{config_id}.py" in arg for arg in process.cmdline()):
+            raise psutil.NoSuchProcess(pid)
+        process.cpu_percent(None)
+        self.processes[config_id] = process
+        return process, True
+
+    def sample(self, now=None):
+        """Take one pass over the fleet and return ``{config_id: sample}``."""
+        now = time.time() if now is None else now
+        samples, missing = {}, set()
+        bots = self.running_bots()
+        for config_id, pid in bots:
+            try:
+                process, fresh = self._process(config_id, pid)
+                sample = _read(process)
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                self.processes.pop(config_id, None)
+                missing.add(config_id)
+                continue
+            except psutil.AccessDenied:
+                continue
+            if fresh:
+                # The first cpu_percent() call has nothing to compare against
+                continue
+            samples[config_id] = sample
+        for config_id in set(self.processes) - {config_id for config_id, _ in bots}:
+            del self.processes[config_id]
+
+        for config_id in missing - self.missing:
+            logger.warning("Bot %s is registered as running but its process is gone", config_id)
+        outliers = find_outliers(samples)
+        for config_id, reasons in outliers.items():
+            if config_id not in self.outliers:
+                logger.warning("Bot %s is an outlier (%s): %s", config_id, ", ".join(reasons), samples[config_id])
+        self.latest, self.missing, self.outliers = samples, missing, outliers
+
+        self._accumulate(samples, now)
+        if now - self.compacted_at >= HOUR:
+            self.compact(now)
+            self.compacted_at = now
+        return samples
+
+    def _accumulate(self, samples, now):
+        minute = int(now) - int(now) % MINUTE
+        finished = []
+        for config_id, sample in samples.items():
+            row = self.pending.get(config_id)
+            if row is not None and row[0] != minute:
+                finished.append((config_id, row))
+                row = None
+            if row is None:
+                row = self.pending[config_id] = [minute, 0, 0.0, 0.0, 0, 0, 0]
+            row[1] += 1
+            row[2] += sample["cpu"]
+            row[3] = max(row[3], sample["cpu"])
+            row[4] = max(row[4], sample["rss"])
+            row[5] = max(row[5], sample["fds"])
+            row[6] = max(row[6], sample["threads"])
+        for config_id in set(self.pending) - set(samples):
+            finished.append((config_id, self.pending.pop(config_id)))
+        if finished:
+            self.flush(finished)
+
+    def flush(self, rows=None):
+        """Write finished one-minute rows (all pending ones by default)."""
+        if rows is None:
+            rows, self.pending = list(self.pending.items()), {}
+        conn = connect_db()
+        conn.executemany(
+            'INSERT OR REPLACE INTO bot_stats '
+            '(config_id, bucket, resolution, samples, cpu_avg, cpu_max, rss_max, fds_max, threads_max) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [(config_id, minute, MINUTE, count, cpu_sum / count, cpu_max, rss, fds, threads)
+             for config_id, (minute, count, cpu_sum, cpu_max, rss, fds, threads) in rows]
+        )
+        conn.commit()
+        conn.close()
+
+    def compact(self, now):
+        """Fold minute rows older than a day into hourly rows and drop expired ones."""
+        cutoff = int(now - HOURLY_AFTER) // HOUR * HOUR
+        conn = connect_db()
+        c = conn.cursor()
+        c.execute(
+            'INSERT OR REPLACE INTO bot_stats '
+            '(config_id, bucket, resolution, samples, cpu_avg, cpu_max, rss_max, fds_max, threads_max) '
+            'SELECT config_id, bucket - bucket % ?, ?, SUM(samples), SUM(cpu_avg * samples) / SUM(samples), '
+            'MAX(cpu_max), MAX(rss_max), MAX(fds_max), MAX(threads_max) '
+            'FROM bot_stats WHERE resolution = ? AND bucket < ? GROUP BY config_id, bucket - bucket % ?',
+            (HOUR, HOUR, MINUTE, cutoff, HOUR)
+        )
+        c.execute('DELETE FROM bot_stats WHERE resolution = ? AND bucket < ?', (MINUTE, cutoff))
+        c.execute('DELETE FROM bot_stats WHERE bucket < ?', (int(now - RETENTION),))
+        conn.commit()
+        conn.close()
+
+    def totals(self):
+        samples = list(self.latest.values())
+        return {
+            "bots": len(samples),
+            "missing": len(self.missing),
+            "outliers": len(self.outliers),
+            "cpu": sum(sample["cpu"] for sample in samples),
+            "rss": sum(sample["rss"] for sample in samples),
+            "fds": sum(sample["fds"] for sample in samples),
+            "threads": sum(sample["threads"] for sample in samples),
+        }
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.sample)
+            except Exception as e:
+                logger.error("Fleet sampling failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+
+def bot_history(config_id, since, resolution=MINUTE):
+    """Stored rows of one bot as ``(bucket, samples, cpu_avg, cpu_max, rss_max, fds_max, threads_max)``."""
+    conn = connect_db()
+    c = conn.cursor()
+    c.execute(
+        'SELECT bucket, samples, cpu_avg, cpu_max, rss_max, fds_max, threads_max FROM bot_stats '
+        'WHERE config_id = ? AND resolution = ? AND bucket >= ? ORDER BY bucket',
+        (config_id, resolution, since)
+    )
+    rows = c.fetchall()
+    conn.close()
+    return rows
@@ -0,0 +1,99 @@
+"""Live poll results for generated poll bots.
+
+With ``"live_results": N`` in the config, a vote edits the poll message in
+place to show the current tallies instead of sending a new message. Edits
+go through ``EditCoalescer``: each message is edited at most once every N
+seconds, and votes arriving in between only replace the pending edit, which
+reads the tallies when it finally runs.
+"""
+import asyncio
+import logging
+import time
+
+from utils.utils_polls import poll_tallies
+
+logger = logging.getLogger(__name__)
+
+BAR_WIDTH = 10
+# Telegram's limit for callback answer text
+ANSWER_MAX_LENGTH = 200
+# Past this many remembered edit times, those older than the interval are dropped
+MAX_TRACKED = 10_000
+
+
+def results_text(question, options, tallies):
+    total = sum(tallies.get(option, 0) for option in options)
+    lines = [question, ""]
+    for option in options:
+        votes = tallies.get(option, 0)
+        share = votes / total if total else 0
+        filled = round(share * BAR_WIDTH)
+        lines.append(f"{option} — {votes} ({share:.0%})")
+        lines.append("▓" * filled + "░" * (BAR_WIDTH - filled))
+    lines += ["", f"Всего голосов: {total}"]
+    return "\n".join(lines)
+
+
+class EditCoalescer:
+    def __init__(self, interval):
+        self.interval = interval
+        self.pending = {}
+        self.tasks = {}
+        self.last_edit = {}
+
+    def schedule(self, key, edit):
+        """Run ``edit()`` for ``key`` now or once its interval is over; a later call replaces it."""
+        self.pending[key] = edit
+        if key in self.tasks:
+            return
+        now = time.monotonic()
+        if len(self.last_edit) > MAX_TRACKED:
+            self.last_edit = {k: t for k, t in self.last_edit.items() if now - t < self.interval}
+        delay = max(0.0, self.last_edit.get(key, now - self.interval) + self.interval - now)
+        self.tasks[key] = asyncio.create_task(self._flush(key, delay))
+
+    async def _flush(self, key, delay):
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+            edit = self.pending.pop(key)
+            self.last_edit[key] = time.monotonic()
+            try:
+                await edit()
+            except Exception as e:
+                # "message is not modified" and the like; the next vote retries
+                logger.debug("Live results edit failed for %s: %s", key, e)
+        finally:
+            del self.tasks[key]
+        # A vote that came in while the edit was running gets its own turn
+        if key in self.pending:
+            self.schedule(key, self.pending[key])
+
+    async def close(self):
+        """Wait for the edits already scheduled."""
+        while self.tasks:
+            await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+
+
+class LiveResults:
+    def __init__(self, polls, interval, db_path=None):
+        """``polls`` maps poll_id to ``(question, options)``."""
+        self.polls = polls
+        self.db_path = db_path
+        self.coalescer = EditCoalescer(interval)
+
+    async def vote(self, callback, poll_id, option):
+        """Acknowledge a stored vote with a toast and refresh the results."""
+        await callback.answer(f"Спасибо! Вы выбрали: {option}"[:ANSWER_MAX_LENGTH])
+        self.show(callback.message, poll_id)
+
+    def show(self, message, poll_id):
+        """Schedule an edit of ``message``, the one holding the poll's options, to its results."""
+        question, options = self.polls[poll_id]
+
+        async def edit():
+            tallies = await asyncio.to_thread(poll_tallies, poll_id, self.db_path)
+            await message.edit_text(results_text(question, options, tallies),
+                                    reply_markup=message.reply_markup, parse_mode=None)
+
+        self.coalescer.schedule((message.chat.id, message.message_id), edit)
@@ -0,0 +1,249 @@
+"""Synthetic-user load test for the builder bot.
+
+Each virtual user registers, runs /create_bot, picks a template and walks
+the BotCreationForm and the FAQ/poll forms up to finalize_*. All traffic
+goes through the real dispatcher against the fake Bot API; the latency of
+each step is measured from injecting the user's update to receiving the
+builder's last reply for that step.
+
+    python -m utils.utils_loadtest --users 1000 --concurrency 200 --output loadtest.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from collections import defaultdict
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.enums import ParseMode
+
+from utils import utils_db
+from utils.utils_fake_api import FakeTelegramServer
+from utils.utils_ratelimit import RateLimitMiddleware
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUILDER_TOKEN = "999999:LOADTEST"
+TEMPLATES = ("business_card", "faq", "poll")
+
+# (step name, kind, payload, replies the builder sends for it)
+REGISTRATION_STEPS = [
+    ("register_start", "msg", "/start", 1),
+    ("register_name", "msg", "Load User", 1),
+    ("register_confirm", "msg", "да", 1),
+]
+TEMPLATE_STEPS = {
+    "business_card": [
+        ("welcome_text", "msg", "Welcome to my bot", 1),
+        ("phone", "msg", "+1234567890", 1),
+        ("email", "msg", "user@example.com", 1),
+        ("website", "msg", "https://example.com", 1),
+        ("finalize_business_card", "msg", "Use start to see my card", 1),
+    ],
+    "faq": [
+        ("faq_count", "msg", "2", 1),
+        ("faq_question", "msg", "What do you do", 1),
+        ("faq_answer", "msg", "We build bots", 1),
+        ("faq_question", "msg", "How to contact", 1),
+        ("finalize_faq", "msg", "Write an email", 1),
+    ],
+    "poll": [
+        ("poll_count", "msg", "1", 1),
+        ("poll_question", "msg", "Best colour", 1),
+        ("poll_options_count", "msg", "2", 1),
+        ("poll_option", "msg", "Red", 1),
+        ("poll_option", "msg", "Blue", 1),
+        ("finalize_poll", "msg", "да", 1),
+    ],
+}
+
+
+def user_script(index):
+    template = TEMPLATES[index % len(TEMPLATES)]
+    return REGISTRATION_STEPS + [
+        ("create_bot", "msg", "/create_bot", 1),
+        ("template", "cb", f"template_{template}", 1),
+        ("bot_name", "msg", f"Load bot {index}", 1),
+        ("bot_token", "msg", f"{100000 + index}:LOAD{index}", 2),
+    ] + TEMPLATE_STEPS[template]
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+class LoadTest:
+    def __init__(self, server, step_timeout=30):
+        self.server = server
+        self.step_timeout = step_timeout
+        self.inboxes = defaultdict(asyncio.Queue)
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.flows_completed = 0
+        self.flows_failed = 0
+        server.listeners.append(self.on_message)
+
+    def on_message(self, token, message):
+        if token == BUILDER_TOKEN:
+            self.inboxes[message["chat"]["id"]].put_nowait(message)
+
+    async def run_step(self, chat_id, name, kind, payload, replies):
+        inbox = self.inboxes[chat_id]
+        started = time.perf_counter()
+        if kind == "msg":
+            self.server.inject_message(BUILDER_TOKEN, chat_id, payload)
+        else:
+            self.server.inject_callback(BUILDER_TOKEN, chat_id, payload)
+        failed = False
+        for _ in range(replies):
+            message = await asyncio.wait_for(inbox.get(), self.step_timeout)
+            failed = failed or "Ошибка" in message["text"].split("\n", 1)[0]
+        self.latencies[name].append(time.perf_counter() - started)
+        if failed:
+            self.errors[name] += 1
+        return not failed
+
+    async def run_user(self, index, semaphore):
+        chat_id = 1_000_000 + index
+        async with semaphore:
+            for name, kind, payload, replies in user_script(index):
+                try:
+                    if not await self.run_step(chat_id, name, kind, payload, replies):
+                        self.flows_failed += 1
+                        return
+                except asyncio.TimeoutError:
+                    self.errors[name] += 1
+                    self.flows_failed += 1
+                    return
+            self.flows_completed += 1
+
+    def report(self, duration, params):
+        steps = {}
+        for name, values in self.latencies.items():
+            steps[name] = {
+                "count": len(values),
+                "errors": self.errors.get(name, 0),
+                "error_rate": self.errors.get(name, 0) / len(values),
+                "p50_ms": percentile(values, 0.50) * 1000,
+                "p95_ms": percentile(values, 0.95) * 1000,
+                "p99_ms": percentile(values, 0.99) * 1000,
+                "throughput_per_s": len(values) / duration,
+            }
+        total_steps = sum(len(values) for values in self.latencies.values())
+        return {
+            "version": project_version(),
+            "timestamp": int(time.time()),
+            "python": platform.python_version(),
+            "params": params,
+            "duration_s": duration,
+            "flows_completed": self.flows_completed,
+            "flows_failed": self.flows_failed,
+            "flows_per_s": self.flows_completed / duration,
+            "steps_per_s": total_steps / duration,
+            "error_rate": (sum(self.errors.values()) / total_steps) if total_steps else 0.0,
+            "steps": steps,
+        }
+
+
+def project_version():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=5
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return commit or "unknown"
+
+
+async def run(users, concurrency, latency=0.0, flood_rate=0.0, rate_limit=False, spawn=False):
+    import target_bot_code
+    from generate import generate
+    from utils import utils_telegram
+    from utils.utils_config import canonical
+
+    server = FakeTelegramServer(latency=latency, flood_rate=flood_rate)
+    await server.start(port=0)
+    utils_telegram.TELEGRAM_API_URL = server.url
+    if spawn:
+        # Spawned bots live in <workdir>/bots/, whose parent has no utils package
+        os.environ["PYTHONPATH"] = PROJECT_ROOT
+    else:
+        async def generate_only(config, bot_token, config_id):
+            config = canonical(config)
+            output_file = f"bots/bot_{config_id}.py"
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
+            generate(config.config, output_file, config_id, config.digest)
+        target_bot_code.generate_and_run_bot = generate_only
+
+    target_bot_code.init_db()
+    session = AiohttpSession(api=TelegramAPIServer.from_base(server.url))
+    bot = Bot(BUILDER_TOKEN, session=session, default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN_V2))
+    if rate_limit:
+        bot.session.middleware(RateLimitMiddleware())
+    test = LoadTest(server)
+    polling = asyncio.create_task(
+        target_bot_code.dp.start_polling(bot, handle_signals=False, close_bot_session=True, polling_timeout=1)
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(test.run_user(i, semaphore) for i in range(users)))
+    finally:
+        duration = time.perf_counter() - started
+        await target_bot_code.dp.stop_polling()
+        await polling
+        await utils_telegram.close_session()
+        await server.stop()
+    params = {"users": users, "concurrency": concurrency, "latency": latency,
+              "flood_rate": flood_rate, "rate_limit": rate_limit, "spawn": spawn}
+    return test.report(duration, params)
+
+
+def print_report(report):
+    print(f"Версия: {report['version']}, длительность: {report['duration_s']:.2f} с")
+    print(f"Сценариев: {report['flows_completed']} успешно, {report['flows_failed']} с ошибками "
+          f"({report['flows_per_s']:.1f}/с, шагов {report['steps_per_s']:.1f}/с)")
+    print(f"{'шаг':<24}{'n':>7}{'ошибки':>8}{'p50 мс':>10}{'p95 мс':>10}{'p99 мс':>10}")
+    for name, step in report["steps"].items():
+        print(f"{name:<24}{step['count']:>7}{step['errors']:>8}"
+              f"{step['p50_ms']:>10.1f}{step['p95_ms']:>10.1f}{step['p99_ms']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест мастера создания ботов")
+    parser.add_argument("--users", type=int, default=100, help="Число виртуальных пользователей")
+    parser.add_argument("--concurrency", type=int, default=50, help="Одновременно активных пользователей")
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка фейкового API, секунды")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="Доля отправок, получающих 429")
+    parser.add_argument("--rate-limit", action="store_true", help="Включить ограничитель исходящих сообщений")
+    parser.add_argument("--spawn", action="store_true", help="Запускать процессы созданных ботов")
+    parser.add_argument("--output", default="loadtest.json", help="Файл для результатов в JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    workdir = tempfile.mkdtemp(prefix="egtgbt-load-")
+    os.chdir(workdir)
+    # The builder and the bots it spawns share the throwaway database
+    os.environ["BOT_DB_PATH"] = utils_db.DB_PATH = os.path.join(workdir, "bot_users.db")
+    report = asyncio.run(run(args.users, args.concurrency, args.latency, args.flood_rate, args.rate_limit, args.spawn))
+    output = os.path.join(PROJECT_ROOT, args.output) if not os.path.isabs(args.output) else args.output
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print_report(report)
+    print(f"Результаты записаны в {output} (рабочий каталог {workdir})")
+
+
+if __name__ == "__main__":
+    main()
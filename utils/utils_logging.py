@@ -0,0 +1,230 @@
+"""Logging for the builder, the cli and generated bots.
+
+Records go through a QueueHandler to a QueueListener thread that formats
+them as JSON lines and writes them to the sink (stderr or a per-bot file),
+so handlers never wait on I/O or formatting. Levels come from the
+environment:
+
+    LOG_LEVEL=DEBUG          explicit level, wins over APP_ENV
+    APP_ENV=development      DEBUG; anything else (production) is INFO
+    LOG_DEBUG_SAMPLE=0.1     share of DEBUG records kept (default 1 in
+                             development, 0.1 otherwise)
+    LOG_MAX_BYTES=5000000    size at which a bot's log file is rotated
+    LOG_BACKUP_COUNT=3       rotated files kept next to it
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from collections import deque
+
+ENV_LEVELS = {"development": logging.DEBUG, "test": logging.DEBUG}
+DEFAULT_LEVEL = logging.INFO
+DEFAULT_DEBUG_SAMPLE = {"development": 1.0, "test": 1.0}
+DEFAULT_PRODUCTION_DEBUG_SAMPLE = 0.1
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 5_000_000))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 3))
+TAIL_BLOCK_SIZE = 8192
+# Appends larger than this are skipped by re-reading the tail instead
+TAIL_MAX_APPEND = 1_000_000
+# Fields every LogRecord has; anything else came in through ``extra=``
+RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener = None
+
+
+def app_env():
+    return os.getenv("APP_ENV", "production").lower()
+
+
+def bot_log_file(config_id, bots_dir="bots"):
+    return os.path.join(bots_dir, "logs", f"bot_{config_id}.log")
+
+
+def env_level():
+    level = os.getenv("LOG_LEVEL")
+    if level:
+        return logging.getLevelName(level.upper()) if not level.isdigit() else int(level)
+    return ENV_LEVELS.get(app_env(), DEFAULT_LEVEL)
+
+
+def env_debug_sample():
+    value = os.getenv("LOG_DEBUG_SAMPLE")
+    if value:
+        return float(value)
+    return DEFAULT_DEBUG_SAMPLE.get(app_env(), DEFAULT_PRODUCTION_DEBUG_SAMPLE)
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, static_fields=None):
+        super().__init__()
+        self.static_fields = static_fields or {}
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **self.static_fields,
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps every record above DEBUG and 1 in ``1 / rate`` DEBUG records.
+
+    Sampling is counted per message template, so one chatty call site does
+    not crowd out rare DEBUG events.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self.counts = {}
+        self.dropped = 0
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.every == 1:
+            return True
+        if not self.every:
+            self.dropped += 1
+            return False
+        key = (record.name, record.msg)
+        count = self.counts.get(key, 0)
+        self.counts[key] = count + 1
+        if count % self.every:
+            self.dropped += 1
+            return False
+        return True
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    # The stock prepare() formats the message in the calling thread; the
+    # queue never leaves the process, so the record goes as is and the
+    # listener thread does all the formatting
+    def prepare(self, record):
+        return record
+
+
+def setup_logging(log_file=None, level=None, debug_sample=None, **static_fields):
+    """Route all logging through a background listener writing JSON lines.
+
+    ``log_file`` selects a file sink (each generated bot passes its own);
+    by default records go to stderr. ``static_fields`` (e.g. ``bot_id``)
+    are added to every line. Calling it again replaces the previous setup.
+    """
+    global _listener
+    stop_logging()
+    level = env_level() if level is None else level
+    debug_sample = env_debug_sample() if debug_sample is None else debug_sample
+
+    if log_file:
+        os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+        sink = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+    else:
+        sink = logging.StreamHandler(sys.stderr)
+    sink.setFormatter(JsonFormatter(static_fields))
+
+    log_queue = queue.SimpleQueue()
+    handler = LazyQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(debug_sample))
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    # The supervisor waits for aiogram's "Run polling" INFO line, so it is logged at any level
+    logging.getLogger("aiogram.dispatcher").setLevel(min(root.level, logging.INFO))
+
+    _listener = logging.handlers.QueueListener(log_queue, sink)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def tail_lines(path, count, block_size=TAIL_BLOCK_SIZE):
+    """Return the last ``count`` lines of ``path``, reading backwards from the end."""
+    with open(path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        position, data = end, b""
+        while position > 0 and data.count(b"\n") <= count:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    lines = data.splitlines()
+    if position > 0:
+        # The first line is probably cut in the middle
+        lines = lines[1:]
+    return [line.decode("utf-8", "replace") for line in lines[-count:]] if count else []
+
+
+class LogTail:
+    """Ring buffer of the last lines of a log file.
+
+    The first read seeks back from the end of the file. Later reads only
+    pick up bytes appended since, and re-read the tail after rotation.
+    """
+
+    def __init__(self, path, max_lines=200):
+        self.path = path
+        self.lines = deque(maxlen=max_lines)
+        self.offset = None
+        self.inode = None
+        self.partial = b""
+
+    def _reset(self, stat):
+        self.lines.clear()
+        self.lines.extend(tail_lines(self.path, self.lines.maxlen))
+        self.offset, self.inode, self.partial = stat.st_size, stat.st_ino, b""
+
+    def read(self, count):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return []
+        if (self.offset is None or stat.st_ino != self.inode or stat.st_size < self.offset
+                or stat.st_size - self.offset > TAIL_MAX_APPEND):
+            self._reset(stat)
+        elif stat.st_size > self.offset:
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                data = self.partial + f.read(stat.st_size - self.offset)
+                self.offset = f.tell()
+            *complete, self.partial = data.split(b"\n")
+            self.lines.extend(line.decode("utf-8", "replace") for line in complete)
+        return list(self.lines)[-count:] if count else []
+
+
+def format_log_line(line):
+    """Render one JSON log line as ``HH:MM:SS LEVEL message``."""
+    try:
+        entry = json.loads(line)
+        when = time.strftime("%H:%M:%S", time.localtime(entry["ts"]))
+        return f"{when} {entry['level']} {entry['message']}"
+    except (ValueError, KeyError, TypeError):
+        return line
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,246 @@
+"""In-process metrics in the Prometheus text format.
+
+Counters, gauges and histograms live in a registry; ``render()`` produces
+the exposition text served on ``/metrics`` by ``start_metrics_server``.
+The middlewares and ``utils_db.connect_db`` feed handler, Telegram API and
+SQLite timings into the default registry.
+
+    METRICS_PORT=9100 python target_bot_code.py
+    curl http://127.0.0.1:9100/metrics
+"""
+import logging
+import time
+from bisect import bisect_left
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+from utils.utils_db import time_queries
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+
+    def header(self):
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def get(self, *labels):
+        return self.values.get(labels, 0)
+
+    def samples(self):
+        for labels, value in sorted(self.values.items()):
+            yield self.name, _format_labels(self.label_names, labels), value
+
+
+class Gauge(Metric):
+    """A gauge set directly or computed at scrape time by ``callback``.
+
+    The callback returns a number, or ``{label_values_tuple: number}`` for
+    a labelled gauge.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labels=(), callback=None):
+        super().__init__(name, help_text, labels)
+        self.values = {}
+        self.callback = callback
+
+    def set(self, value, *labels):
+        self.values[labels] = value
+
+    def samples(self):
+        values = self.values
+        if self.callback is not None:
+            result = self.callback()
+            values = result if isinstance(result, dict) else {(): result}
+        for labels, value in sorted(values.items()):
+            yield self.name, _format_labels(self.label_names, labels), value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self.values = {}
+
+    def observe(self, value, *labels):
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def count(self, *labels):
+        entry = self.values.get(labels)
+        return entry[2] if entry else 0
+
+    def time(self, *labels):
+        return _Timer(self, labels)
+
+    def samples(self):
+        for labels, (counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                yield (f'{self.name}_bucket',
+                       _format_labels(self.label_names, labels, [('le', _format_value(bound))]), cumulative)
+            yield f'{self.name}_sum', _format_labels(self.label_names, labels), total
+            yield f'{self.name}_count', _format_labels(self.label_names, labels), count
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            return self.metrics[metric.name]
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=(), callback=None):
+        return self.register(Gauge(name, help_text, labels, callback))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                # A broken gauge callback must not take the whole scrape down
+                logger.error("Failed to collect %s: %s", metric.name, e)
+                continue
+            lines += metric.header()
+            lines += [f'{name}{labels} {_format_value(value)}' for name, labels, value in samples]
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HANDLER_LATENCY = REGISTRY.histogram(
+    'builder_handler_duration_seconds', 'Time spent in each update handler', ('handler',))
+HANDLER_ERRORS = REGISTRY.counter(
+    'builder_handler_errors_total', 'Exceptions raised by update handlers', ('handler', 'error'))
+API_LATENCY = REGISTRY.histogram(
+    'telegram_api_request_duration_seconds', 'Outbound Bot API calls by method', ('method',))
+API_ERRORS = REGISTRY.counter(
+    'telegram_api_errors_total', 'Failed outbound Bot API calls by method', ('method', 'error'))
+DB_LATENCY = REGISTRY.histogram(
+    'builder_db_query_duration_seconds', 'SQLite statements by kind and table', ('query',),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0))
+time_queries(DB_LATENCY)
+BOTS_CREATED = REGISTRY.counter('builder_bots_created_total', 'Bots created by template', ('template',))
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner middleware timing each handler call, labelled by function name.
+
+    Install on every observer that should be measured, e.g.
+    ``dp.message.middleware(HandlerMetricsMiddleware())``.
+    """
+
+    async def __call__(self, handler, event, data):
+        handler_object = data.get('handler')
+        name = getattr(getattr(handler_object, 'callback', None), '__name__', 'unknown')
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            HANDLER_ERRORS.inc(name, type(e).__name__)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - started, name)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Request middleware timing Bot API calls; install with ``bot.session.middleware(...)``."""
+
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            API_ERRORS.inc(name, type(e).__name__)
+            raise
+        finally:
+            API_LATENCY.observe(time.perf_counter() - started, name)
+
+
+async def start_metrics_server(port, host='127.0.0.1', registry=REGISTRY):
+    """Serve ``/metrics`` on ``host:port``; returns the runner to clean up."""
+    from aiohttp import web
+
+    async def metrics_handler(request):
+        return web.Response(text=registry.render(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', metrics_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Metrics available on http://%s:%s/metrics", host, runner.addresses[0][1])
+    return runner
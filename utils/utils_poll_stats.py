@@ -0,0 +1,113 @@
+"""Poll analytics over time from hourly and daily rollups.
+
+``refresh_rollups`` folds the responses past the last processed
+``response_id`` into ``poll_rollups``, one row per poll, resolution, time
+bucket and option. A changed vote gets a new response_id (see
+``save_poll_response``), so the rollups count votes cast in each bucket,
+changes included; ``poll_tallies`` keeps the current standing. Queries
+refresh first and then read rollup rows only, so their cost depends on the
+time range asked for, not on the number of responses.
+
+Used by the builder's /poll_stats and by ``cli.py poll_stats``.
+"""
+import time
+
+from utils.utils_db import connect_db
+
+HOUR = 3600
+DAY = 86400
+RESOLUTIONS = (HOUR, DAY)
+BUCKET_FORMATS = {HOUR: "%Y-%m-%d %H:00", DAY: "%Y-%m-%d"}
+
+
+def refresh_rollups(db_path=None):
+    """Add responses newer than the last refresh to the rollups. Returns how many were added."""
+    conn = connect_db(db_path, isolation_level=None)
+    c = conn.cursor()
+    try:
+        # Concurrent refreshes must not count the same responses twice
+        c.execute('BEGIN IMMEDIATE')
+        c.execute('SELECT last_response_id FROM poll_rollup_state WHERE name = ?', ('poll_rollups',))
+        row = c.fetchone()
+        last_id = row[0] if row else 0
+        c.execute('SELECT MAX(response_id), COUNT(*) FROM poll_responses WHERE response_id > ?', (last_id,))
+        max_id, added = c.fetchone()
+        if not added:
+            c.execute('COMMIT')
+            return 0
+        for resolution in RESOLUTIONS:
+            c.execute('''
+                INSERT INTO poll_rollups (poll_id, resolution, bucket, option_text, responses)
+                SELECT poll_id, ?, CAST(strftime('%s', created_at) AS INTEGER) / ? * ?, option_text, COUNT(*)
+                FROM poll_responses WHERE response_id > ? AND response_id <= ?
+                GROUP BY 1, 3, 4
+                ON CONFLICT (poll_id, resolution, bucket, option_text)
+                DO UPDATE SET responses = responses + excluded.responses
+            ''', (resolution, resolution, resolution, last_id, max_id))
+        c.execute('''
+            INSERT INTO poll_rollup_state (name, last_response_id) VALUES (?, ?)
+            ON CONFLICT (name) DO UPDATE SET last_response_id = excluded.last_response_id
+        ''', ('poll_rollups', max_id))
+        c.execute('COMMIT')
+        return added
+    except BaseException:
+        if conn.in_transaction:
+            c.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+
+def _bucket_range(resolution, since, until):
+    until = time.time() if until is None else until
+    since = until - 24 * resolution if since is None else since
+    return int(since) // resolution * resolution, int(until)
+
+
+def poll_activity(poll_id, resolution=HOUR, since=None, until=None, db_path=None):
+    """``[(bucket, responses)]`` of ``poll_id`` between ``since`` and ``until`` (unix time), oldest first.
+
+    Without ``since`` the last 24 buckets are returned.
+    """
+    refresh_rollups(db_path)
+    start, end = _bucket_range(resolution, since, until)
+    conn = connect_db(db_path)
+    c = conn.cursor()
+    c.execute('''
+        SELECT bucket, SUM(responses) FROM poll_rollups
+        WHERE poll_id = ? AND resolution = ? AND bucket >= ? AND bucket <= ?
+        GROUP BY bucket ORDER BY bucket
+    ''', (poll_id, resolution, start, end))
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+
+def option_shares(poll_id, resolution=HOUR, since=None, until=None, db_path=None):
+    """``[(bucket, {option: responses})]`` of ``poll_id``, oldest first; ranges as in poll_activity."""
+    refresh_rollups(db_path)
+    start, end = _bucket_range(resolution, since, until)
+    conn = connect_db(db_path)
+    c = conn.cursor()
+    c.execute('''
+        SELECT bucket, option_text, responses FROM poll_rollups
+        WHERE poll_id = ? AND resolution = ? AND bucket >= ? AND bucket <= ?
+        ORDER BY bucket
+    ''', (poll_id, resolution, start, end))
+    buckets = {}
+    for bucket, option_text, responses in c.fetchall():
+        buckets.setdefault(bucket, {})[option_text] = responses
+    conn.close()
+    return list(buckets.items())
+
+
+def stats_table(poll_id, resolution=HOUR, since=None, until=None, db_path=None):
+    """One line per bucket: UTC start, responses and the share of each option."""
+    rows = option_shares(poll_id, resolution, since, until, db_path)
+    options = sorted({option for _, counts in rows for option in counts})
+    lines = []
+    for bucket, counts in rows:
+        total = sum(counts.values())
+        shares = ", ".join(f"{option} {counts.get(option, 0) / total:.0%}" for option in options)
+        lines.append(f"{time.strftime(BUCKET_FORMATS[resolution], time.gmtime(bucket))}  {total:6d}  {shares}")
+    return "\n".join(lines)
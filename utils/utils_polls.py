@@ -0,0 +1,131 @@
+"""Poll tables and vote storage, shared by the builder and generated poll bots.
+
+A user has one vote per poll: ``poll_responses`` is unique on
+``(poll_id, user_id)`` and a repeated press updates the row in place. A
+changed vote also takes the next response_id, so readers that follow the
+table by response_id (the rollups in utils_poll_stats) see the change.
+``poll_tallies`` holds the current number of votes per option and is
+adjusted in the same transaction as each vote, so results never need a
+scan of the responses.
+"""
+
+from utils.utils_db import connect_db
+
+
+def init_poll_tables(conn):
+    """Create the poll tables and bring databases from before one-vote-per-user up to date."""
+    c = conn.cursor()
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS polls (
+            poll_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            config_id INTEGER,
+            question TEXT,
+            options TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (config_id) REFERENCES bot_configs (config_id)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS poll_responses (
+            response_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            poll_id INTEGER,
+            config_id INTEGER,
+            option_text TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (config_id) REFERENCES bot_configs (config_id),
+            FOREIGN KEY (poll_id) REFERENCES polls (poll_id)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS poll_tallies (
+            poll_id INTEGER,
+            option_text TEXT,
+            votes INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (poll_id, option_text)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS poll_rollups (
+            poll_id INTEGER,
+            resolution INTEGER,
+            bucket INTEGER,
+            option_text TEXT,
+            responses INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (poll_id, resolution, bucket, option_text)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS poll_rollup_state (
+            name TEXT PRIMARY KEY,
+            last_response_id INTEGER NOT NULL
+        )
+    ''')
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_poll_responses_poll_user'")
+    if c.fetchone() is None:
+        dedupe_poll_responses(conn)
+    conn.commit()
+
+
+def dedupe_poll_responses(conn):
+    """Keep each user's latest response per poll, add the unique index and recount the tallies."""
+    c = conn.cursor()
+    c.execute('''
+        DELETE FROM poll_responses WHERE response_id NOT IN (
+            SELECT MAX(response_id) FROM poll_responses GROUP BY poll_id, user_id
+        )
+    ''')
+    removed = c.rowcount
+    c.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_poll_responses_poll_user ON poll_responses (poll_id, user_id)')
+    c.execute('DELETE FROM poll_tallies')
+    c.execute('''
+        INSERT INTO poll_tallies (poll_id, option_text, votes)
+        SELECT poll_id, option_text, COUNT(*) FROM poll_responses GROUP BY poll_id, option_text
+    ''')
+    return removed
+
+
+def save_poll_response(user_id, poll_id, config_id, option_text, db_path=None):
+    """Record ``user_id``'s vote, replacing an earlier one. Returns the previous option or None."""
+    conn = connect_db(db_path, isolation_level=None)
+    c = conn.cursor()
+    try:
+        # The read and both writes have to see the same vote
+        c.execute('BEGIN IMMEDIATE')
+        c.execute('SELECT option_text FROM poll_responses WHERE poll_id = ? AND user_id = ?', (poll_id, user_id))
+        row = c.fetchone()
+        previous = row[0] if row else None
+        if row and previous == option_text:
+            c.execute('COMMIT')
+            return previous
+        c.execute('''
+            INSERT INTO poll_responses (user_id, poll_id, config_id, option_text) VALUES (?, ?, ?, ?)
+            ON CONFLICT (poll_id, user_id) DO UPDATE SET
+                option_text = excluded.option_text, config_id = excluded.config_id, created_at = CURRENT_TIMESTAMP,
+                response_id = (SELECT seq + 1 FROM sqlite_sequence WHERE name = 'poll_responses')
+        ''', (user_id, poll_id, config_id, option_text))
+        if row:
+            c.execute('UPDATE poll_tallies SET votes = votes - 1 WHERE poll_id = ? AND option_text = ?',
+                      (poll_id, previous))
+        c.execute('''
+            INSERT INTO poll_tallies (poll_id, option_text, votes) VALUES (?, ?, 1)
+            ON CONFLICT (poll_id, option_text) DO UPDATE SET votes = votes + 1
+        ''', (poll_id, option_text))
+        c.execute('COMMIT')
+        return previous
+    except BaseException:
+        if conn.in_transaction:
+            c.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+
+def poll_tallies(poll_id, db_path=None):
+    """Current votes per option of ``poll_id``."""
+    conn = connect_db(db_path)
+    c = conn.cursor()
+    c.execute('SELECT option_text, votes FROM poll_tallies WHERE poll_id = ? AND votes > 0', (poll_id,))
+    tallies = dict(c.fetchall())
+    conn.close()
+    return tallies
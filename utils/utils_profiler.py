@@ -0,0 +1,178 @@
+"""On-demand sampling profiler for generated bots.
+
+A bot calls ``install_profiler`` at startup, which only registers a SIGUSR1
+handler, so nothing runs until a profile is asked for. ``request_profile``
+writes the duration to ``profiles/bot_N.ctl`` next to the bot and sends
+the signal; the bot then samples its main thread's stack from a daemon
+thread and writes the counts in collapsed-stack format (one
+``outer;inner;leaf count`` line per stack, as read by flamegraph.pl and
+speedscope) to ``profiles/bot_N-<timestamp>.collapsed``.
+"""
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+DEFAULT_SECONDS = 10
+MAX_SECONDS = 300
+SAMPLE_INTERVAL = 0.005
+MAX_DEPTH = 64
+# Time for the bot to notice the signal and write the file
+PROFILE_WAIT_SLACK = 15
+
+
+def bot_profile_dir(bots_dir="bots"):
+    return os.path.join(bots_dir, "profiles")
+
+
+def control_file(config_id, profiles_dir):
+    return os.path.join(profiles_dir, f"bot_{config_id}.ctl")
+
+
+def _frame_name(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse(frame, names, max_depth=MAX_DEPTH):
+    """``outer;...;leaf`` for a frame; ``names`` caches labels per code object."""
+    stack = []
+    while frame is not None and len(stack) < max_depth:
+        code = frame.f_code
+        name = names.get(code)
+        if name is None:
+            name = names[code] = _frame_name(code)
+        stack.append(name)
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+def sample_stacks(thread_id, seconds, interval=SAMPLE_INTERVAL):
+    """Count the stacks seen in ``thread_id`` every ``interval`` for ``seconds``."""
+    counts = Counter()
+    names = {}
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is None:
+            break
+        counts[collapse(frame, names)] += 1
+        del frame
+        time.sleep(interval)
+    return counts
+
+
+def write_collapsed(counts, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for stack, count in counts.most_common():
+            f.write(f"{stack} {count}\n")
+    # Readers poll for the final name, so it only appears once complete
+    os.replace(tmp_path, path)
+    return path
+
+
+class Profiler:
+    def __init__(self, config_id, profiles_dir):
+        self.config_id = config_id
+        self.profiles_dir = profiles_dir
+        self.thread_id = threading.main_thread().ident
+        self.running = None
+
+    def _requested_seconds(self):
+        try:
+            with open(control_file(self.config_id, self.profiles_dir), encoding="utf-8") as f:
+                seconds = float(f.read().strip() or DEFAULT_SECONDS)
+        except (OSError, ValueError):
+            seconds = DEFAULT_SECONDS
+        return min(max(seconds, 0.1), MAX_SECONDS)
+
+    def handle_signal(self, signum, frame):
+        if self.running is not None and self.running.is_alive():
+            return
+        self.running = threading.Thread(target=self.run, args=(self._requested_seconds(),),
+                                        name="profiler", daemon=True)
+        self.running.start()
+
+    def run(self, seconds):
+        counts = sample_stacks(self.thread_id, seconds)
+        os.makedirs(self.profiles_dir, exist_ok=True)
+        path = os.path.join(self.profiles_dir, f"bot_{self.config_id}-{int(time.time())}.collapsed")
+        write_collapsed(counts, path)
+        try:
+            os.remove(control_file(self.config_id, self.profiles_dir))
+        except OSError:
+            pass
+        return path
+
+
+def install_profiler(config_id, profiles_dir):
+    """Profile this process on SIGUSR1. Does nothing where the signal does not exist."""
+    if not hasattr(signal, "SIGUSR1"):
+        return None
+    profiler = Profiler(config_id, profiles_dir)
+    signal.signal(signal.SIGUSR1, profiler.handle_signal)
+    return profiler
+
+
+def request_profile(config_id, pid, seconds=DEFAULT_SECONDS, profiles_dir=None):
+    """Ask a running bot to profile itself. Returns the time of the request."""
+    if not hasattr(signal, "SIGUSR1"):
+        raise OSError("Профилирование недоступно на этой платформе")
+    profiles_dir = profiles_dir or bot_profile_dir()
+    os.makedirs(profiles_dir, exist_ok=True)
+    with open(control_file(config_id, profiles_dir), "w", encoding="utf-8") as f:
+        f.write(str(seconds))
+    requested_at = time.time()
+    os.kill(pid, signal.SIGUSR1)
+    return requested_at
+
+
+def find_profile(config_id, since, profiles_dir=None):
+    """Newest profile of ``config_id`` written at or after ``since``, or None."""
+    profiles_dir = profiles_dir or bot_profile_dir()
+    prefix = f"bot_{config_id}-"
+    newest = None
+    try:
+        names = os.listdir(profiles_dir)
+    except FileNotFoundError:
+        return None
+    for name in names:
+        if name.startswith(prefix) and name.endswith(".collapsed"):
+            path = os.path.join(profiles_dir, name)
+            mtime = os.path.getmtime(path)
+            if mtime >= since and (newest is None or mtime > newest[0]):
+                newest = (mtime, path)
+    return newest[1] if newest else None
+
+
+async def wait_for_profile(config_id, since, timeout, profiles_dir=None, poll_interval=0.5):
+    """Wait until the bot has written the profile asked for at ``since``."""
+    import asyncio
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        path = find_profile(config_id, since, profiles_dir)
+        if path is not None:
+            return path
+        await asyncio.sleep(poll_interval)
+    return None
+
+
+def read_collapsed(path):
+    counts = Counter()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if stack:
+                counts[stack] += int(count)
+    return counts
+
+
+def top_functions(counts, limit=10):
+    """``[(function, self_samples, share)]`` of the leaf frames that were seen most."""
+    total = sum(counts.values())
+    leaves = Counter()
+    for stack, count in counts.items():
+        leaves[stack.rsplit(";", 1)[-1]] += count
+    return [(name, count, count / total) for name, count in leaves.most_common(limit)] if total else []
@@ -0,0 +1,215 @@
+import asyncio
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Telegram limits: ~30 messages per second per bot, ~1 message per second per chat
+GLOBAL_RATE = 30
+CHAT_RATE = 1
+CHAT_BURST = 3
+MAX_RETRIES = 3
+IDLE_CHAT_TTL = 60
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# Only methods that post into a chat count against the send limits
+LIMITED_METHODS = {
+    "sendMessage", "sendPhoto", "sendDocument", "sendVideo", "sendAudio", "sendVoice",
+    "sendAnimation", "sendSticker", "sendMediaGroup", "sendLocation", "sendContact",
+    "sendPoll", "copyMessage", "forwardMessage", "editMessageText", "editMessageReplyMarkup",
+}
+
+_priority = ContextVar("send_priority", default=PRIORITY_NORMAL)
+# Set by observe_waits; generated bots never import the metrics module
+_wait_histogram = None
+
+
+def observe_waits(histogram):
+    """Observe how long each send waited for its tokens into ``histogram``, labelled by bot id."""
+    global _wait_histogram
+    _wait_histogram = histogram
+
+
+@contextmanager
+def send_priority(priority):
+    """Send everything inside the block with the given queue priority."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self):
+        """Seconds until a token is available, 0 if one can be taken now."""
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+    async def take(self):
+        delay = self.delay()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self.delay()
+        self.consume()
+
+    def pause(self, seconds):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+    def is_idle(self, now):
+        return now - self.updated > IDLE_CHAT_TTL and self.tokens >= self.capacity - 1
+
+
+class OutboundLimiter:
+    """Global and per-chat token buckets for one bot token.
+
+    Callers first wait on their chat's bucket (which keeps per-chat order),
+    then on a priority queue that hands out global tokens.
+    """
+
+    def __init__(self, global_rate=GLOBAL_RATE, chat_rate=CHAT_RATE, chat_burst=CHAT_BURST, bot_id=None):
+        self.bot_id = bot_id
+        self.global_bucket = TokenBucket(global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.chat_buckets = {}
+        self._queue = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        self._worker = None
+        self.chat_waiting = 0
+        self.sent = 0
+        self.retries = 0
+
+    def _chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) > 10000:
+                self._prune_chats()
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _prune_chats(self):
+        now = time.monotonic()
+        for chat_id in [k for k, b in self.chat_buckets.items() if b.is_idle(now) and not b.lock.locked()]:
+            del self.chat_buckets[chat_id]
+
+    async def acquire(self, chat_id=None, priority=PRIORITY_NORMAL):
+        started = time.monotonic()
+        if chat_id is not None:
+            bucket = self._chat_bucket(chat_id)
+            self.chat_waiting += 1
+            try:
+                async with bucket.lock:
+                    await bucket.take()
+            finally:
+                self.chat_waiting -= 1
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((priority, next(self._seq), future))
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        await future
+        self.sent += 1
+        if _wait_histogram is not None:
+            _wait_histogram.observe(time.monotonic() - started, self.bot_id)
+
+    async def _run(self):
+        # Exits once the queue drains so no task outlives the event loop
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            delay = self.global_bucket.delay()
+            while delay > 0:
+                # Put the item back so a higher-priority send can overtake it while we wait
+                self._queue.put_nowait(item)
+                await asyncio.sleep(delay)
+                item = self._queue.get_nowait()
+                delay = self.global_bucket.delay()
+            future = item[2]
+            if future.done():
+                continue
+            self.global_bucket.consume()
+            future.set_result(None)
+
+    def pause(self, seconds, chat_id=None):
+        self.retries += 1
+        self.global_bucket.pause(seconds)
+        if chat_id is not None:
+            self._chat_bucket(chat_id).pause(seconds)
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize() + self.chat_waiting,
+            "sent": self.sent,
+            "retries": self.retries,
+        }
+
+
+_limiters = {}
+
+
+def get_limiter(bot_id):
+    limiter = _limiters.get(bot_id)
+    if limiter is None:
+        limiter = _limiters[bot_id] = OutboundLimiter(bot_id=bot_id)
+    return limiter
+
+
+def limiter_stats():
+    return {bot_id: limiter.stats() for bot_id, limiter in _limiters.items()}
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """Request middleware that queues sends under the limits and retries 429s.
+
+    Install with ``bot.session.middleware(RateLimitMiddleware())``.
+    """
+
+    def __init__(self, max_retries=MAX_RETRIES):
+        self.max_retries = max_retries
+
+    async def __call__(self, make_request, bot, method):
+        if method.__api_method__ not in LIMITED_METHODS:
+            return await make_request(bot, method)
+        limiter = get_limiter(bot.id)
+        chat_id = getattr(method, "chat_id", None)
+        priority = _priority.get()
+        attempt = 0
+        while True:
+            await limiter.acquire(chat_id, priority)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                logger.warning("Flood wait on %s for chat %s, retrying in %s s", method.__api_method__, chat_id, e.retry_after)
+                limiter.pause(e.retry_after, chat_id)
@@ -0,0 +1,141 @@
+"""Builder database schema and the lifecycle of generated bot processes.
+
+Kept free of aiogram and psutil imports so the cli and scripts that only
+create or launch bots start quickly; psutil is imported when a process
+actually has to be stopped.
+"""
+import os
+import sqlite3
+import subprocess
+import sys
+
+from generate import generate, generated_config_hash
+from utils.utils_config import canonical
+from utils.utils_db import connect_db
+from utils.utils_logging import bot_log_file
+from utils.utils_polls import init_poll_tables
+
+
+def stop_process(pid, timeout=3):
+    import psutil
+    try:
+        process = psutil.Process(pid)
+        process.terminate()
+        process.wait(timeout=timeout)
+    except (psutil.NoSuchProcess, psutil.TimeoutExpired):
+        pass
+
+
+def init_db():
+    conn = connect_db()
+    c = conn.cursor()
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            first_name TEXT,
+            last_name TEXT,
+            registered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS bot_configs (
+            config_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            bot_name TEXT,
+            config_json TEXT,
+            bot_token TEXT,
+            pid INTEGER,
+            config_hash TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS broadcasts (
+            broadcast_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            config_id INTEGER,
+            user_id INTEGER,
+            text TEXT,
+            status TEXT DEFAULT 'pending',
+            last_user_id INTEGER DEFAULT 0,
+            delivered INTEGER DEFAULT 0,
+            blocked INTEGER DEFAULT 0,
+            failed INTEGER DEFAULT 0,
+            runner TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP,
+            FOREIGN KEY (config_id) REFERENCES bot_configs (config_id)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS bot_stats (
+            config_id INTEGER,
+            bucket INTEGER,
+            resolution INTEGER,
+            samples INTEGER,
+            cpu_avg REAL,
+            cpu_max REAL,
+            rss_max INTEGER,
+            fds_max INTEGER,
+            threads_max INTEGER,
+            PRIMARY KEY (config_id, resolution, bucket)
+        )
+    ''')
+    init_poll_tables(conn)
+    c.execute('CREATE INDEX IF NOT EXISTS idx_poll_responses_config_user ON poll_responses (config_id, user_id)')
+    try:
+        c.execute('ALTER TABLE bot_configs ADD COLUMN bot_token TEXT')
+    except sqlite3.OperationalError:
+        pass
+    try:
+        c.execute('ALTER TABLE bot_configs ADD COLUMN pid INTEGER')
+    except sqlite3.OperationalError:
+        pass
+    try:
+        c.execute('ALTER TABLE bot_configs ADD COLUMN config_hash TEXT')
+    except sqlite3.OperationalError:
+        pass
+    try:
+        c.execute('ALTER TABLE broadcasts ADD COLUMN runner TEXT')
+    except sqlite3.OperationalError:
+        pass
+    c.execute('SELECT config_id, pid FROM bot_configs WHERE pid IS NOT NULL')
+    for config_id, pid in c.fetchall():
+        stop_process(pid)
+        c.execute('UPDATE bot_configs SET pid = NULL WHERE config_id = ?', (config_id,))
+    conn.commit()
+    conn.close()
+
+
+async def generate_and_run_bot(config, bot_token, config_id):
+    config = canonical(config)
+    output_file = f"bots/bot_{config_id}.py"
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    # An unchanged config built by this generator keeps its script; only the process is restarted
+    if generated_config_hash(output_file) != config.digest:
+        generate(config.config, output_file, config_id, config.digest)
+    env_file = f"bots/bot_{config_id}.env"
+    with open(env_file, "w", encoding="utf-8") as f:
+        f.write(f"BOT_TOKEN={bot_token}\n")
+    conn = connect_db()
+    c = conn.cursor()
+    c.execute('SELECT pid FROM bot_configs WHERE config_id = ?', (config_id,))
+    result = c.fetchone()
+    if result and result[0]:
+        stop_process(result[0])
+    # Bots log to their own file; stderr only catches crashes before logging starts
+    stderr_file = os.path.splitext(bot_log_file(config_id, os.path.dirname(output_file)))[0] + ".err"
+    os.makedirs(os.path.dirname(stderr_file), exist_ok=True)
+    with open(stderr_file, "ab") as stderr:
+        process = subprocess.Popen(
+            [sys.executable, os.path.abspath(output_file)],
+            cwd=os.path.dirname(os.path.abspath(output_file)),
+            env={**os.environ, "BOT_TOKEN": bot_token},
+            stdout=subprocess.DEVNULL,
+            stderr=stderr,
+        )
+    c.execute('UPDATE bot_configs SET pid = ? WHERE config_id = ?', (process.pid, config_id))
+    conn.commit()
+    conn.close()
+    return process
@@ -0,0 +1,218 @@
+"""Bring every stored bot up and keep it running (``cli.py serve``).
+
+Launches go through a semaphore: a slot is held from starting the process
+until the bot logs that it is polling (or dies), so at most ``concurrency``
+interpreters are importing aiogram at once. Bots whose token Telegram
+rejects are not started. Exited bots are restarted with exponential
+backoff until the supervisor is told to stop.
+
+Readiness is read from aiogram's INFO line in the bot's log;
+``setup_logging`` keeps the aiogram.dispatcher logger at INFO whatever
+LOG_LEVEL says. A bot still running when the wait times out is counted as
+"slow" and stays supervised.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+
+from utils.utils_db import connect_db
+from utils.utils_logging import bot_log_file
+from utils.utils_runner import generate_and_run_bot, stop_process
+from utils.utils_telegram import TOKEN_REJECTED, token_status
+
+logger = logging.getLogger(__name__)
+
+# aiogram logs this once getMe succeeded and polling starts
+READY_MARKER = b"Run polling for bot"
+READY_TIMEOUT = 60
+CHECK_INTERVAL = 5
+RESTART_DELAY = 5
+MAX_RESTART_DELAY = 300
+# A bot that stayed up this long has its restart backoff reset
+STABLE_AFTER = 600
+
+
+async def wait_until_ready(process, log_file, offset, timeout=READY_TIMEOUT, poll_interval=0.2):
+    """True once ``log_file`` gets READY_MARKER past ``offset``; False if the process exits first or on timeout."""
+    deadline = time.monotonic() + timeout
+    tail = b""
+    inode = None
+    while time.monotonic() < deadline:
+        try:
+            with open(log_file, "rb") as f:
+                stat = os.fstat(f.fileno())
+                # The handler rotated the log: the new file is read from the start
+                if stat.st_size < offset or inode not in (None, stat.st_ino):
+                    offset = 0
+                    tail = b""
+                inode = stat.st_ino
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+        if data:
+            offset += len(data)
+            # Keep the end of the previous read in case the marker is split
+            if READY_MARKER in tail + data:
+                return True
+            tail = data[-len(READY_MARKER):]
+        if process.poll() is not None:
+            return False
+        await asyncio.sleep(poll_interval)
+    return False
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+class BotSupervisor:
+    def __init__(self, concurrency, check_tokens=True, restart_delay=RESTART_DELAY,
+                 check_interval=CHECK_INTERVAL, ready_timeout=READY_TIMEOUT):
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.check_tokens = check_tokens
+        self.restart_delay = restart_delay
+        self.check_interval = check_interval
+        self.ready_timeout = ready_timeout
+        self.processes = {}
+        self.started_at = {}
+        self.failures = {}
+        self.restart_tasks = set()
+        self.stopping = asyncio.Event()
+        self.counts = {"ready": 0, "slow": 0, "failed": 0, "rejected": 0, "restarts": 0}
+
+    def stored_bots(self, config_id=None):
+        conn = connect_db()
+        c = conn.cursor()
+        query = ('SELECT config_id, config_json, bot_token FROM bot_configs '
+                 'WHERE config_json IS NOT NULL AND bot_token IS NOT NULL')
+        if config_id is None:
+            c.execute(query + ' ORDER BY config_id')
+        else:
+            c.execute(query + ' AND config_id = ?', (config_id,))
+        bots = c.fetchall()
+        conn.close()
+        return bots
+
+    def _clear_pid(self, config_ids):
+        conn = connect_db()
+        conn.executemany('UPDATE bot_configs SET pid = NULL WHERE config_id = ?', [(i,) for i in config_ids])
+        conn.commit()
+        conn.close()
+
+    async def launch(self, config_id, config_json, bot_token):
+        """Start one bot and wait for it. Returns "ready", "slow", "failed" or "rejected"."""
+        if self.check_tokens:
+            status, error = await token_status(bot_token)
+            if status == TOKEN_REJECTED:
+                logger.warning("Bot %s not started, token rejected: %s", config_id, error)
+                return "rejected"
+        async with self.semaphore:
+            if self.stopping.is_set():
+                return "failed"
+            log_file = bot_log_file(config_id)
+            offset = _file_size(log_file)
+            try:
+                process = await generate_and_run_bot(json.loads(config_json), bot_token, config_id)
+            except Exception as e:
+                logger.error("Bot %s failed to start: %s", config_id, e)
+                return "failed"
+            self.processes[config_id] = process
+            self.started_at[config_id] = time.monotonic()
+            ready = await wait_until_ready(process, log_file, offset, self.ready_timeout)
+        if ready:
+            logger.info("Bot %s is polling (pid %s)", config_id, process.pid)
+            return "ready"
+        if process.poll() is None:
+            logger.warning("Bot %s is running but not polling after %s s (pid %s)",
+                           config_id, self.ready_timeout, process.pid)
+            return "slow"
+        logger.error("Bot %s did not become ready, exit code %s", config_id, process.poll())
+        return "failed"
+
+    async def start_all(self):
+        results = await asyncio.gather(*(self.launch(*bot) for bot in self.stored_bots()))
+        for result in results:
+            self.counts[result] += 1
+        return dict(self.counts)
+
+    def check_processes(self):
+        """Schedule restarts for bots that exited since the last check."""
+        now = time.monotonic()
+        exited = []
+        for config_id, process in list(self.processes.items()):
+            code = process.poll()
+            if code is None:
+                if now - self.started_at[config_id] >= STABLE_AFTER:
+                    self.failures.pop(config_id, None)
+                continue
+            del self.processes[config_id]
+            exited.append(config_id)
+            failures = self.failures[config_id] = self.failures.get(config_id, 0) + 1
+            delay = min(self.restart_delay * 2 ** (failures - 1), MAX_RESTART_DELAY)
+            logger.warning("Bot %s exited with code %s, restarting in %s s", config_id, code, delay)
+            task = asyncio.create_task(self.restart_later(config_id, delay))
+            self.restart_tasks.add(task)
+            task.add_done_callback(self.restart_tasks.discard)
+        if exited:
+            # Stale pids must not be signalled later, they may belong to another process by then
+            self._clear_pid(exited)
+        return exited
+
+    async def restart_later(self, config_id, delay):
+        try:
+            await asyncio.wait_for(self.stopping.wait(), delay)
+            return
+        except asyncio.TimeoutError:
+            pass
+        # Re-read the row: the bot may have been edited or deleted meanwhile
+        bots = self.stored_bots(config_id)
+        if not bots:
+            logger.info("Bot %s was deleted, not restarting", config_id)
+            return
+        self.counts["restarts"] += 1
+        await self.launch(*bots[0])
+
+    async def supervise(self):
+        while not self.stopping.is_set():
+            try:
+                await asyncio.wait_for(self.stopping.wait(), self.check_interval)
+            except asyncio.TimeoutError:
+                self.check_processes()
+
+    async def stop(self):
+        self.stopping.set()
+        for task in list(self.restart_tasks):
+            task.cancel()
+        running = list(self.processes.items())
+        await asyncio.gather(*(asyncio.to_thread(stop_process, process.pid) for _, process in running))
+        for _, process in running:
+            process.poll()
+        self._clear_pid([config_id for config_id, _ in running])
+        self.processes.clear()
+        logger.info("Stopped %s bots", len(running))
+
+
+async def serve(concurrency, check_tokens=True, on_started=None):
+    """Start all stored bots and supervise them until SIGTERM or SIGINT."""
+    import signal
+    supervisor = BotSupervisor(concurrency, check_tokens)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, supervisor.stopping.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+    try:
+        counts = await supervisor.start_all()
+        if on_started is not None:
+            on_started(counts)
+        await supervisor.supervise()
+    finally:
+        await supervisor.stop()
+    return supervisor.counts
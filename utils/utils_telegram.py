@@ -0,0 +1,141 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+
+import aiohttp
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from utils.utils_ratelimit import RateLimitMiddleware
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_URL = "https://api.telegram.org"
+# Point the builder and generated bots at another Bot API server, e.g. the
+# local fake from utils/utils_fake_api.py: TELEGRAM_API_URL=http://127.0.0.1:8081
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", DEFAULT_API_URL).rstrip("/")
+
+HTTP_POOL_SIZE = 100
+HTTP_TIMEOUT = aiohttp.ClientTimeout(total=15, connect=5)
+
+# getMe results: valid tokens are cached longer than rejected ones,
+# so a token revoked and re-issued in @BotFather is picked up quickly.
+GETME_TTL = 300
+GETME_NEGATIVE_TTL = 60
+GETME_CACHE_SIZE = 1024
+
+_session = None
+
+
+class TTLCache:
+    """Small LRU cache whose entries expire after a per-entry TTL."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl):
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_getme_cache = TTLCache(GETME_CACHE_SIZE)
+
+
+def token_hash(bot_token):
+    return hashlib.sha256(bot_token.encode("utf-8")).hexdigest()
+
+
+def get_session():
+    """Return the application-wide aiohttp session, creating it on first use."""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(limit=HTTP_POOL_SIZE, ttl_dns_cache=300)
+        _session = aiohttp.ClientSession(connector=connector, timeout=HTTP_TIMEOUT)
+    return _session
+
+
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+def create_bot(bot_token, api_url=None, **kwargs):
+    """Build a Bot that talks to TELEGRAM_API_URL and honours the send limits."""
+    api_url = (api_url or TELEGRAM_API_URL).rstrip("/")
+    session = None
+    if api_url != DEFAULT_API_URL:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(api_url))
+    bot = Bot(bot_token, session=session, **kwargs)
+    bot.session.middleware(RateLimitMiddleware())
+    return bot
+
+
+# token_status() results
+TOKEN_OK = "ok"
+TOKEN_REJECTED = "rejected"
+TOKEN_UNCHECKED = "unchecked"
+
+
+async def token_status(bot_token):
+    """getMe verdict for a token: ``(TOKEN_OK | TOKEN_REJECTED | TOKEN_UNCHECKED, error)``.
+
+    TOKEN_UNCHECKED means Telegram could not be asked or gave no verdict on
+    the token itself (network failure, 5xx, flood wait).
+    """
+    # Imported here: generated bots use create_bot only and skip compiling the config schema
+    from utils.utils_validation import validate_bot_token
+    is_valid, error = validate_bot_token(bot_token)
+    if not is_valid:
+        return TOKEN_REJECTED, error
+    key = token_hash(bot_token)
+    cached = _getme_cache.get(key)
+    if cached is not None:
+        return cached
+    try:
+        async with get_session().get(f"{TELEGRAM_API_URL}/bot{bot_token}/getMe") as response:
+            data = await response.json(content_type=None)
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        # Network failures say nothing about the token itself, so they are not cached
+        logger.warning("getMe request failed: %s", e)
+        return TOKEN_UNCHECKED, "Не удалось проверить токен, Telegram API недоступен"
+    if data.get("ok"):
+        result = (TOKEN_OK, "")
+        _getme_cache.set(key, result, GETME_TTL)
+    elif data.get("error_code") in (401, 404):
+        result = (TOKEN_REJECTED, str(data.get("description", "Ошибка")))
+        _getme_cache.set(key, result, GETME_NEGATIVE_TTL)
+    else:
+        result = (TOKEN_UNCHECKED, str(data.get("description", "Ошибка")))
+    return result
+
+
+async def check_bot_token(bot_token):
+    """Check a token against getMe. Returns (is_valid, error) like the validators."""
+    status, error = await token_status(bot_token)
+    return status == TOKEN_OK, error
@@ -0,0 +1,82 @@
+from functools import lru_cache
+
+MARKDOWN_V2_SPECIAL_CHARS = r'_[]()*~`>#+-=|{}.!?'
+# One (char, replacement) pair per special character. A chain of str.replace
+# calls over this table beats str.translate here: translate falls back to a
+# slow per-character path for non-Latin-1 text, i.e. for every Cyrillic message.
+MARKDOWN_V2_TABLE = tuple((char, '\\' + char) for char in MARKDOWN_V2_SPECIAL_CHARS)
+
+ESCAPE_CACHE_SIZE = 4096
+# Longer texts are escaped without caching so the cache cannot pin large strings
+ESCAPE_CACHE_MAX_LEN = 4096
+
+
+def _escape(text):
+    for char, replacement in MARKDOWN_V2_TABLE:
+        if char in text:
+            text = text.replace(char, replacement)
+    return text
+
+
+_escape_cached = lru_cache(maxsize=ESCAPE_CACHE_SIZE)(_escape)
+
+
+def escape_markdown(text):
+    """Escape all MarkdownV2 special characters for Telegram."""
+    if not text:
+        return text
+    if len(text) > ESCAPE_CACHE_MAX_LEN:
+        return _escape(text)
+    return _escape_cached(text)
+
+
+def utf16_len(text):
+    # Telegram measures entity offsets and lengths in UTF-16 code units
+    return len(text.encode('utf-16-le')) // 2
+
+
+class MessageBuilder:
+    """Builds a message as plain text plus entities, so nothing needs escaping.
+
+    ``build()`` returns ``(text, entities)`` with entities as plain dicts that
+    can be stored in a config; ``as_kwargs()`` returns arguments for
+    ``message.answer``/``bot.send_message``.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._entities = []
+        self._offset = 0
+
+    def _add(self, text, entity_type=None, **extra):
+        if not text:
+            return self
+        length = utf16_len(text)
+        if entity_type:
+            self._entities.append({"type": entity_type, "offset": self._offset, "length": length, **extra})
+        self._parts.append(text)
+        self._offset += length
+        return self
+
+    def text(self, text):
+        return self._add(text)
+
+    def bold(self, text):
+        return self._add(text, "bold")
+
+    def italic(self, text):
+        return self._add(text, "italic")
+
+    def link(self, text, url):
+        return self._add(text, "text_link", url=url)
+
+    def pre(self, text):
+        return self._add(text, "pre")
+
+    def build(self):
+        return "".join(self._parts), [dict(entity) for entity in self._entities]
+
+    def as_kwargs(self):
+        from aiogram.types import MessageEntity
+        text, entities = self.build()
+        return {"text": text, "entities": [MessageEntity(**entity) for entity in entities] or None, "parse_mode": None}